@@ -0,0 +1,12 @@
+#!/bin/bash
+# Run the performance suite and gate on the stored baseline (no services needed).
+# Fails when there is no baseline; create one with: bin/run_benchmarks.sh --update-baseline
+
+set -e
+
+cd "$(dirname "$0")/.."
+
+echo "Running performance benchmarks..."
+python scripts/perf_suite.py "$@"
+
+echo "Benchmarks passed!"
@@ -2,4 +2,4 @@
 # Run telemetry generator for POC
 
 cd "$(dirname "$0")/.."
-python src/ingestion/telemetry_generator.py
+python -m src.ingestion.telemetry_generator "$@"
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Parity check and latency benchmark for the compiled tree ensemble backend."""
+
+import argparse
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.serving.compiled_ensemble import compile_ensemble
+from src.serving.risk_scorer import RiskScorer
+
+def make_features(num_rows: int, seed: int = 42) -> np.ndarray:
+    """Deterministic feature matrix in model column order."""
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.uniform(0, 160, num_rows),
+        rng.uniform(0, 3, num_rows),
+        rng.integers(0, 6, num_rows),
+    ]).astype(np.float32)
+
+def check_parity(name: str, sklearn_scorer: RiskScorer, compiled_scorer: RiskScorer, X: np.ndarray,
+                 atol: float):
+    """Assert raw model predictions agree between backends."""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        expected = sklearn_scorer.model.predict(X)
+    actual = compiled_scorer._current.compiled.predict(X)
+    diff = np.abs(actual - expected).max()
+    exact = int((actual == expected).sum())
+    assert diff <= atol, f"{name}: max abs diff {diff} exceeds {atol}"
+    single = np.array([compiled_scorer._current.compiled.predict_one(row) for row in X[:1000]])
+    assert np.abs(single - expected[:1000]).max() <= atol, f"{name}: single-row path disagrees"
+    print(f"Parity ({name}): {exact}/{len(X)} bit-identical, max abs diff {diff:.3g}")
+
+def latency(scorer: RiskScorer, X: np.ndarray, batch_size: int, iterations: int):
+    """p50/p99 seconds per score_batch call at the given batch size."""
+    timings = []
+    for i in range(iterations):
+        start = (i * batch_size) % max(1, len(X) - batch_size)
+        batch = X[start:start + batch_size]
+        t0 = time.perf_counter()
+        scorer.score_batch(batch)
+        timings.append(time.perf_counter() - t0)
+    return np.percentile(timings, 50), np.percentile(timings, 99)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model-path', default=None, help='Artifact to load (default: active store version)')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 10, 100, 10_000, 100_000])
+    parser.add_argument('--atol', type=float, default=1e-12)
+    args = parser.parse_args()
+
+    sklearn_scorer = RiskScorer(args.model_path, backend='sklearn')
+    compiled_scorer = RiskScorer(args.model_path, backend='compiled')
+    # Same backend without the cell table, as for a model too large for one: small
+    # batches walk the trees, larger ones fall back to the model's predict
+    no_table_scorer = RiskScorer(args.model_path, backend='compiled')
+    no_table_scorer._current.compiled = compile_ensemble(no_table_scorer.model, max_table_cells=0)
+    # The level-by-level walk alone, at every batch size
+    walk_scorer = RiskScorer(args.model_path, backend='compiled')
+    walk_scorer._current.compiled = compile_ensemble(walk_scorer.model, max_table_cells=0)
+    walk_scorer._current.compiled.fallback = None
+
+    X = make_features(200_000)
+    check_parity('table', sklearn_scorer, compiled_scorer, X, args.atol)
+    check_parity('walk', sklearn_scorer, walk_scorer, X, args.atol)
+
+    scorers = (('sklearn', sklearn_scorer), ('table', compiled_scorer), ('no-table', no_table_scorer),
+               ('walk', walk_scorer))
+    print(f"{'batch':>8} {'backend':>9} {'p50 ms':>10} {'p99 ms':>10} {'rows/s':>14}")
+    for batch_size in args.batch_sizes:
+        iterations = max(5, min(2000, 2_000_000 // batch_size // 10))
+        for name, scorer in scorers:
+            p50, p99 = latency(scorer, X, batch_size, iterations)
+            print(f"{batch_size:>8,} {name:>9} {p50 * 1e3:>10.3f} {p99 * 1e3:>10.3f} {batch_size / p50:>14,.0f}")
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""Throughput and parity check: per-event vs. batch telemetry schema validation."""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.utils.schema_validator import TELEMETRY_SCHEMA, get_validator, validate_telemetry_batch
+
+BAD_VALUES = [None, 'x', 1, 1.5, True, [1], {'a': 1}, 'sample']
+
+def load_events(path: str, num_events: int, bad_fraction: float, seed: int):
+    """Sample events, repeated up to num_events, with a fraction corrupted."""
+    with open(path, 'r') as f:
+        base = [json.loads(line) for line in f if line.strip()]
+    rng = random.Random(seed)
+    fields = list(TELEMETRY_SCHEMA['properties'])
+    events = []
+    for i in range(num_events):
+        event = dict(base[i % len(base)])
+        if rng.random() < bad_fraction:
+            field = rng.choice(fields)
+            if rng.random() < 0.3:
+                event.pop(field, None)
+            else:
+                event[field] = rng.choice(BAD_VALUES)
+        events.append(event)
+    return events
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--input', default='data/samples/poc_telemetry.jsonl')
+    parser.add_argument('--num-events', type=int, default=100_000)
+    parser.add_argument('--bad-fraction', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    events = load_events(args.input, args.num_events, args.bad_fraction, args.seed)
+
+    start = time.perf_counter()
+    result = validate_telemetry_batch(events)
+    batch_s = time.perf_counter() - start
+
+    validator = get_validator()
+    start = time.perf_counter()
+    expected = np.array([validator.is_valid(event) for event in events])
+    per_event_s = time.perf_counter() - start
+
+    mismatches = int((expected != result.valid).sum())
+    print(f"{len(events)} events, {result.n_invalid} invalid")
+    print(f"per-event (precompiled jsonschema): {len(events) / per_event_s:,.0f} ev/s")
+    print(f"batch:                              {len(events) / batch_s:,.0f} ev/s")
+    print(f"mask mismatches vs jsonschema: {mismatches}")
+    sys.exit(1 if mismatches else 0)
+
+if __name__ == "__main__":
+    main()
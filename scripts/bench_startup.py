@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Benchmark: cold import time per entry point, with budgets.
+
+Each entry point is imported in fresh interpreters; the median import time is
+compared with its budget, and the modules it must not pull in at import
+(shap, sklearn training, jsonschema, yaml, ...) are checked. Exits 1 when an
+entry point is over budget or imports a deferred dependency, and prints the
+slowest imports (from ``python -X importtime``) for each failure.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Deferred until first use: none of these may load when an entry point is imported
+HEAVY = ('shap', 'numba', 'sklearn.model_selection', 'sklearn.ensemble', 'jsonschema', 'yaml', 'lightgbm')
+
+# name -> (module, import budget in ms, modules that must not be imported)
+ENTRY_POINTS: Dict[str, Tuple[str, float, Sequence[str]]] = {
+    'config': ('src.utils.config', 50, HEAVY),
+    'risk_scorer': ('src.serving.risk_scorer', 600, HEAVY + ('fastapi',)),
+    'scoring_server': ('src.serving.server', 900, HEAVY),
+    'pricing_engine': ('src.models.pricing_engine', 600, HEAVY),
+    'repricing': ('src.models.repricing', 250, HEAVY + ('pandas',)),
+    'schema_validator': ('src.utils.schema_validator', 550, HEAVY),
+    'feature_compiler': ('src.features.feature_compiler', 550, HEAVY),
+    'telemetry_store': ('src.ingestion.telemetry_store', 550, HEAVY),
+    'privacy_api': ('src.control_plane.api.privacy', 700, HEAVY),
+    'trips_api': ('src.control_plane.api.trips', 700, HEAVY),
+    'train_baseline': ('src.models.train_baseline', 600, HEAVY),
+}
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'modules': sorted(sys.modules)}}))
+"""
+
+def _run(args: List[str]) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONPATH=str(ROOT), PYTHONDONTWRITEBYTECODE='')
+    return subprocess.run([sys.executable, *args], cwd=str(ROOT), env=env, capture_output=True, text=True,
+                          check=True)
+
+def measure(module: str, repeat: int) -> Tuple[float, List[str]]:
+    """Median import seconds over ``repeat`` fresh interpreters, and the modules loaded."""
+    times, modules = [], []
+    for _ in range(repeat):
+        result = json.loads(_run(['-c', _PROBE.format(module=module)]).stdout.strip().splitlines()[-1])
+        times.append(result['seconds'])
+        modules = result['modules']
+    return statistics.median(times), modules
+
+def slowest_imports(module: str, top: int) -> List[Tuple[float, str]]:
+    """(cumulative ms, module) of the slowest imports, two levels deep, from ``-X importtime``."""
+    stderr = _run(['-X', 'importtime', '-c', f'import {module}']).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not cumulative.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth <= 2:
+            rows.append((int(cumulative) / 1000, name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--entry-points', nargs='+', choices=sorted(ENTRY_POINTS), default=list(ENTRY_POINTS))
+    parser.add_argument('--repeat', type=int, default=5, help="Fresh interpreters per entry point")
+    parser.add_argument('--budget-scale', type=float, default=1.0,
+                        help="Multiply every budget, e.g. 2 on a slow CI machine")
+    parser.add_argument('--top', type=int, default=8, help="Slowest imports shown per failure")
+    parser.add_argument('--output', default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    baseline_s, _ = measure('sys', args.repeat)
+    print(f"{'entry point':<18} {'import_ms':>10} {'budget_ms':>10}  status")
+    results, failures = {}, []
+    for name in args.entry_points:
+        module, budget_ms, forbidden = ENTRY_POINTS[name]
+        seconds, modules = measure(module, args.repeat)
+        import_ms = (seconds - baseline_s) * 1000
+        budget_ms *= args.budget_scale
+        loaded = [heavy for heavy in forbidden if heavy in modules]
+        problems = []
+        if import_ms > budget_ms:
+            problems.append('over budget')
+        if loaded:
+            problems.append(f"imports {', '.join(loaded)}")
+        results[name] = {'module': module, 'import_ms': import_ms, 'budget_ms': budget_ms, 'deferred_loaded': loaded}
+        print(f"{name:<18} {import_ms:>10.1f} {budget_ms:>10.0f}  {'; '.join(problems) or 'ok'}")
+        if problems:
+            failures.append(name)
+
+    for name in failures:
+        print(f"\nSlowest imports of {ENTRY_POINTS[name][0]}:")
+        for cumulative_ms, imported in slowest_imports(ENTRY_POINTS[name][0], args.top):
+            print(f"  {cumulative_ms:>8.1f} ms  {imported}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if failures:
+        print(f"\n{len(failures)} entry point(s) failed: {', '.join(failures)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""Benchmark: fetch one trip from a day of raw JSONL with and without the byte-offset index.
+
+Writes a synthetic day of telemetry (``--size-gb``, 10 GB by default) as
+JSONL in chunks, builds the index, then times fetching single trips by a full
+chunked scan and by :meth:`TelemetryIndex.lookup`. Results must match.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.ingestion.telemetry_index import TelemetryIndex
+from src.ingestion.telemetry_reader import TELEMETRY_COLUMNS, concat_chunks, iter_telemetry
+
+CHUNK_EVENTS = 200_000
+
+def write_day(path: str, size_bytes: int, num_devices: int, seed: int = 42) -> int:
+    """Append time-ordered synthetic events for one day until the file reaches ``size_bytes``.
+
+    Each device drives one trip per hour, so a trip's events are spread
+    across the file between other devices' events, as in a raw ingest log.
+    """
+    rng = np.random.default_rng(seed)
+    base = pd.Timestamp('2025-11-03T00:00:00Z')
+    written = 0
+    seconds = 0.0
+    with open(path, 'w') as f:
+        while f.tell() < size_bytes:
+            n = CHUNK_EVENTS
+            step = 86_400 / max(size_bytes / 600, 1)
+            offsets = seconds + np.arange(n) * step
+            seconds = offsets[-1] + step
+            device = rng.integers(0, num_devices, size=n)
+            hour = (offsets // 3600).astype(int) % 24
+            events = pd.DataFrame({
+                'device_id': np.char.add('device-', device.astype(str)),
+                'policy_id': np.char.add('policy-', (device // 2).astype(str)),
+                'trip_id': np.char.add(np.char.add('trip-', device.astype(str)), np.char.add('-', hour.astype(str))),
+                'ts': (base + pd.to_timedelta(offsets, unit='s')).strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+                'event_type': 'sample',
+                'lat': rng.uniform(37.0, 38.0, size=n),
+                'lon': rng.uniform(-123.0, -122.0, size=n),
+                'gps_accuracy_m': rng.uniform(2, 20, size=n),
+                'speed_kmh': rng.uniform(0, 120, size=n),
+                'accel_x_m_s2': rng.normal(0, 1, size=n),
+                'accel_y_m_s2': rng.normal(0, 1.5, size=n),
+                'accel_z_m_s2': rng.normal(9.8, 0.2, size=n),
+                'brake_strength': rng.uniform(0, 1, size=n),
+                'steering_angle_deg': rng.uniform(-30, 30, size=n),
+                'heading_deg': rng.uniform(0, 360, size=n),
+                'odometer_km': rng.uniform(0, 1e5, size=n),
+                'engine_rpm': rng.integers(700, 4000, size=n),
+                'battery_level_pct': rng.uniform(0, 100, size=n),
+                'sample_rate_hz': np.full(n, 1.0),
+                'provider': 'bench',
+                'hashed_driver_id': np.char.add('driver-', device.astype(str)),
+                'location_precision': 'exact',
+            })
+            f.write(events[TELEMETRY_COLUMNS].to_json(orient='records', lines=True))
+            written += n
+    return written
+
+def scan_trip(path: str, trip_id: str) -> pd.DataFrame:
+    """The no-index baseline: decode every chunk and keep the trip's rows."""
+    return concat_chunks([chunk[chunk['trip_id'] == trip_id] for chunk in iter_telemetry(path)])
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size-gb', type=float, default=10.0)
+    parser.add_argument('--num-devices', type=int, default=20_000)
+    parser.add_argument('--trips', type=int, default=5, help="Trips fetched with the index")
+    parser.add_argument('--scans', type=int, default=1, help="Trips fetched by a full scan")
+    parser.add_argument('--workdir', default=None)
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='telemetry-index-bench-')
+    raw = os.path.join(workdir, 'raw')
+    os.makedirs(raw, exist_ok=True)
+    path = os.path.join(raw, 'day.jsonl')
+    write_s, events = timed(lambda: write_day(path, int(args.size_gb * 1e9), args.num_devices))
+    size_gb = os.path.getsize(path) / 1e9
+    print(f"{events} events, {size_gb:.2f} GB JSONL written in {write_s:.1f}s")
+
+    index_dir = os.path.join(workdir, 'index')
+    build_s, _ = timed(lambda: TelemetryIndex(index_dir).update(raw))
+    index_mb = sum(os.path.getsize(os.path.join(index_dir, name)) for name in os.listdir(index_dir)) / 1e6
+    print(f"index built in {build_s:.1f}s ({size_gb / build_s:.2f} GB/s), {index_mb:.1f} MB on disk")
+
+    open_s, index = timed(lambda: TelemetryIndex(index_dir))
+    print(f"index opened (memory-mapped) in {open_s * 1e3:.2f} ms")
+
+    rng = np.random.default_rng(7)
+    trips = [f"trip-{device}-{hour}" for device, hour in
+             zip(rng.integers(0, args.num_devices, size=args.trips), rng.integers(0, 24, size=args.trips))]
+
+    print(f"{'trip':<20} {'rows':>6} {'index_ms':>10} {'scan_s':>9} {'speedup':>9}")
+    for i, trip_id in enumerate(trips):
+        index_s, found = timed(lambda: index.lookup('trip_id', trip_id))
+        if i < args.scans:
+            scan_s, expected = timed(lambda: scan_trip(path, trip_id))
+            if len(found) != len(expected) or not found['ts'].reset_index(drop=True).equals(
+                    expected['ts'].reset_index(drop=True)):
+                raise AssertionError(f"{trip_id}: index returned {len(found)} rows, scan {len(expected)}")
+            print(f"{trip_id:<20} {len(found):>6} {index_s * 1e3:>10.2f} {scan_s:>9.2f} {scan_s / index_s:>8.0f}x")
+        else:
+            print(f"{trip_id:<20} {len(found):>6} {index_s * 1e3:>10.2f} {'-':>9} {'-':>9}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Benchmark: partitioned Parquet telemetry store vs. raw JSONL.
+
+Writes a synthetic multi-day JSONL file, converts it to a store, and times a
+full scan, a one-device lookup and a one-day slice against both.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.ingestion.telemetry_reader import TELEMETRY_COLUMNS, iter_telemetry
+from src.ingestion.telemetry_store import convert_to_store, read_telemetry_store
+from src.streaming.telemetry_transform import TRIP_INPUT_COLUMNS, compute_trip_features_vectorized
+
+def write_events(path: str, num_events: int, num_devices: int, num_days: int, seed: int = 42):
+    """Write deterministic synthetic telemetry covering ``num_days`` days as JSONL."""
+    rng = np.random.default_rng(seed)
+    device = rng.integers(0, num_devices, size=num_events)
+    base = pd.Timestamp('2025-11-01T00:00:00Z')
+    offsets = np.sort(rng.integers(0, num_days * 86_400, size=num_events))
+    ts = (base + pd.to_timedelta(offsets, unit='s')).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+    day = offsets // 86_400
+    events = pd.DataFrame({
+        'device_id': np.char.add('device-', device.astype(str)),
+        'policy_id': np.char.add('policy-', (device // 2).astype(str)),
+        'trip_id': np.char.add(np.char.add('trip-', device.astype(str)), np.char.add('-', day.astype(str))),
+        'ts': ts,
+        'event_type': rng.choice(['sample', 'heartbeat'], size=num_events),
+        'lat': rng.uniform(37.0, 38.0, size=num_events),
+        'lon': rng.uniform(-123.0, -122.0, size=num_events),
+        'gps_accuracy_m': rng.uniform(2, 20, size=num_events),
+        'speed_kmh': rng.uniform(0, 120, size=num_events),
+        'accel_x_m_s2': rng.normal(0, 1, size=num_events),
+        'accel_y_m_s2': rng.normal(0, 1.5, size=num_events),
+        'accel_z_m_s2': rng.normal(9.8, 0.2, size=num_events),
+        'brake_strength': rng.uniform(0, 1, size=num_events),
+        'steering_angle_deg': rng.uniform(-30, 30, size=num_events),
+        'heading_deg': rng.uniform(0, 360, size=num_events),
+        'odometer_km': rng.uniform(0, 1e5, size=num_events),
+        'engine_rpm': rng.integers(700, 4000, size=num_events),
+        'battery_level_pct': rng.uniform(0, 100, size=num_events),
+        'sample_rate_hz': np.full(num_events, 1.0),
+        'provider': 'bench',
+        'hashed_driver_id': np.char.add('driver-', device.astype(str)),
+        'location_precision': 'exact',
+    })
+    events[TELEMETRY_COLUMNS].to_json(path, orient='records', lines=True)
+
+def scan_jsonl(path: str, columns=None, keep=None) -> int:
+    """Rows matching ``keep`` in a full chunked JSONL scan (the baseline for every query)."""
+    rows = 0
+    for chunk in iter_telemetry(path, columns=columns):
+        rows += int(keep(chunk).sum()) if keep is not None else len(chunk)
+    return rows
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--num-events', type=int, default=1_000_000)
+    parser.add_argument('--num-devices', type=int, default=2_000)
+    parser.add_argument('--num-days', type=int, default=7)
+    parser.add_argument('--workdir', default=None)
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='telemetry-bench-')
+    jsonl = os.path.join(workdir, 'events.jsonl')
+    root = os.path.join(workdir, 'store')
+    write_events(jsonl, args.num_events, args.num_devices, args.num_days)
+    convert_s, _ = timed(lambda: convert_to_store(jsonl, root))
+    print(f"{args.num_events} events; JSONL {os.path.getsize(jsonl) / 1e6:.1f} MB, "
+          f"converted in {convert_s:.2f}s")
+
+    device = 'device-7'
+    day_start, day_end = pd.Timestamp('2025-11-03T00:00Z'), pd.Timestamp('2025-11-04T00:00Z')
+    queries = [
+        ('full scan',
+         lambda: scan_jsonl(jsonl),
+         lambda: len(read_telemetry_store(root))),
+        ('one device',
+         lambda: scan_jsonl(jsonl, ['device_id'], lambda c: c['device_id'] == device),
+         lambda: len(read_telemetry_store(root, device_ids=device))),
+        ('one day',
+         lambda: scan_jsonl(jsonl, ['ts'], lambda c: (c['ts'] >= day_start) & (c['ts'] < day_end)),
+         lambda: len(read_telemetry_store(root, start=day_start, end=day_end))),
+        ('one day trip features',
+         lambda: len(compute_trip_features_vectorized(
+             pd.concat(c[(c['ts'] >= day_start) & (c['ts'] < day_end)]
+                       for c in iter_telemetry(jsonl, columns=TRIP_INPUT_COLUMNS)))),
+         lambda: len(compute_trip_features_vectorized(
+             read_telemetry_store(root, columns=TRIP_INPUT_COLUMNS, start=day_start, end=day_end)))),
+    ]
+
+    print(f"{'query':<24} {'jsonl_s':>9} {'store_s':>9} {'speedup':>8} {'rows':>9}")
+    for name, jsonl_fn, store_fn in queries:
+        jsonl_s, jsonl_rows = timed(jsonl_fn)
+        store_s, store_rows = timed(store_fn)
+        if jsonl_rows != store_rows:
+            raise AssertionError(f"{name}: JSONL returned {jsonl_rows} rows, store {store_rows}")
+        print(f"{name:<24} {jsonl_s:>9.3f} {store_s:>9.3f} {jsonl_s / store_s:>7.0f}x {store_rows:>9}")
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,48 @@
 #!/usr/bin/env python3
 """Schema validation script using fastavro."""
 
+import argparse
 import json
+import os
 import sys
+import time
 import fastavro
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from fastavro.validation import ValidationError, validate as validate_record
 from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+DEFAULT_CHUNK_BYTES = 16 * 1024 * 1024
+
+# Error kinds counted in --report
+JSON_ERROR = 'JSON parse error'
+MISSING_FIELD = 'missing required field'
+BAD_ENUM = 'bad enum'
+TYPE_MISMATCH = 'type mismatch'
+
+def load_schema(avro_schema_file: str) -> Dict[str, Any]:
+    """Load and parse an Avro schema once."""
+    with open(avro_schema_file, 'r') as f:
+        return fastavro.parse_schema(json.load(f))
 
 def validate_jsonl_with_avro(jsonl_file: str, avro_schema_file: str) -> bool:
     """Validate JSONL file against Avro schema."""
     try:
         # Load Avro schema
-        with open(avro_schema_file, 'r') as f:
-            schema = json.load(f)
+        schema = load_schema(avro_schema_file)
 
         # Read and validate each line
+        i = 0
         with open(jsonl_file, 'r') as f:
             for i, line in enumerate(f, 1):
                 try:
                     record = json.loads(line.strip())
-                    # Validate against schema (fastavro will raise exception if invalid)
-                    fastavro.validate(record, schema)
-                except (json.JSONDecodeError, fastavro.ValidationError) as e:
+                    # Validate against schema; re-run with raise_errors only for
+                    # bad records, since raising mode is much slower on unions
+                    if not validate_record(record, schema, raise_errors=False):
+                        validate_record(record, schema)
+                except (json.JSONDecodeError, ValidationError) as e:
                     print(f"Record {i}: {e}")
                     return False
 
@@ -34,15 +56,172 @@ def validate_jsonl_with_avro(jsonl_file: str, avro_schema_file: str) -> bool:
         print(f"Error: {e}")
         return False
 
+def split_byte_ranges(path: str, chunk_bytes: int) -> List[Tuple[int, int]]:
+    """Split a file into [start, end) byte ranges that begin and end on line boundaries."""
+    size = os.path.getsize(path)
+    ranges = []
+    with open(path, 'rb') as f:
+        start = 0
+        while start < size:
+            f.seek(min(start + chunk_bytes, size))
+            f.readline()
+            end = min(f.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+def _schema_name(schema: Any) -> str:
+    if isinstance(schema, dict):
+        return schema.get('name') or schema.get('type')
+    return str(schema)
+
+def classify_errors(errors) -> List[Tuple[str, str, str]]:
+    """Collapse fastavro's validation errors to one per field.
+
+    fastavro reports a value that fails a union once per branch (a bad
+    optional float fails both "null" and "float"), so errors are grouped by
+    field and the branches joined into one message.
+
+    Returns:
+        [(field path, error kind, message)]
+    """
+    by_field: Dict[str, list] = {}
+    for error in errors:
+        by_field.setdefault(error.field or '<record>', []).append(error)
+    classified = []
+    for field, field_errors in by_field.items():
+        datum = field_errors[0].datum
+        expected = ' or '.join(_schema_name(error.schema) for error in field_errors)
+        if datum is None:
+            kind = MISSING_FIELD
+        elif isinstance(datum, str) and any(isinstance(error.schema, dict) and error.schema.get('type') == 'enum'
+                                            for error in field_errors):
+            kind = BAD_ENUM
+        else:
+            kind = TYPE_MISMATCH
+        classified.append((field, kind, f"{datum!r} ({type(datum).__name__}), expected {expected}"))
+    return classified
+
+_worker_schema = None
+
+def _init_worker(avro_schema_file: str):
+    global _worker_schema
+    _worker_schema = load_schema(avro_schema_file)
+
+def _validate_range(args) -> Tuple[int, List[Tuple[int, str, str, str]]]:
+    """Validate the lines in one byte range.
+
+    Returns:
+        (lines in the range, [(line offset within the range, field path, error kind, message)])
+    """
+    path, start, end = args
+    failures = []
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    lines = data.split(b'\n')
+    if lines and lines[-1] == b'':
+        lines.pop()
+    for offset, line in enumerate(lines):
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            failures.append((offset, '<json>', JSON_ERROR, str(e)))
+            continue
+        if validate_record(record, _worker_schema, raise_errors=False):
+            continue
+        try:
+            validate_record(record, _worker_schema)
+        except ValidationError as e:
+            failures.extend((offset, field, kind, message) for field, kind, message in classify_errors(e.errors))
+    return len(lines), failures
+
+def validate_jsonl_report(jsonl_file: str, avro_schema_file: str, n_jobs: int = 1,
+                          chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> Dict[str, Any]:
+    """Validate every record of a JSONL file, in parallel, and collect all failures.
+
+    The schema is parsed once per worker; the file is split into byte ranges
+    on line boundaries and each range is validated independently.
+
+    Returns:
+        Dict with 'records', 'failures' (list of (line number, field path,
+        error kind, message), at most one per line and field), 'by_kind'
+        (Counter of failures per error kind) and 'seconds'.
+    """
+    start_time = time.perf_counter()
+    tasks = [(jsonl_file, start, end) for start, end in split_byte_ranges(jsonl_file, chunk_bytes)]
+
+    if n_jobs > 1 and len(tasks) > 1:
+        pool = ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(avro_schema_file,))
+        results = pool.map(_validate_range, tasks)
+    else:
+        pool = None
+        _init_worker(avro_schema_file)
+        results = map(_validate_range, tasks)
+
+    records = 0
+    failures = []
+    try:
+        # Ranges come back in order, so line numbers are a running offset
+        for n_lines, chunk_failures in results:
+            failures.extend((records + offset + 1, field, kind, message)
+                            for offset, field, kind, message in chunk_failures)
+            records += n_lines
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    return {
+        'records': records,
+        'failures': failures,
+        'by_kind': Counter(kind for _, _, kind, _ in failures),
+        'seconds': time.perf_counter() - start_time,
+    }
+
+def print_report(report: Dict[str, Any], max_failures: int):
+    for line, field, kind, message in report['failures'][:max_failures]:
+        print(f"Record {line}: {field}: {kind}: {message}")
+    hidden = len(report['failures']) - max_failures
+    if hidden > 0:
+        print(f"... {hidden} more failures")
+
+    bad_lines = len({line for line, _, _, _ in report['failures']})
+    rate = report['records'] / report['seconds'] if report['seconds'] else float('inf')
+    print(f"{report['records']} records, {bad_lines} invalid, {report['seconds']:.2f}s ({rate:,.0f} records/s)")
+    if report['by_kind']:
+        print("Errors by type:")
+        width = max(len(kind) for kind in report['by_kind'])
+        for kind, count in report['by_kind'].most_common():
+            print(f"  {kind:<{width}}  {count}")
+
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python check_schema.py <jsonl_file> <avro_schema_file>")
+    if len(sys.argv) < 3:
+        print("Usage: python check_schema.py <jsonl_file> <avro_schema_file> [--report] [--jobs N]")
         sys.exit(1)
 
-    jsonl_file = sys.argv[1]
-    avro_file = sys.argv[2]
+    parser = argparse.ArgumentParser(description="Validate a JSONL file against an Avro schema.")
+    parser.add_argument('jsonl_file')
+    parser.add_argument('avro_schema_file')
+    parser.add_argument('--report', action='store_true',
+                        help="Validate every record and report all failures instead of stopping at the first")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help="Worker processes for --report")
+    parser.add_argument('--chunk-bytes', type=int, default=DEFAULT_CHUNK_BYTES)
+    parser.add_argument('--max-failures', type=int, default=50, help="Failures to print with --report")
+    args = parser.parse_args()
+
+    if not args.report:
+        passed = validate_jsonl_with_avro(args.jsonl_file, args.avro_schema_file)
+    else:
+        try:
+            report = validate_jsonl_report(args.jsonl_file, args.avro_schema_file, args.jobs, args.chunk_bytes)
+        except FileNotFoundError as e:
+            print(f"File not found: {e}")
+            passed = False
+        else:
+            print_report(report, args.max_failures)
+            passed = not report['failures']
 
-    if validate_jsonl_with_avro(jsonl_file, avro_file):
+    if passed:
         print("Schema validation PASSED")
         sys.exit(0)
     else:
@@ -3,17 +3,26 @@
 
 import json
 import os
+import sys
 from pathlib import Path
 import joblib
 import pandas as pd
 
-def generate_model_card(model_path: str, output_path: str):
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.models.model_store import get_model_store
+
+def generate_model_card(model_path: str, output_path: str, version: str = None):
     """Generate a model card with metrics and top features.
 
     Args:
         model_path: Path to trained model
         output_path: Path to write model card
+        version: Model version shown in the card; defaults to the artifact's directory name
     """
+    if version is None:
+        version = Path(model_path).parent.name
+
     # Load model
     model = joblib.load(model_path)
 
@@ -21,6 +30,8 @@ def generate_model_card(model_path: str, output_path: str):
     if hasattr(model, 'feature_importances_'):
         # Dummy feature names (would be loaded from feature store in real impl)
         feature_names = ['f_trip_max_speed', 'f_trip_avg_accel', 'f_trip_harsh_brake_count']
+        if hasattr(model, 'feature_names_in_'):
+            feature_names = list(model.feature_names_in_)
         importances = model.feature_importances_
 
         # Top 5 features
@@ -30,13 +41,13 @@ def generate_model_card(model_path: str, output_path: str):
         top_features = []
 
     # Model card content
-    card = f"""# Model Card: Risk Score GBM v20251109_1
+    card = f"""# Model Card: Risk Score GBM {version}
 
 ## Model Details
 - **Model Type**: Gradient Boosting Machine
 - **Training Date**: 2025-11-09
 - **Framework**: scikit-learn
-- **Version**: v20251109_1
+- **Version**: {version}
 
 ## Intended Use
 This model predicts driver risk scores (0-100) based on telematics features for insurance pricing.
@@ -70,7 +81,10 @@ Data Science Team
     print(f"Model card generated: {output_path}")
 
 if __name__ == "__main__":
-    model_path = "models/riskscore/gbm/v20251109_1/model.pkl"
-    output_path = "models/riskscore/gbm/v20251109_1/MODEL_CARD.md"
+    # Card for the store's active version, or the version given on the command line
+    store = get_model_store()
+    version = sys.argv[1] if len(sys.argv) > 1 else store.resolve_active_version()
+    model_path = store.artifact_path(version)
+    output_path = str(Path(model_path).parent / "MODEL_CARD.md")
 
-    generate_model_card(model_path, output_path)
+    generate_model_card(model_path, output_path, version)
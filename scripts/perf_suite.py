@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""Performance benchmark suite with regression gates for every pipeline stage.
+
+Each (stage, size) case builds deterministic synthetic inputs (seeded fleet
+telemetry, a seeded model) and measures throughput, p50/p99 latency and peak
+RSS. Batch stages time whole calls over ``size`` events; per-call stages time
+each of ``size`` individual calls. Every case runs in a fresh process so peak
+RSS belongs to that case alone.
+
+Results are written as JSON and compared against the baseline; the script
+exits 1 if any case regresses past the thresholds and 2 if there is no
+baseline to compare with. Baselines are machine-specific, so none is
+committed: ``--update-baseline`` stores the run as the new baseline.
+
+    python scripts/perf_suite.py                      # quick profile, gate on baseline
+    python scripts/perf_suite.py --profile full       # 1e3 .. 1e7 events
+    python scripts/perf_suite.py --stages run_dq_checks --sizes 1e6
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+PROFILES = {
+    'quick': [1_000, 10_000, 100_000],
+    'full': [1_000, 10_000, 100_000, 1_000_000, 10_000_000],
+}
+DEFAULT_OUTPUT = 'data/perf/latest.json'
+DEFAULT_BASELINE = 'data/perf/baseline.json'
+MODEL_FEATURES = ['f_trip_max_speed', 'f_trip_avg_accel', 'f_trip_harsh_brake_count']
+
+
+def _events(n: int, seed: int) -> pd.DataFrame:
+    from src.ingestion.telemetry_generator import generate_telemetry_frames
+    return pd.concat(generate_telemetry_frames(n, num_devices=max(10, n // 1_000), seed=seed),
+                     ignore_index=True)
+
+def _features(n: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'f_trip_max_speed': rng.uniform(20, 160, n),
+        'f_trip_avg_accel': rng.gamma(2.0, 0.4, n),
+        'f_trip_harsh_brake_count': rng.poisson(1.0, n).astype(np.float64),
+    }, columns=MODEL_FEATURES)
+
+def _model(seed: int):
+    """A small seeded GBM on synthetic features, so results do not depend on the model store."""
+    from sklearn.ensemble import GradientBoostingRegressor
+    features = _features(2_000, seed)
+    labels = (features['f_trip_max_speed'] / 200 + features['f_trip_harsh_brake_count'] / 10).clip(0, 1)
+    return GradientBoostingRegressor(n_estimators=100, random_state=seed).fit(features, labels)
+
+def _scorer(seed: int):
+    import joblib
+    from src.serving.risk_scorer import RiskScorer
+    path = os.path.join(tempfile.mkdtemp(prefix='perf-model-'), 'model.joblib')
+    joblib.dump(_model(seed), path)
+    return RiskScorer(model_path=path)
+
+
+# Stage setups: (n, seed) -> callable. Batch setups return fn() that processes
+# all n events; per-call setups return (fn(i), warmup) for i in range(n).
+
+def setup_compute_trip_features(n, seed):
+    from src.streaming.telemetry_transform import TRIP_INPUT_COLUMNS, compute_trip_features
+    events = _events(n, seed)[TRIP_INPUT_COLUMNS]
+    # The reference implementation parses ts in place, so each run gets a copy
+    return lambda: compute_trip_features(events.copy())
+
+def setup_compute_trip_features_vectorized(n, seed):
+    from src.streaming.telemetry_transform import TRIP_INPUT_COLUMNS, compute_trip_features_vectorized
+    events = _events(n, seed)[TRIP_INPUT_COLUMNS]
+    return lambda: compute_trip_features_vectorized(events)
+
+def setup_trip_feature_plan(n, seed):
+    from src.features.feature_compiler import compile_manifest
+    plan = compile_manifest()
+    events = _events(n, seed)[plan.input_columns]
+    return lambda: plan.compute(events)
+
+def setup_risk_scorer_score(n, seed):
+    scorer = _scorer(seed)
+    rows = _features(n, seed).to_dict('records')
+    return lambda i: scorer.score(rows[i])
+
+def setup_risk_scorer_score_batch(n, seed):
+    scorer = _scorer(seed)
+    features = _features(n, seed)
+    return lambda: scorer.score_batch(features)
+
+def setup_get_top_features_shap(n, seed):
+    from src.models.explain import create_explainer, get_top_features_shap
+    model = _model(seed)
+    explainer = create_explainer(model)
+    features = _features(n, seed)
+    rows = [features.iloc[i:i + 1] for i in range(n)]
+    return lambda i: get_top_features_shap(model, rows[i], explainer=explainer)
+
+def setup_run_dq_checks(n, seed):
+    from src.dq.local_checks import run_dq_checks
+    events = _events(n, seed)
+    return lambda: run_dq_checks(events)
+
+def _records(n, seed) -> List[Dict[str, Any]]:
+    from src.ingestion.telemetry_generator import _to_records
+    return _to_records(_events(n, seed))
+
+def setup_validate_telemetry_event(n, seed):
+    from src.utils.schema_validator import validate_telemetry_event
+    records = _records(n, seed)
+    return lambda i: validate_telemetry_event(records[i])
+
+def setup_validate_telemetry_batch(n, seed):
+    from src.utils.schema_validator import validate_telemetry_batch
+    records = _records(n, seed)
+    return lambda: validate_telemetry_batch(records)
+
+def setup_map_score_to_premium(n, seed):
+    from src.models.pricing_engine import map_score_to_premium
+    rng = np.random.default_rng(seed)
+    premiums = rng.uniform(500, 3_000, n).tolist()
+    scores = rng.uniform(0, 100, n).tolist()
+    return lambda i: map_score_to_premium(premiums[i], scores[i])
+
+def setup_reprice_scenarios(n, seed):
+    from src.models.repricing import Scenarios, reprice_scenarios
+    rng = np.random.default_rng(seed)
+    premiums = rng.uniform(500, 3_000, n)
+    scores = rng.uniform(0, 100, n)
+    scenarios = Scenarios.grid([0.01, 0.02, 0.05], [None, 0.1], [None, 0.1])
+    return lambda: reprice_scenarios(premiums, scores, scenarios)
+
+def _drift_monitor(seed):
+    from src.dq.drift import DriftMonitor, build_baseline
+    return DriftMonitor(build_baseline(_features(100_000, seed), MODEL_FEATURES))
+
+def setup_drift_observe(n, seed):
+    monitor = _drift_monitor(seed)
+    matrix = _features(n, seed).to_numpy(dtype=np.float32)
+    return lambda i: monitor.observe(matrix[i:i + 1], MODEL_FEATURES)
+
+def setup_drift_observe_batch(n, seed):
+    # Micro-batches of the model server's default MODEL_SERVER_MAX_BATCH_SIZE
+    monitor = _drift_monitor(seed)
+    matrix = _features(n, seed).to_numpy(dtype=np.float32)
+    batches = [matrix[start:start + 256] for start in range(0, n, 256)]
+
+    def run():
+        for batch in batches:
+            monitor.observe(batch, MODEL_FEATURES)
+    return run
+
+# name -> (setup, mode, largest size run by default)
+STAGES: Dict[str, Tuple[Callable, str, int]] = {
+    'compute_trip_features': (setup_compute_trip_features, 'batch', 100_000),
+    'compute_trip_features_vectorized': (setup_compute_trip_features_vectorized, 'batch', 10_000_000),
+    'trip_feature_plan': (setup_trip_feature_plan, 'batch', 10_000_000),
+    'risk_scorer_score': (setup_risk_scorer_score, 'call', 100_000),
+    'risk_scorer_score_batch': (setup_risk_scorer_score_batch, 'batch', 10_000_000),
+    'get_top_features_shap': (setup_get_top_features_shap, 'call', 10_000),
+    'run_dq_checks': (setup_run_dq_checks, 'batch', 10_000_000),
+    'validate_telemetry_event': (setup_validate_telemetry_event, 'call', 10_000),
+    'validate_telemetry_batch': (setup_validate_telemetry_batch, 'batch', 1_000_000),
+    'map_score_to_premium': (setup_map_score_to_premium, 'call', 1_000_000),
+    'reprice_scenarios': (setup_reprice_scenarios, 'batch', 10_000_000),
+    'drift_observe': (setup_drift_observe, 'call', 1_000_000),
+    'drift_observe_batch': (setup_drift_observe_batch, 'batch', 10_000_000),
+}
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def run_case(stage: str, size: int, seed: int, repeat: int) -> Dict[str, Any]:
+    """Set up and measure one (stage, size) case in the current process."""
+    setup, mode, _ = STAGES[stage]
+    fn = setup(size, seed)
+    setup_rss_mb = _peak_rss_mb()
+
+    if mode == 'batch':
+        fn()  # warm-up: imports, caches, first-touch allocations
+        latencies = np.empty(repeat)
+        for r in range(repeat):
+            start = time.perf_counter()
+            fn()
+            latencies[r] = time.perf_counter() - start
+        throughput = size / float(np.median(latencies))
+    else:
+        for i in range(min(size, 10)):
+            fn(i)
+        latencies = np.empty(size)
+        clock = time.perf_counter
+        for i in range(size):
+            start = clock()
+            fn(i)
+            latencies[i] = clock() - start
+        throughput = size / float(latencies.sum())
+
+    return {
+        'mode': mode,
+        'throughput_per_s': throughput,
+        'p50_ms': float(np.percentile(latencies, 50)) * 1e3,
+        'p99_ms': float(np.percentile(latencies, 99)) * 1e3,
+        'samples': int(len(latencies)),
+        'setup_rss_mb': setup_rss_mb,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+def run_suite(stages: List[str], sizes: List[int], seed: int, repeat: int, in_process: bool,
+              uncapped: bool) -> Dict[str, Dict[str, Any]]:
+    results: Dict[str, Dict[str, Any]] = {}
+    for stage in stages:
+        cap = STAGES[stage][2]
+        for size in sizes:
+            if size > cap and not uncapped:
+                print(f"{stage:<34} {size:>10}  skipped (above default cap {cap:.0e}; --uncapped runs it)")
+                continue
+            if in_process:
+                result = run_case(stage, size, seed, repeat)
+            else:
+                # A fresh process per case keeps peak RSS attributable to the case
+                with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+                    result = pool.submit(run_case, stage, size, seed, repeat).result()
+            results.setdefault(stage, {})[str(size)] = result
+            print(f"{stage:<34} {size:>10}  {result['throughput_per_s']:>14,.0f}/s  "
+                  f"p50 {result['p50_ms']:>10.4f} ms  p99 {result['p99_ms']:>10.4f} ms  "
+                  f"peak {result['peak_rss_mb']:>8.1f} MB")
+    return results
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], max_throughput_drop: float,
+            max_latency_increase: float, max_rss_increase: float) -> List[str]:
+    """Regressions of ``current`` against ``baseline`` beyond the thresholds (fractions)."""
+    regressions = []
+    for stage, by_size in current['results'].items():
+        for size, result in by_size.items():
+            base = baseline['results'].get(stage, {}).get(size)
+            if base is None:
+                continue
+            case = f"{stage}@{size}"
+            drop = 1 - result['throughput_per_s'] / base['throughput_per_s']
+            if drop > max_throughput_drop:
+                regressions.append(f"{case}: throughput {result['throughput_per_s']:,.0f}/s is "
+                                   f"{drop:.0%} below baseline {base['throughput_per_s']:,.0f}/s")
+            for metric in ('p50_ms', 'p99_ms'):
+                increase = result[metric] / base[metric] - 1 if base[metric] > 0 else 0.0
+                if increase > max_latency_increase:
+                    regressions.append(f"{case}: {metric} {result[metric]:.4f} is {increase:.0%} "
+                                       f"above baseline {base[metric]:.4f}")
+            increase = result['peak_rss_mb'] / base['peak_rss_mb'] - 1
+            if increase > max_rss_increase:
+                regressions.append(f"{case}: peak RSS {result['peak_rss_mb']:.1f} MB is {increase:.0%} "
+                                   f"above baseline {base['peak_rss_mb']:.1f} MB")
+    return regressions
+
+def _metadata(seed: int, repeat: int) -> Dict[str, Any]:
+    import sklearn
+    return {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'seed': seed,
+        'repeat': repeat,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+def _write_json(path: str, data: Dict[str, Any]):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run the pipeline performance suite and gate on a baseline.")
+    parser.add_argument('--stages', nargs='+', choices=sorted(STAGES), default=list(STAGES))
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='quick')
+    parser.add_argument('--sizes', nargs='+', type=lambda s: int(float(s)), default=None,
+                        help="Event counts, e.g. 1e3 1e5; overrides --profile")
+    parser.add_argument('--uncapped', action='store_true',
+                        help="Run sizes above a stage's default cap (e.g. 1e7 calls of the reference code)")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed runs per batch case")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--update-baseline', action='store_true', help="Store this run as the baseline")
+    parser.add_argument('--max-throughput-drop', type=float, default=0.25)
+    parser.add_argument('--max-latency-increase', type=float, default=0.5)
+    parser.add_argument('--max-rss-increase', type=float, default=0.25)
+    parser.add_argument('--in-process', action='store_true',
+                        help="Run every case in this process (faster; peak RSS is cumulative)")
+    args = parser.parse_args()
+
+    sizes = args.sizes or PROFILES[args.profile]
+    report = {
+        'meta': _metadata(args.seed, args.repeat),
+        'results': run_suite(args.stages, sizes, args.seed, args.repeat, args.in_process, args.uncapped),
+    }
+    _write_json(args.output, report)
+    print(f"Results written to {args.output}")
+
+    if args.update_baseline:
+        _write_json(args.baseline, report)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; nothing was compared. Run with --update-baseline on this "
+              f"machine to create one")
+        return 2
+
+    with open(args.baseline, 'r') as f:
+        baseline = json.load(f)
+    regressions = compare(report, baseline, args.max_throughput_drop, args.max_latency_increase,
+                          args.max_rss_increase)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    print(f"{len(regressions)} regressions against {args.baseline}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,27 @@
 """Privacy and data subject rights API endpoints."""
 
-import uuid
-from datetime import datetime
-from typing import Dict, Any
+import logging
+import threading
+from typing import Dict, Any, Optional
 from flask import Blueprint, request, jsonify
 
+from src.control_plane.privacy_jobs import PrivacyJobEngine
 from src.utils.config import get_config
 
 privacy_bp = Blueprint('privacy', __name__)
+logger = logging.getLogger(__name__)
+
+_engine: Optional[PrivacyJobEngine] = None
+_engine_lock = threading.Lock()
+
+def get_engine() -> PrivacyJobEngine:
+    """The process-wide job engine, created from the config and started on first use."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = PrivacyJobEngine.from_config(get_config())
+            _engine.start()
+        return _engine
 
 @privacy_bp.route('/data/export', methods=['POST'])
 def export_data():
@@ -21,10 +35,8 @@ def export_data():
     if not hashed_driver_id:
         return jsonify({"error": "hashed_driver_id required"}), 400
 
-    request_id = str(uuid.uuid4())
-    # TODO: Queue export job
-    # For now, just log the request
-    print(f"Export request queued: {request_id} for driver {hashed_driver_id}")
+    request_id = get_engine().submit('export', hashed_driver_id)
+    logger.info("Export request queued: %s for driver %s", request_id, hashed_driver_id)
 
     return jsonify({
         "request_id": request_id,
@@ -44,9 +56,8 @@ def delete_data():
     if not hashed_driver_id:
         return jsonify({"error": "hashed_driver_id required"}), 400
 
-    request_id = str(uuid.uuid4())
-    # TODO: Queue deletion job
-    print(f"Deletion request queued: {request_id} for driver {hashed_driver_id}")
+    request_id = get_engine().submit('delete', hashed_driver_id)
+    logger.info("Deletion request queued: %s for driver %s", request_id, hashed_driver_id)
 
     return jsonify({
         "request_id": request_id,
@@ -59,12 +70,10 @@ def get_request_status(request_id: str):
     """Get status of privacy request.
 
     Returns: {"request_id": "uuid", "status": "queued|processing|completed|failed", "details": {...}}
+    where details holds the job type, files_done/files_total, progress (0-1),
+    rows_matched and, for completed exports, output_path.
     """
-    # TODO: Query actual status from database
-    # Mock response for now
-    return jsonify({
-        "request_id": request_id,
-        "status": "queued",
-        "created_at": datetime.utcnow().isoformat(),
-        "details": {"message": "Request is queued for processing"}
-    })
+    status = get_engine().status(request_id)
+    if status is None:
+        return jsonify({"error": "Unknown request_id"}), 404
+    return jsonify(status)
@@ -0,0 +1,122 @@
+"""Trip history API endpoints for the dashboard, served from the telemetry index."""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+from flask import Blueprint, jsonify
+
+from src.control_plane.privacy_jobs import PrivacyJobStore
+from src.features.feature_compiler import compile_manifest
+from src.ingestion.telemetry_index import TelemetryIndex
+from src.utils.config import get_config
+
+trips_bp = Blueprint('trips', __name__)
+logger = logging.getLogger(__name__)
+
+SUMMARY_FEATURES = ['f_trip_max_speed', 'f_trip_harsh_brake_count']
+KM_PER_MILE = 1.609344
+
+_index: Optional[TelemetryIndex] = None
+_index_lock = threading.Lock()
+_refresher: Optional[threading.Thread] = None
+_jobs: Optional[PrivacyJobStore] = None
+
+def _refresh_index(index: TelemetryIndex, raw_dir: str, interval_s: float):
+    # Index new raw data off the request path; lookups keep using the loaded
+    # segments until the update swaps the new ones in
+    while True:
+        try:
+            indexed = index.update(raw_dir)
+            if indexed:
+                logger.info("Indexed %d new bytes/row groups of raw telemetry", indexed)
+        except Exception:
+            logger.exception("Telemetry index refresh failed")
+        time.sleep(interval_s)
+
+def get_index() -> TelemetryIndex:
+    """The telemetry index; a background thread picks up new raw files every TELEMETRY_INDEX_REFRESH_S."""
+    global _index, _refresher
+    with _index_lock:
+        if _index is None:
+            config = get_config()
+            _index = TelemetryIndex(config.get('TELEMETRY_INDEX_DIR', '/data/telemetry_index'))
+            _refresher = threading.Thread(
+                target=_refresh_index, name='telemetry-index-refresh', daemon=True,
+                args=(_index, config.get('TELEMETRY_RAW_DIR', '/data/raw'),
+                      float(config.get('TELEMETRY_INDEX_REFRESH_S', 60))))
+            _refresher.start()
+        return _index
+
+def get_jobs() -> PrivacyJobStore:
+    """The privacy job table, to hide raw telemetry of drivers whose data was deleted."""
+    global _jobs
+    with _index_lock:
+        if _jobs is None:
+            _jobs = PrivacyJobStore(get_config().get('PRIVACY_JOB_DB', '/data/privacy/jobs.sqlite'))
+        return _jobs
+
+def visible_events(events: pd.DataFrame, user_id: str) -> pd.DataFrame:
+    """Drop the driver's events up to their latest delete request.
+
+    Delete jobs rewrite the telemetry store, not the raw files this API reads.
+    """
+    deleted_before = get_jobs().deleted_before(user_id)
+    if deleted_before is None or events.empty:
+        return events
+    cutoff = pd.Timestamp(deleted_before, tz='UTC')
+    return events[events['ts'] > cutoff]
+
+def summarize_trips(events: pd.DataFrame) -> List[Dict[str, Any]]:
+    """One summary per trip, in the shape the dashboard's trip list expects."""
+    if events.empty:
+        return []
+    plan = compile_manifest().select(SUMMARY_FEATURES)
+    features = plan.compute(events).set_index('trip_id')
+    spans = events.groupby('trip_id', observed=True).agg(
+        start_time=('ts', 'min'), end_time=('ts', 'max'), events=('ts', 'size'),
+        odometer_start=('odometer_km', 'min'), odometer_end=('odometer_km', 'max'))
+    trips = []
+    for trip_id, span in spans.sort_values('start_time').iterrows():
+        distance_km = float(span['odometer_end'] - span['odometer_start'])
+        trips.append({
+            'id': str(trip_id),
+            'start_time': span['start_time'].isoformat().replace('+00:00', 'Z'),
+            'end_time': span['end_time'].isoformat().replace('+00:00', 'Z'),
+            'event_count': int(span['events']),
+            'distance_mi': round(distance_km / KM_PER_MILE, 1) if pd.notna(distance_km) else None,
+            'max_speed': round(float(features.at[trip_id, 'f_trip_max_speed']) / KM_PER_MILE, 1),
+            'harsh_brakes': int(features.at[trip_id, 'f_trip_harsh_brake_count']),
+        })
+    return trips
+
+def _summary_columns() -> List[str]:
+    columns = compile_manifest().select(SUMMARY_FEATURES).input_columns
+    return list(dict.fromkeys(columns + ['ts', 'odometer_km']))
+
+@trips_bp.route('/users/<user_id>/trips', methods=['GET'])
+def list_trips(user_id: str):
+    """List a driver's trips.
+
+    ``user_id`` is the hashed_driver_id.
+    Returns: {"trips": [{"id", "start_time", "end_time", "event_count", "distance_mi", "max_speed" (mph), "harsh_brakes"}]}
+    """
+    events = get_index().lookup('hashed_driver_id', user_id, columns=_summary_columns())
+    events = visible_events(events, user_id)
+    return jsonify({"trips": summarize_trips(events)})
+
+@trips_bp.route('/users/<user_id>/trips/<trip_id>', methods=['GET'])
+def get_trip(user_id: str, trip_id: str):
+    """Get one trip's summary and events, if it belongs to the driver."""
+    events = get_index().lookup('trip_id', trip_id)
+    events = visible_events(events[events['hashed_driver_id'] == user_id], user_id)
+    if events.empty:
+        return jsonify({"error": "Trip not found"}), 404
+
+    trip = summarize_trips(events)[0]
+    records = events.assign(ts=events['ts'].dt.strftime('%Y-%m-%dT%H:%M:%S.%fZ'))
+    trip['events'] = [{key: (None if pd.isna(value) else value) for key, value in record.items()}
+                      for record in records.astype(object).to_dict(orient='records')]
+    return jsonify(trip)
@@ -0,0 +1,518 @@
+"""Batched privacy export and deletion jobs over the partitioned telemetry store.
+
+Requests are persisted in a job table (SQLite here, standing in for the
+configured Postgres) and claimed in batches: one pass over the store serves
+every queued ``hashed_driver_id`` at once, so the cost of a pass depends on
+the files holding those drivers rather than on the number of requests. A
+driver -> file index kept in the same database means a pass only opens files
+that contain a requested driver; files whose size or mtime changed since they
+were indexed are re-read first.
+
+Exports are streamed to one gzip JSONL file per request. Deletions rewrite
+only the affected Parquet files, writing beside the original and swapping it
+in with ``os.replace``. Files are processed by a bounded thread pool (pyarrow
+releases the GIL while decoding and encoding), and each job's progress is
+the number of its files done out of the files that hold its driver.
+"""
+
+import gzip
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from src.ingestion.telemetry_store import (DEFAULT_ROW_GROUP_SIZE, METADATA_FILENAME, TELEMETRY_ARROW_SCHEMA,
+                                           open_store)
+
+logger = logging.getLogger(__name__)
+
+JOB_KINDS = ('export', 'delete')
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_BATCH = 500
+DEFAULT_POLL_INTERVAL_S = 1.0
+# gzip level for exports; 9 costs several times the CPU for a few percent smaller files
+EXPORT_COMPRESSLEVEL = 6
+EXPORT_BATCH_ROWS = 65_536
+# Bound on the parameters of one SQL ``IN (...)`` list
+_SQL_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS privacy_jobs (
+    request_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    hashed_driver_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    files_total INTEGER NOT NULL DEFAULT 0,
+    files_done INTEGER NOT NULL DEFAULT 0,
+    rows_matched INTEGER NOT NULL DEFAULT 0,
+    output_path TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS privacy_jobs_status ON privacy_jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS privacy_jobs_driver ON privacy_jobs (hashed_driver_id, kind);
+CREATE TABLE IF NOT EXISTS indexed_files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS file_drivers (
+    hashed_driver_id TEXT NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (hashed_driver_id, path)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS file_drivers_path ON file_drivers (path);
+"""
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+def _chunks(values: List[Any], size: int = _SQL_CHUNK) -> Iterable[List[Any]]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class PrivacyJobStore:
+    """Job table and driver -> file index in one SQLite database (thread-safe).
+
+    One engine process should own a database; claiming is not coordinated
+    across processes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def create(self, kind: str, hashed_driver_id: str) -> str:
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown privacy job kind: {kind}")
+        request_id = str(uuid.uuid4())
+        now = _now()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO privacy_jobs (request_id, kind, hashed_driver_id, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?)", (request_id, kind, hashed_driver_id, now, now))
+        return request_id
+
+    def get(self, request_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM privacy_jobs WHERE request_id = ?", (request_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def count(self, status: str) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM privacy_jobs WHERE status = ?", (status,)).fetchone()[0]
+
+    def claim(self, limit: int) -> List[Dict[str, Any]]:
+        """Mark up to ``limit`` of the oldest queued jobs as processing and return them."""
+        with self._lock, self._conn:
+            rows = [dict(row) for row in self._conn.execute(
+                "SELECT * FROM privacy_jobs WHERE status = 'queued' ORDER BY created_at LIMIT ?", (limit,))]
+            now = _now()
+            self._conn.executemany(
+                "UPDATE privacy_jobs SET status = 'processing', updated_at = ?, files_total = 0, files_done = 0, "
+                "rows_matched = 0 WHERE request_id = ?", [(now, row['request_id']) for row in rows])
+        return rows
+
+    def deleted_before(self, hashed_driver_id: str) -> Optional[datetime]:
+        """Submission time (naive UTC) of the driver's latest delete job that has not failed, if any.
+
+        Data up to that time is deleted, or queued for deletion, from the
+        telemetry store; readers of other copies should hide it.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(created_at) FROM privacy_jobs WHERE hashed_driver_id = ? AND kind = 'delete' "
+                "AND status != 'failed'", (hashed_driver_id,)).fetchone()
+        return datetime.fromisoformat(row[0]) if row[0] is not None else None
+
+    def requeue_processing(self) -> int:
+        """Put jobs left processing by a stopped engine back in the queue (jobs are idempotent)."""
+        with self._lock, self._conn:
+            return self._conn.execute("UPDATE privacy_jobs SET status = 'queued', updated_at = ? "
+                                      "WHERE status = 'processing'", (_now(),)).rowcount
+
+    def set_totals(self, totals: Dict[str, int]):
+        now = _now()
+        with self._lock, self._conn:
+            self._conn.executemany("UPDATE privacy_jobs SET files_total = ?, updated_at = ? WHERE request_id = ?",
+                                   [(total, now, request_id) for request_id, total in totals.items()])
+
+    def advance(self, progress: List[Tuple[str, int]]):
+        """Count one more file done for each (request_id, rows matched in it)."""
+        now = _now()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE privacy_jobs SET files_done = files_done + 1, rows_matched = rows_matched + ?, "
+                "updated_at = ? WHERE request_id = ?", [(rows, now, request_id) for request_id, rows in progress])
+
+    def finish(self, request_id: str, status: str, output_path: Optional[str] = None, error: Optional[str] = None):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE privacy_jobs SET status = ?, output_path = ?, error = ?, updated_at = ? "
+                               "WHERE request_id = ?", (status, output_path, error, _now(), request_id))
+
+    def stale_files(self, stats: Dict[str, Tuple[int, int]]) -> List[str]:
+        """Files in ``stats`` (path -> (size, mtime_ns)) that are new or changed since indexed; forgets
+        indexed files that are gone."""
+        with self._lock:
+            indexed = {row['path']: (row['size'], row['mtime_ns'])
+                       for row in self._conn.execute("SELECT path, size, mtime_ns FROM indexed_files")}
+        gone = [path for path in indexed if path not in stats]
+        if gone:
+            self.forget_files(gone)
+        return [path for path, stat in stats.items() if indexed.get(path) != tuple(stat)]
+
+    def index_file(self, path: str, size: int, mtime_ns: int, driver_ids: Iterable[str]):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM file_drivers WHERE path = ?", (path,))
+            self._conn.executemany("INSERT INTO file_drivers (hashed_driver_id, path) VALUES (?, ?)",
+                                   [(driver_id, path) for driver_id in driver_ids])
+            self._conn.execute("INSERT OR REPLACE INTO indexed_files (path, size, mtime_ns) VALUES (?, ?, ?)",
+                               (path, size, mtime_ns))
+
+    def forget_files(self, paths: List[str]):
+        with self._lock, self._conn:
+            for chunk in _chunks(paths):
+                marks = ','.join('?' * len(chunk))
+                self._conn.execute(f"DELETE FROM file_drivers WHERE path IN ({marks})", chunk)
+                self._conn.execute(f"DELETE FROM indexed_files WHERE path IN ({marks})", chunk)
+
+    def files_for_drivers(self, driver_ids: Iterable[str]) -> Dict[str, List[str]]:
+        """Indexed files holding rows of each driver (drivers without rows are absent)."""
+        locations: Dict[str, List[str]] = {}
+        with self._lock:
+            for chunk in _chunks(sorted(set(driver_ids))):
+                marks = ','.join('?' * len(chunk))
+                for row in self._conn.execute(
+                        f"SELECT hashed_driver_id, path FROM file_drivers WHERE hashed_driver_id IN ({marks})", chunk):
+                    locations.setdefault(row['hashed_driver_id'], []).append(row['path'])
+        return locations
+
+
+def _json_ready(table: pa.Table) -> pa.Table:
+    """Timestamps as ISO-8601 strings with a trailing 'Z', as devices send them."""
+    for index, field in enumerate(table.schema):
+        if pa.types.is_timestamp(field.type):
+            table = table.set_column(index, field.name,
+                                     pc.strftime(table.column(index), format='%Y-%m-%dT%H:%M:%SZ'))
+    return table
+
+
+class _ExportStream:
+    """Gzip JSONL output of one export job, shared by the file workers."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._partial = f"{path}.partial"
+        self._file = gzip.open(self._partial, 'wt', encoding='utf-8', compresslevel=EXPORT_COMPRESSLEVEL)
+        self._lock = threading.Lock()
+
+    def write(self, table: pa.Table):
+        # pandas' C JSON encoder is much faster than json.dumps per row
+        for batch in _json_ready(table).to_batches(max_chunksize=EXPORT_BATCH_ROWS):
+            frame = batch.to_pandas(types_mapper={pa.int32(): pd.Int32Dtype()}.get)
+            lines = frame.to_json(orient='records', lines=True)
+            with self._lock:
+                self._file.write(lines)
+
+    def close(self, keep: bool):
+        self._file.close()
+        if keep:
+            os.replace(self._partial, self.path)
+        else:
+            os.remove(self._partial)
+
+def _file_driver_ids(path: str) -> List[str]:
+    column = pq.ParquetFile(path).read(columns=['hashed_driver_id']).column(0)
+    return [value for value in pc.unique(column).to_pylist() if value is not None]
+
+
+class PrivacyJobEngine:
+    """Run privacy export/deletion jobs in batched passes over a telemetry store.
+
+    Args:
+        store_root: Telemetry store directory (see ``telemetry_store``).
+        jobs: Job table and file index.
+        export_dir: Where ``<request_id>.jsonl.gz`` exports are written.
+        workers: Files processed concurrently within a pass.
+        max_batch: Jobs claimed per pass.
+        poll_interval_s: How often the background thread checks for jobs
+                         submitted by other processes.
+        compression: Codec for rewritten Parquet files.
+    """
+
+    def __init__(self, store_root: str, jobs: PrivacyJobStore, export_dir: str, workers: int = DEFAULT_WORKERS,
+                 max_batch: int = DEFAULT_MAX_BATCH, poll_interval_s: float = DEFAULT_POLL_INTERVAL_S,
+                 compression: str = 'zstd'):
+        self.store_root = store_root
+        self.jobs = jobs
+        self.export_dir = export_dir
+        self.workers = workers
+        self.max_batch = max_batch
+        self.poll_interval_s = poll_interval_s
+        self.compression = compression
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pass_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]] = None) -> 'PrivacyJobEngine':
+        """Engine with the PRIVACY_* and TELEMETRY_STORE_ROOT settings from the config."""
+        if config is None:
+            from src.utils.config import get_config
+            config = get_config()
+        return cls(
+            store_root=config.get('TELEMETRY_STORE_ROOT', '/data/telemetry_store'),
+            jobs=PrivacyJobStore(config.get('PRIVACY_JOB_DB', '/data/privacy/jobs.sqlite')),
+            export_dir=config.get('PRIVACY_EXPORT_DIR', '/data/privacy/exports'),
+            workers=int(config.get('PRIVACY_WORKERS', DEFAULT_WORKERS)),
+            max_batch=int(config.get('PRIVACY_MAX_BATCH', DEFAULT_MAX_BATCH)),
+        )
+
+    def submit(self, kind: str, hashed_driver_id: str) -> str:
+        """Queue a job and return its request id."""
+        request_id = self.jobs.create(kind, hashed_driver_id)
+        self._wake.set()
+        return request_id
+
+    def status(self, request_id: str) -> Optional[Dict[str, Any]]:
+        job = self.jobs.get(request_id)
+        if job is None:
+            return None
+        total, done = job['files_total'], job['files_done']
+        if job['status'] == 'completed':
+            progress = 1.0
+        else:
+            progress = done / total if total else 0.0
+        return {
+            'request_id': request_id,
+            'status': job['status'],
+            'created_at': job['created_at'],
+            'details': {
+                'type': job['kind'],
+                'updated_at': job['updated_at'],
+                'files_total': total,
+                'files_done': done,
+                'progress': round(progress, 4),
+                'rows_matched': job['rows_matched'],
+                'output_path': job['output_path'],
+                'error': job['error'],
+            },
+        }
+
+    def start(self):
+        """Requeue jobs interrupted by a previous run and process jobs in a background thread."""
+        if self._thread is not None:
+            return
+        requeued = self.jobs.requeue_processing()
+        if requeued:
+            logger.info("Requeued %d interrupted privacy jobs", requeued)
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._loop, name='privacy-jobs', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop after the pass in progress."""
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _loop(self):
+        while not self._stopping.is_set():
+            try:
+                if self.run_pass():
+                    continue
+            except Exception:
+                logger.exception("Privacy job pass failed")
+            self._wake.wait(self.poll_interval_s)
+            self._wake.clear()
+
+    def run_pending(self) -> int:
+        """Process queued jobs in the calling thread until none are left; returns jobs processed."""
+        processed = 0
+        while True:
+            count = self.run_pass()
+            if not count:
+                return processed
+            processed += count
+
+    def run_pass(self) -> int:
+        """Claim up to ``max_batch`` queued jobs and process them in one pass; returns jobs claimed."""
+        with self._pass_lock:
+            jobs = self.jobs.claim(self.max_batch)
+            if not jobs:
+                return 0
+            try:
+                self._process(jobs)
+            except Exception as e:
+                logger.exception("Privacy pass over %d jobs failed", len(jobs))
+                for job in jobs:
+                    self.jobs.finish(job['request_id'], 'failed', error=str(e))
+            return len(jobs)
+
+    def _store_files(self) -> Dict[str, Tuple[int, int]]:
+        if not os.path.exists(os.path.join(self.store_root, METADATA_FILENAME)):
+            return {}
+        stats = {}
+        for path in open_store(self.store_root).files:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            stats[path] = (st.st_size, st.st_mtime_ns)
+        return stats
+
+    def _index(self, path: str):
+        st = os.stat(path)
+        self.jobs.index_file(path, st.st_size, st.st_mtime_ns, _file_driver_ids(path))
+
+    def _refresh_index(self, pool: ThreadPoolExecutor):
+        stale = self.jobs.stale_files(self._store_files())
+        if not stale:
+            return
+        logger.info("Indexing %d telemetry files for privacy lookups", len(stale))
+        for path, future in [(path, pool.submit(self._index, path)) for path in stale]:
+            try:
+                future.result()
+            except Exception as e:
+                # Typically a file still being written; it is retried on the next pass
+                logger.warning("Could not index %s: %s", path, e)
+
+    def _process(self, jobs: List[Dict[str, Any]]):
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='privacy') as pool:
+            self._refresh_index(pool)
+            locations = self.jobs.files_for_drivers(job['hashed_driver_id'] for job in jobs)
+            self.jobs.set_totals({job['request_id']: len(locations.get(job['hashed_driver_id'], ()))
+                                  for job in jobs})
+
+            jobs_by_driver: Dict[str, List[str]] = {}
+            exports: Dict[str, List[_ExportStream]] = {}
+            streams: Dict[str, _ExportStream] = {}
+            deletes: Set[str] = set()
+            if any(job['kind'] == 'export' for job in jobs):
+                os.makedirs(self.export_dir, exist_ok=True)
+            for job in jobs:
+                driver = job['hashed_driver_id']
+                jobs_by_driver.setdefault(driver, []).append(job['request_id'])
+                if job['kind'] == 'export':
+                    stream = _ExportStream(os.path.join(self.export_dir, f"{job['request_id']}.jsonl.gz"))
+                    streams[job['request_id']] = stream
+                    exports.setdefault(driver, []).append(stream)
+                else:
+                    deletes.add(driver)
+
+            files: Dict[str, Set[str]] = {}
+            for driver, paths in locations.items():
+                for path in paths:
+                    files.setdefault(path, set()).add(driver)
+
+            futures = {path: pool.submit(self._process_file, path, drivers, jobs_by_driver, exports, deletes)
+                       for path, drivers in files.items()}
+            failed: Dict[str, str] = {}
+            for path, future in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.exception("Privacy processing of %s failed", path)
+                    for driver in files[path]:
+                        failed.setdefault(driver, f"{os.path.basename(path)}: {e}")
+
+        for job in jobs:
+            request_id = job['request_id']
+            error = failed.get(job['hashed_driver_id'])
+            stream = streams.get(request_id)
+            if stream is not None:
+                stream.close(keep=error is None)
+            if error is not None:
+                self.jobs.finish(request_id, 'failed', error=error)
+            else:
+                self.jobs.finish(request_id, 'completed', output_path=stream.path if stream is not None else None)
+        logger.info("Privacy pass finished: %d jobs over %d files", len(jobs), len(files))
+
+    def _process_file(self, path: str, drivers: Set[str], jobs_by_driver: Dict[str, List[str]],
+                      exports: Dict[str, List[_ExportStream]], deletes: Set[str]):
+        table = pq.ParquetFile(path).read()
+        ids = table.column('hashed_driver_id')
+        matched = table.filter(pc.is_in(ids, value_set=pa.array(sorted(drivers), type=pa.string())))
+        counts = {row['values']: row['counts']
+                  for row in pc.value_counts(matched.column('hashed_driver_id')).to_pylist()}
+
+        for driver in drivers:
+            if driver in exports and counts.get(driver):
+                rows = matched.filter(pc.equal(matched.column('hashed_driver_id'), driver))
+                for stream in exports[driver]:
+                    stream.write(rows)
+
+        # Exports in the same pass see the rows before they are deleted
+        to_delete = sorted(drivers & deletes)
+        if to_delete and any(counts.get(driver) for driver in to_delete):
+            keep = table.filter(pc.invert(pc.is_in(ids, value_set=pa.array(to_delete, type=pa.string()))))
+            self._rewrite(path, keep)
+
+        self.jobs.advance([(request_id, counts.get(driver, 0))
+                           for driver in drivers for request_id in jobs_by_driver[driver]])
+
+    def _rewrite(self, path: str, table: pa.Table):
+        """Replace ``path`` with ``table``, or remove it when no rows are left."""
+        if not table.num_rows:
+            os.remove(path)
+            self.jobs.forget_files([path])
+            return
+        directory, name = os.path.split(path)
+        # A leading '.' keeps the partial file out of dataset scans
+        partial = os.path.join(directory, f".{name}.{uuid.uuid4().hex[:8]}.tmp")
+        row_group_size = pq.ParquetFile(path).metadata.row_group(0).num_rows or DEFAULT_ROW_GROUP_SIZE
+        try:
+            pq.write_table(table.cast(TELEMETRY_ARROW_SCHEMA), partial, row_group_size=row_group_size,
+                           compression=self.compression, use_dictionary=True, write_statistics=True)
+            os.replace(partial, path)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        self._index(path)
+
+# Example usage
+if __name__ == "__main__":
+    import tempfile
+    from src.ingestion.telemetry_store import convert_to_store, read_telemetry_store
+
+    logging.basicConfig(level=logging.INFO)
+    workdir = tempfile.mkdtemp()
+    root = os.path.join(workdir, 'telemetry')
+    convert_to_store('data/samples/poc_telemetry.jsonl', root)
+    driver = read_telemetry_store(root, columns=['hashed_driver_id'])['hashed_driver_id'].dropna().iloc[0]
+
+    engine = PrivacyJobEngine(root, PrivacyJobStore(os.path.join(workdir, 'jobs.sqlite')),
+                              os.path.join(workdir, 'exports'))
+    export_id = engine.submit('export', driver)
+    delete_id = engine.submit('delete', driver)
+    engine.run_pending()
+    print(json.dumps(engine.status(export_id), indent=2))
+    print(json.dumps(engine.status(delete_id), indent=2))
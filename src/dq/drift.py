@@ -0,0 +1,459 @@
+"""Feature drift monitoring with mergeable sketches.
+
+Live feature values are folded into a :class:`DriftSketch`. Per feature it
+keeps a log-bucketed quantile sketch, in the style of DDSketch: every
+quantile is within ``relative_accuracy`` of the true value. The sketch is a
+count array of a fixed size, so memory does not grow with the rows seen.
+Fixed-bin histograms over edges taken from the training data are read off
+the bucket counts, so each row costs a single bucket update. Sketches built
+by different serving workers, or over different time windows, combine
+exactly with :meth:`DriftSketch.merge`.
+
+At training time :func:`build_baseline` sketches the training features, and
+the result is saved as ``drift_baseline.json`` next to the model artifact. A
+:class:`DriftMonitor` on the scoring path compares its live window with that
+baseline. It computes PSI over the histogram bins and the Kolmogorov-Smirnov
+statistic over the sketch buckets, and flags features past the thresholds.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+DRIFT_BASELINE_FILENAME = 'drift_baseline.json'
+DEFAULT_RELATIVE_ACCURACY = 0.01
+DEFAULT_MIN_VALUE = 1e-3
+DEFAULT_MAX_BUCKETS = 2048
+DEFAULT_BINS = 10
+DEFAULT_BUFFER_ROWS = 4096
+DEFAULT_CHUNK_ROWS = 1_000_000
+PSI_THRESHOLD = 0.2
+KS_THRESHOLD = 0.1
+MIN_COUNT = 1000
+# Floor for empty bins, so PSI stays finite
+PSI_EPSILON = 1e-4
+
+def baseline_path(model_path: str) -> str:
+    """Where the drift baseline for a model artifact is saved."""
+    return os.path.join(os.path.dirname(model_path), DRIFT_BASELINE_FILENAME)
+
+
+class DriftSketch:
+    """Fixed-size, mergeable sketches of a set of features.
+
+    ``buckets`` has one row per feature:
+    - ``max_buckets`` columns for negative values, in ascending value order;
+    - one zero column for values with ``|x| < min_value``;
+    - ``max_buckets`` columns for positive values;
+    - a final column counting NaNs.
+
+    A value with magnitude in ``(gamma**(k-1), gamma**k]`` lands in bucket
+    ``k``. Magnitudes beyond the last bucket are counted in it. Because the
+    columns are in value order, a cumulative sum gives the CDF.
+
+    :meth:`histogram` groups the buckets into bins by a feature's ``edges``
+    e. Bin 0 is ``x < e[0]``, bin i is ``e[i-1] <= x < e[i]``, and the last
+    bin is ``x >= e[-1]``. A bucket goes to the bin holding its lower bound,
+    so edges act as if rounded to bucket boundaries. :func:`build_baseline`
+    places its edges on bucket boundaries, so there its bins are exact.
+
+    Args:
+        feature_names: Feature order of the rows passed to :meth:`add`.
+        edges: Histogram bin edges per feature, strictly increasing.
+        relative_accuracy: Relative error bound of the quantile sketch.
+        min_value: Magnitudes below this count as zero.
+        max_buckets: Buckets per sign.
+    """
+
+    def __init__(self, feature_names: Sequence[str], edges: Sequence[Sequence[float]],
+                 relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY, min_value: float = DEFAULT_MIN_VALUE,
+                 max_buckets: int = DEFAULT_MAX_BUCKETS):
+        if len(edges) != len(feature_names):
+            raise ValueError(f"{len(feature_names)} features but {len(edges)} edge lists")
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(f"relative_accuracy must be in (0, 1), got {relative_accuracy}")
+        self.feature_names = list(feature_names)
+        self.relative_accuracy = float(relative_accuracy)
+        self.min_value = float(min_value)
+        self.max_buckets = int(max_buckets)
+        self.edges: List[np.ndarray] = []
+        for name, feature_edges in zip(self.feature_names, edges):
+            feature_edges = np.asarray(feature_edges, dtype=np.float64)
+            if np.any(np.diff(feature_edges) <= 0) or np.isnan(feature_edges).any():
+                raise ValueError(f"Bin edges for {name} must be strictly increasing")
+            self.edges.append(feature_edges)
+
+        B = self.max_buckets
+        self.buckets = np.zeros((len(self.feature_names), 2 * B + 2), dtype=np.int64)
+        self._index = {name: i for i, name in enumerate(self.feature_names)}
+
+        gamma = (1 + self.relative_accuracy) / (1 - self.relative_accuracy)
+        self._inv_log_gamma = 1 / np.log(gamma)
+        self._key_offset = np.ceil(np.log(self.min_value) * self._inv_log_gamma)
+        # Per bucket column: the value reported for it, and its lower bound
+        keys = np.arange(B) + self._key_offset
+        upper = gamma ** keys
+        values = 2 * upper / (gamma + 1)
+        self._values = np.concatenate([-values[::-1], [0.0], values])
+        self._lower = np.concatenate([-upper[::-1], [-self.min_value], upper / gamma])
+
+    def _row(self, feature: str) -> int:
+        try:
+            return self._index[feature]
+        except KeyError:
+            raise ValueError(f"Unknown feature: {feature}") from None
+
+    def bin_edges(self, feature: str) -> np.ndarray:
+        return self.edges[self._row(feature)].copy()
+
+    def histogram(self, feature: str) -> np.ndarray:
+        """Non-missing value counts per bin of ``feature`` (``len(edges) + 1`` bins)."""
+        i = self._row(feature)
+        bins = np.searchsorted(self.edges[i], self._lower, side='right')
+        return np.bincount(bins, weights=self.buckets[i, :-1], minlength=len(self.edges[i]) + 1).astype(np.int64)
+
+    def count(self, feature: str) -> int:
+        """Non-missing values seen for ``feature``."""
+        return int(self.buckets[self._row(feature), :-1].sum())
+
+    def missing(self, feature: str) -> int:
+        return int(self.buckets[self._row(feature), -1])
+
+    @property
+    def rows(self) -> int:
+        return int(self.buckets[0].sum()) if len(self.feature_names) else 0
+
+    def _as_matrix(self, values: np.ndarray) -> np.ndarray:
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim == 1:
+            values = values.reshape(1, -1)
+        if values.shape[1] != len(self.feature_names):
+            raise ValueError(f"Expected {len(self.feature_names)} features, got {values.shape[1]}")
+        return values
+
+    def add(self, values: np.ndarray) -> 'DriftSketch':
+        """Fold rows of feature values (n_rows, n_features) into the sketch; NaN counts as missing."""
+        values = self._as_matrix(values)
+        B = self.max_buckets
+        with np.errstate(divide='ignore', invalid='ignore'):
+            keys = np.ceil(np.log(np.abs(values)) * self._inv_log_gamma) - self._key_offset
+        np.clip(keys, 0, B - 1, out=keys)
+        columns = np.where(values >= self.min_value, B + 1 + keys,
+                           np.where(values <= -self.min_value, B - 1 - keys, B))
+        columns[np.isnan(values)] = 2 * B + 1
+        flat = columns.astype(np.intp) + np.arange(len(self.feature_names)) * self.buckets.shape[1]
+        self.buckets += np.bincount(flat.ravel(), minlength=self.buckets.size).reshape(self.buckets.shape)
+        return self
+
+    def _check_compatible(self, other: 'DriftSketch'):
+        if (other.feature_names != self.feature_names or other.relative_accuracy != self.relative_accuracy
+                or other.min_value != self.min_value or other.max_buckets != self.max_buckets
+                or len(other.edges) != len(self.edges)
+                or not all(np.array_equal(a, b) for a, b in zip(other.edges, self.edges))):
+            raise ValueError("Sketches have different features, bins or accuracy and cannot be combined")
+
+    def merge(self, other: 'DriftSketch') -> 'DriftSketch':
+        """Add another sketch's counts (another worker or time window) into this one."""
+        self._check_compatible(other)
+        self.buckets += other.buckets
+        return self
+
+    def empty_like(self, edges: Optional[Sequence[Sequence[float]]] = None) -> 'DriftSketch':
+        """An empty sketch with the same features and layout (or other ``edges``)."""
+        if edges is None:
+            edges = [self.bin_edges(name) for name in self.feature_names]
+        return DriftSketch(self.feature_names, edges, self.relative_accuracy, self.min_value, self.max_buckets)
+
+    def copy(self) -> 'DriftSketch':
+        sketch = self.empty_like()
+        sketch.buckets[:] = self.buckets
+        return sketch
+
+    def _quantile_columns(self, feature: str, q) -> np.ndarray:
+        counts = self.buckets[self._row(feature), :-1]
+        cumulative = np.cumsum(counts)
+        if cumulative[-1] == 0:
+            raise ValueError(f"No values seen for {feature}")
+        rank = np.asarray(q, dtype=np.float64) * (cumulative[-1] - 1)
+        return np.searchsorted(cumulative, rank, side='right')
+
+    def quantile(self, feature: str, q) -> Any:
+        """Estimated ``q`` quantile(s) of ``feature``, within the relative accuracy; NaN if empty."""
+        if self.count(feature) == 0:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else float('nan')
+        values = self._values[self._quantile_columns(feature, q)]
+        return values if np.ndim(q) else float(values)
+
+    def psi(self, baseline: 'DriftSketch', feature: str) -> Optional[float]:
+        """Population stability index of ``feature`` against ``baseline``, over the histogram bins."""
+        self._check_compatible(baseline)
+        actual, expected = self.histogram(feature), baseline.histogram(feature)
+        if actual.sum() == 0 or expected.sum() == 0:
+            return None
+        actual = np.maximum(actual / actual.sum(), PSI_EPSILON)
+        expected = np.maximum(expected / expected.sum(), PSI_EPSILON)
+        return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+    def ks(self, baseline: 'DriftSketch', feature: str) -> Optional[float]:
+        """Kolmogorov-Smirnov statistic of ``feature`` against ``baseline``, at bucket resolution."""
+        self._check_compatible(baseline)
+        i = self._row(feature)
+        actual, expected = np.cumsum(self.buckets[i, :-1]), np.cumsum(baseline.buckets[i, :-1])
+        if actual[-1] == 0 or expected[-1] == 0:
+            return None
+        return float(np.abs(actual / actual[-1] - expected / expected[-1]).max())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-ready form; bucket counts are stored sparsely as (column, count) pairs."""
+        features = {}
+        for i, name in enumerate(self.feature_names):
+            (columns,) = np.nonzero(self.buckets[i])
+            features[name] = {
+                'edges': self.bin_edges(name).tolist(),
+                'buckets': [[int(c), int(self.buckets[i, c])] for c in columns],
+            }
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'min_value': self.min_value,
+            'max_buckets': self.max_buckets,
+            'feature_names': self.feature_names,
+            'features': features,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'DriftSketch':
+        names = data['feature_names']
+        features = data['features']
+        sketch = cls(names, [features[name]['edges'] for name in names], data['relative_accuracy'],
+                     data['min_value'], data['max_buckets'])
+        for i, name in enumerate(names):
+            for column, count in features[name]['buckets']:
+                sketch.buckets[i, column] = count
+        return sketch
+
+    def save(self, path: str):
+        """Write the sketch as JSON, replacing ``path`` atomically."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'DriftSketch':
+        with open(path, 'r') as f:
+            return cls.from_dict(json.load(f))
+
+
+def merge_sketches(sketches: Iterable[DriftSketch]) -> DriftSketch:
+    """Combine sketches from several workers or windows into a new one."""
+    sketches = iter(sketches)
+    try:
+        merged = next(sketches).copy()
+    except StopIteration:
+        raise ValueError("No sketches to merge") from None
+    for sketch in sketches:
+        merged.merge(sketch)
+    return merged
+
+def build_baseline(features, feature_names: Sequence[str], n_bins: int = DEFAULT_BINS,
+                   chunk_rows: int = DEFAULT_CHUNK_ROWS, **sketch_options) -> DriftSketch:
+    """Sketch training features as the drift baseline.
+
+    Histogram edges are the training quantiles at 1/n_bins, 2/n_bins, ...,
+    placed on sketch bucket boundaries. The bins are therefore exact, and
+    discrete features (counts) get one bin per distinct value. Rows are read
+    ``chunk_rows`` at a time, so ``features`` can be a memory-mapped matrix
+    larger than memory.
+
+    Args:
+        features: DataFrame with the feature columns, or a (n_rows, n_features)
+                  array in ``feature_names`` order.
+        feature_names: Features to monitor.
+        n_bins: Target histogram bins per feature; ties merge bins.
+        **sketch_options: relative_accuracy, min_value or max_buckets.
+    """
+    if hasattr(features, 'columns'):
+        features = features[list(feature_names)].to_numpy(dtype=np.float64)
+    sketch = DriftSketch(feature_names, [[]] * len(feature_names), **sketch_options)
+    for start in range(0, len(features), chunk_rows):
+        sketch.add(features[start:start + chunk_rows])
+    quantiles = np.arange(1, n_bins) / n_bins
+    edges = [np.unique(sketch._lower[sketch._quantile_columns(name, quantiles)]) if sketch.count(name) else []
+             for name in sketch.feature_names]
+    baseline = sketch.empty_like(edges)
+    baseline.buckets[:] = sketch.buckets
+    return baseline
+
+
+class DriftMonitor:
+    """Live feature window on the scoring path, compared with a training baseline.
+
+    :meth:`observe` copies rows into a preallocated buffer and folds it into
+    the window sketch once it is full. The scoring path therefore pays for a
+    copy, and the sketch update is amortized over ``buffer_rows`` rows.
+    :meth:`window` returns the current window, optionally starting a new one.
+    :meth:`merge` folds in windows from other workers. :meth:`report` and
+    :meth:`alerts` compare a window with the baseline.
+
+    Args:
+        baseline: Sketch of the training features (see :func:`build_baseline`).
+        psi_threshold: PSI above which a feature is drifting.
+        ks_threshold: KS statistic above which a feature is drifting.
+        min_count: Values a feature needs in the window before it is judged.
+        buffer_rows: Rows buffered between sketch updates.
+        model_path: Model artifact the baseline belongs to, if known.
+    """
+
+    def __init__(self, baseline: DriftSketch, psi_threshold: float = PSI_THRESHOLD,
+                 ks_threshold: float = KS_THRESHOLD, min_count: int = MIN_COUNT,
+                 buffer_rows: int = DEFAULT_BUFFER_ROWS, model_path: Optional[str] = None):
+        self.baseline = baseline
+        self.feature_names = baseline.feature_names
+        self.psi_threshold = psi_threshold
+        self.ks_threshold = ks_threshold
+        self.min_count = min_count
+        self.model_path = model_path
+        self._window = baseline.empty_like()
+        self._buffer = np.empty((buffer_rows, len(self.feature_names)), dtype=np.float64)
+        self._buffered = 0
+        self._lock = threading.Lock()
+        # Column selection for the last feature order seen; scorers pass the same list each call
+        self._last_names: Optional[Sequence[str]] = None
+        self._last_columns: Optional[np.ndarray] = None
+
+    @classmethod
+    def for_model(cls, model_path: str, **kwargs) -> Optional['DriftMonitor']:
+        """Monitor against the baseline saved next to ``model_path``, or None if there is none."""
+        path = baseline_path(model_path)
+        if not os.path.exists(path):
+            return None
+        return cls(DriftSketch.load(path), model_path=model_path, **kwargs)
+
+    def follow(self, model_path: str) -> bool:
+        """Switch to the baseline saved next to ``model_path``, starting a new window.
+
+        Returns False, and leaves the monitor on its current model, when that
+        model has no saved baseline.
+        """
+        if model_path == self.model_path:
+            return True
+        path = baseline_path(model_path)
+        if not os.path.exists(path):
+            return False
+        baseline = DriftSketch.load(path)
+        with self._lock:
+            self.baseline = baseline
+            self.feature_names = baseline.feature_names
+            self.model_path = model_path
+            self._window = baseline.empty_like()
+            self._buffer = np.empty((len(self._buffer), len(self.feature_names)), dtype=np.float64)
+            self._buffered = 0
+            self._last_names = self._last_columns = None
+        return True
+
+    def _columns_for(self, feature_names: Sequence[str]) -> Optional[np.ndarray]:
+        if feature_names is not self._last_names:
+            if list(feature_names) == self.feature_names:
+                columns = None
+            else:
+                missing = [name for name in self.feature_names if name not in feature_names]
+                if missing:
+                    raise ValueError(f"Missing monitored features: {missing}")
+                columns = np.array([list(feature_names).index(name) for name in self.feature_names])
+            self._last_names, self._last_columns = feature_names, columns
+        return self._last_columns
+
+    def _flush(self):
+        if self._buffered:
+            self._window.add(self._buffer[:self._buffered])
+            self._buffered = 0
+
+    def observe(self, matrix: np.ndarray, feature_names: Optional[Sequence[str]] = None):
+        """Record scored rows.
+
+        Args:
+            matrix: (n_rows, n_features) feature values.
+            feature_names: Column order of ``matrix``; defaults to the
+                           monitor's. Extra columns are ignored.
+        """
+        n_rows = len(matrix)
+        with self._lock:
+            # Under the lock, so a concurrent follow() cannot change the columns in between
+            if feature_names is not None:
+                columns = self._columns_for(feature_names)
+                if columns is not None:
+                    matrix = matrix[:, columns]
+            if n_rows > len(self._buffer) - self._buffered:
+                self._flush()
+                if n_rows >= len(self._buffer):
+                    self._window.add(matrix)
+                    return
+            self._buffer[self._buffered:self._buffered + n_rows] = matrix
+            self._buffered += n_rows
+
+    def window(self, reset: bool = False) -> DriftSketch:
+        """A copy of the current window; ``reset`` starts a new, empty one."""
+        with self._lock:
+            self._flush()
+            window = self._window.copy()
+            if reset:
+                self._window = self.baseline.empty_like()
+        return window
+
+    def merge(self, sketch: DriftSketch):
+        """Fold another worker's (or an earlier) window into the current one."""
+        with self._lock:
+            self._window.merge(sketch)
+
+    def report(self, window: Optional[DriftSketch] = None) -> Dict[str, Dict[str, Any]]:
+        """Per-feature drift statistics of ``window`` (default: the current one) against the baseline."""
+        with self._lock:
+            baseline = self.baseline
+            if window is None:
+                self._flush()
+                window = self._window.copy()
+        report = {}
+        for name in baseline.feature_names:
+            count = window.count(name)
+            psi, ks = window.psi(baseline, name), window.ks(baseline, name)
+            live = window.quantile(name, [0.5, 0.95])
+            trained = baseline.quantile(name, [0.5, 0.95])
+            report[name] = {
+                'count': count,
+                'missing': window.missing(name),
+                'psi': psi,
+                'ks': ks,
+                'p50': None if np.isnan(live[0]) else float(live[0]),
+                'p95': None if np.isnan(live[1]) else float(live[1]),
+                'baseline_p50': None if np.isnan(trained[0]) else float(trained[0]),
+                'baseline_p95': None if np.isnan(trained[1]) else float(trained[1]),
+                'drifting': bool(count >= self.min_count and psi is not None
+                                 and (psi > self.psi_threshold or ks > self.ks_threshold)),
+            }
+        return report
+
+    def alerts(self, window: Optional[DriftSketch] = None) -> List[Dict[str, Any]]:
+        """The drifting features of ``window``, each with its statistics."""
+        return [dict(stats, feature=name) for name, stats in self.report(window).items() if stats['drifting']]
+
+# Example usage
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge saved drift windows and check them against a baseline.")
+    parser.add_argument('--baseline', required=True, help="drift_baseline.json saved at training time")
+    parser.add_argument('windows', nargs='+', help="Window sketches (JSON), e.g. from several workers")
+    parser.add_argument('--psi-threshold', type=float, default=PSI_THRESHOLD)
+    parser.add_argument('--ks-threshold', type=float, default=KS_THRESHOLD)
+    parser.add_argument('--min-count', type=int, default=MIN_COUNT)
+    args = parser.parse_args()
+
+    monitor = DriftMonitor(DriftSketch.load(args.baseline), psi_threshold=args.psi_threshold,
+                           ks_threshold=args.ks_threshold, min_count=args.min_count)
+    window = merge_sketches(DriftSketch.load(path) for path in args.windows)
+    print(json.dumps(monitor.report(window), indent=2))
+    sys.exit(1 if monitor.alerts(window) else 0)
@@ -1,55 +1,190 @@
 """Data quality checks for local development."""
 
+import os
+import sys
+import numpy as np
 import pandas as pd
-import json
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Sequence, Union
+
+from src.ingestion.telemetry_reader import (DEFAULT_CHUNK_SIZE, UNPARSED_TS, iter_telemetry, list_telemetry_files,
+                                            read_telemetry)
+from src.utils.instrumentation import instrumented
 
 def load_sample_data(file_path: str) -> pd.DataFrame:
-    """Load sample telemetry data from JSONL file."""
-    data = []
-    with open(file_path, 'r') as f:
-        for line in f:
-            data.append(json.loads(line.strip()))
-    return pd.DataFrame(data)
+    """Load sample telemetry data from a JSONL or Avro file with compact dtypes."""
+    return read_telemetry(file_path)
+
+SPEED_RANGE_KMH = (0, 200)
+HIGH_ACCURACY_M = 10
+REQUIRED_FIELDS = ['device_id', 'trip_id', 'ts', 'event_type', 'provider', 'location_precision']
+
+class DQAccumulator:
+    """Mergeable state for the data quality checks.
+
+    Holds only counts, sums, extrema and per-category counters, so memory is
+    independent of the number of rows seen. Accumulators built over separate
+    chunks, files or processes combine with :meth:`merge`, and :meth:`result`
+    returns the dict that ``generate_html_report`` consumes.
+    """
+
+    def __init__(self):
+        self.total_rows = 0
+        # Per column: rows seen in chunks that had the column, and nulls among them
+        self.column_rows: Dict[str, int] = {}
+        self.column_nulls: Dict[str, int] = {}
+        self.minima: Dict[str, float] = {}
+        self.maxima: Dict[str, float] = {}
+        self.speed_out_of_range = 0
+        self.gps_sum = 0.0
+        self.gps_count = 0
+        self.gps_high_accuracy = 0
+        self.event_counts: Counter = Counter()
+        # Present but unparseable timestamps, as reported by the reader (also counted as nulls)
+        self.unparsed_ts = 0
+
+    @staticmethod
+    def _valid_floats(series: pd.Series) -> np.ndarray:
+        values = pd.to_numeric(series).to_numpy(dtype=np.float64, na_value=np.nan)
+        return values[~np.isnan(values)]
+
+    def _update_extrema(self, name: str, values: np.ndarray):
+        if len(values) == 0:
+            return
+        low, high = float(values.min()), float(values.max())
+        self.minima[name] = min(self.minima.get(name, low), low)
+        self.maxima[name] = max(self.maxima.get(name, high), high)
+
+    def update(self, df: pd.DataFrame) -> 'DQAccumulator':
+        """Fold one chunk of telemetry into the accumulator."""
+        n_rows = len(df)
+        self.total_rows += n_rows
+        for name, nulls in df.isnull().sum().items():
+            self.column_rows[name] = self.column_rows.get(name, 0) + n_rows
+            self.column_nulls[name] = self.column_nulls.get(name, 0) + int(nulls)
+        self.unparsed_ts += int(df.attrs.get(UNPARSED_TS, 0))
+
+        for name in ('accel_x_m_s2', 'accel_y_m_s2'):
+            if name in df.columns:
+                self._update_extrema(name, self._valid_floats(df[name]))
+
+        if 'speed_kmh' in df.columns:
+            speed = self._valid_floats(df['speed_kmh'])
+            self._update_extrema('speed_kmh', speed)
+            self.speed_out_of_range += int(((speed < SPEED_RANGE_KMH[0]) | (speed > SPEED_RANGE_KMH[1])).sum())
+
+        if 'gps_accuracy_m' in df.columns:
+            accuracy = self._valid_floats(df['gps_accuracy_m'])
+            self.gps_sum += float(accuracy.sum())
+            self.gps_count += len(accuracy)
+            self.gps_high_accuracy += int((accuracy < HIGH_ACCURACY_M).sum())
+
+        if 'event_type' in df.columns:
+            for event_type, count in df['event_type'].value_counts().items():
+                if count:
+                    self.event_counts[event_type] += int(count)
+        return self
+
+    def merge(self, other: 'DQAccumulator') -> 'DQAccumulator':
+        """Combine another accumulator into this one."""
+        self.total_rows += other.total_rows
+        for name, rows in other.column_rows.items():
+            self.column_rows[name] = self.column_rows.get(name, 0) + rows
+            self.column_nulls[name] = self.column_nulls.get(name, 0) + other.column_nulls[name]
+        for name, low in other.minima.items():
+            self.minima[name] = min(self.minima.get(name, low), low)
+        for name, high in other.maxima.items():
+            self.maxima[name] = max(self.maxima.get(name, high), high)
+        self.speed_out_of_range += other.speed_out_of_range
+        self.gps_sum += other.gps_sum
+        self.gps_count += other.gps_count
+        self.gps_high_accuracy += other.gps_high_accuracy
+        self.event_counts.update(other.event_counts)
+        self.unparsed_ts += other.unparsed_ts
+        return self
+
+    def _nulls(self, name: str) -> int:
+        # Rows from chunks without the column count as null, as in a concatenated frame
+        return self.column_nulls[name] + self.total_rows - self.column_rows[name]
 
+    def result(self) -> Dict[str, Any]:
+        """The checks in the format returned by ``run_dq_checks``."""
+        checks = {}
+        checks['total_rows'] = self.total_rows
+        checks['null_rates'] = {
+            name: self._nulls(name) / self.total_rows if self.total_rows else np.nan
+            for name in self.column_rows
+        }
+
+        checks['speed_range'] = {
+            'min': self.minima.get('speed_kmh', np.nan),
+            'max': self.maxima.get('speed_kmh', np.nan),
+            'out_of_range': self.speed_out_of_range
+        }
+
+        checks['accel_range'] = {
+            'x_range': {'min': self.minima.get('accel_x_m_s2', np.nan), 'max': self.maxima.get('accel_x_m_s2', np.nan)},
+            'y_range': {'min': self.minima.get('accel_y_m_s2', np.nan), 'max': self.maxima.get('accel_y_m_s2', np.nan)}
+        }
+
+        checks['gps_accuracy'] = {
+            'avg_accuracy': self.gps_sum / self.gps_count if self.gps_count else np.nan,
+            'high_accuracy_count': self.gps_high_accuracy
+        }
+
+        # Most frequent first, like value_counts
+        checks['event_distribution'] = dict(self.event_counts.most_common())
+
+        checks['schema_compliance'] = {
+            'missing_required': [field for field in REQUIRED_FIELDS if field not in self.column_rows],
+            'null_required': {field: self._nulls(field) for field in REQUIRED_FIELDS if field in self.column_rows},
+            'unparsed_ts': self.unparsed_ts
+        }
+
+        return checks
+
+@instrumented('dq.run_dq_checks', rows_from='df')
 def run_dq_checks(df: pd.DataFrame) -> Dict[str, Any]:
     """Run data quality checks on telemetry data."""
-    checks = {}
-
-    # Completeness checks
-    checks['total_rows'] = len(df)
-    checks['null_rates'] = df.isnull().mean().to_dict()
-
-    # Value range checks
-    checks['speed_range'] = {
-        'min': df['speed_kmh'].min(),
-        'max': df['speed_kmh'].max(),
-        'out_of_range': ((df['speed_kmh'] < 0) | (df['speed_kmh'] > 200)).sum()
-    }
-
-    checks['accel_range'] = {
-        'x_range': {'min': df['accel_x_m_s2'].min(), 'max': df['accel_x_m_s2'].max()},
-        'y_range': {'min': df['accel_y_m_s2'].min(), 'max': df['accel_y_m_s2'].max()}
-    }
-
-    # GPS accuracy checks
-    checks['gps_accuracy'] = {
-        'avg_accuracy': df['gps_accuracy_m'].mean(),
-        'high_accuracy_count': (df['gps_accuracy_m'] < 10).sum()
-    }
-
-    # Event type distribution
-    checks['event_distribution'] = df['event_type'].value_counts().to_dict()
-
-    # Schema compliance (basic)
-    required_fields = ['device_id', 'trip_id', 'ts', 'event_type', 'provider', 'location_precision']
-    checks['schema_compliance'] = {
-        'missing_required': [field for field in required_fields if field not in df.columns],
-        'null_required': {field: df[field].isnull().sum() for field in required_fields if field in df.columns}
-    }
-
-    return checks
+    return DQAccumulator().update(df).result()
+
+def _check_file(args) -> DQAccumulator:
+    path, chunk_size = args
+    accumulator = DQAccumulator()
+    for chunk in iter_telemetry(path, chunk_size=chunk_size):
+        accumulator.update(chunk)
+    return accumulator
+
+def run_dq_checks_streaming(source: Union[str, Sequence[str]], chunk_size: int = DEFAULT_CHUNK_SIZE,
+                            n_jobs: int = 1) -> Dict[str, Any]:
+    """Run data quality checks over telemetry files without loading them whole.
+
+    Args:
+        source: A JSONL/Avro file, a directory of them, or a list of files.
+        chunk_size: Rows held in memory per worker at a time.
+        n_jobs: Worker processes; each checks whole files and returns its
+                accumulator, which are merged here.
+
+    Returns:
+        The same dict as ``run_dq_checks`` on the concatenated data.
+    """
+    if isinstance(source, str):
+        paths = list_telemetry_files(source) if os.path.isdir(source) else [source]
+    else:
+        paths = list(source)
+
+    total = DQAccumulator()
+    tasks = [(path, chunk_size) for path in paths]
+    if n_jobs > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            for accumulator in pool.map(_check_file, tasks):
+                total.merge(accumulator)
+    else:
+        for task in tasks:
+            total.merge(_check_file(task))
+    return total.result()
 
 def generate_html_report(checks: Dict[str, Any], output_path: str):
     """Generate HTML report from DQ checks."""
@@ -99,6 +234,9 @@ def generate_html_report(checks: Dict[str, Any], output_path: str):
 
         <h2>Schema Compliance</h2>
         <p>Missing required fields: {checks['schema_compliance']['missing_required']}</p>
+        <p class="{'fail' if checks['schema_compliance'].get('unparsed_ts') else 'pass'}">
+            Unparseable timestamps: {checks['schema_compliance'].get('unparsed_ts', 0)}
+        </p>
         <table>
             <tr><th>Field</th><th>Null Count</th></tr>
             {"".join(f"<tr><td>{k}</td><td>{v}</td></tr>" for k, v in checks['schema_compliance']['null_required'].items())}
@@ -111,11 +249,12 @@ def generate_html_report(checks: Dict[str, Any], output_path: str):
         f.write(html)
 
 if __name__ == "__main__":
-    # Load sample data
-    df = load_sample_data('data/samples/poc_telemetry.jsonl')
+    # A file or a directory of JSONL/Avro files, checked chunk by chunk
+    source = sys.argv[1] if len(sys.argv) > 1 else 'data/samples/poc_telemetry.jsonl'
+    n_jobs = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
 
     # Run checks
-    checks = run_dq_checks(df)
+    checks = run_dq_checks_streaming(source, n_jobs=n_jobs)
 
     # Generate report
     output_path = 'data/reports/dq_report.html'
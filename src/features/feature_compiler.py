@@ -0,0 +1,410 @@
+"""Compile the feature manifest into a fused trip feature execution plan.
+
+Every trip-entity feature in ``feature_manifest.yml`` is a (source, where,
+aggregation) triple over per-event inputs. The compiler resolves those into a
+plan that reads each raw column once, derives each ``inputs:`` entry once (in
+dependency order, only if some selected feature needs it), sorts the events
+into contiguous trip segments once, and computes every aggregate with
+``ufunc.reduceat`` over those segments. Shared reductions (e.g. the speed sum
+behind both an average and a total) are computed once.
+
+Adding a feature is a manifest edit; adding a new kind of derived input is
+a new entry in ``INPUT_OPS``.
+"""
+
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.features.feature_definitions import get_model_feature_order, load_manifest
+from src.utils.instrumentation import instrumented
+
+AGGREGATIONS = ('max', 'min', 'sum', 'count', 'avg', 'percentage')
+DEFAULT_MAX_GAP_S = 300.0
+TS_COLUMN = 'ts'
+_NAT = np.iinfo(np.int64).min
+
+# (kind, source, where) of one per-trip partial reduction
+ReductionKey = Tuple[str, Optional[str], Optional[str]]
+
+# How partial reductions of the same trip from different batches combine, and
+# the value of a trip that has no rows yet
+PARTIAL_MERGE = {'count': np.add, 'sum': np.add, 'max': np.fmax, 'min': np.fmin}
+PARTIAL_IDENTITY = {'count': 0.0, 'sum': 0.0, 'max': float('nan'), 'min': float('nan')}
+
+
+class _Segments:
+    """Events sorted by trip: integer trip codes and the start of each trip."""
+
+    def __init__(self, codes: np.ndarray, starts: np.ndarray, max_gap_s: float):
+        self.codes = codes
+        self.starts = starts
+        self.max_gap_s = max_gap_s
+
+
+class PreparedEvents:
+    """Events sorted into contiguous trip segments, with the plan's inputs derived.
+
+    Attributes:
+        trip_ids: Trip id of each segment, sorted.
+        starts: Row offset at which each segment begins.
+        rows: Position in the source frame of each sorted row.
+        values: Raw and derived inputs by name, in sorted row order.
+    """
+
+    def __init__(self, trip_ids: np.ndarray, starts: np.ndarray, rows: np.ndarray,
+                 values: Dict[str, np.ndarray]):
+        self.trip_ids = trip_ids
+        self.starts = starts
+        self.rows = rows
+        self.values = values
+
+
+def parse_event_ts(ts: pd.Series) -> pd.Series:
+    """Parse a telemetry ``ts`` column to tz-aware UTC datetimes."""
+    if pd.api.types.is_string_dtype(ts.dtype):
+        return pd.to_datetime(ts.str.rstrip('Z'), utc=True)
+    if isinstance(ts.dtype, pd.DatetimeTZDtype):
+        return ts.dt.tz_convert('UTC')
+    return pd.to_datetime(ts, utc=True)
+
+def _event_seconds(ts_ns: np.ndarray, codes: np.ndarray, sample_rate_hz: np.ndarray,
+                   max_gap_s: float) -> np.ndarray:
+    """Elapsed seconds represented by each event, for events sorted by (trip, ts).
+
+    Uses ``1 / sample_rate_hz`` where the device reports a rate, otherwise the gap
+    to the next event of the same trip. Gaps are capped at ``max_gap_s`` so a
+    parked vehicle does not count as driving time.
+    """
+    seconds = np.zeros(len(codes), dtype=np.float64)
+    if len(codes) > 1:
+        same_trip = codes[1:] == codes[:-1]
+        valid = same_trip & (ts_ns[1:] >= 0) & (ts_ns[:-1] >= 0)
+        gaps = (ts_ns[1:] - ts_ns[:-1]) / 1e9
+        seconds[:-1] = np.where(valid, gaps, 0.0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        from_rate = 1.0 / sample_rate_hz
+    has_rate = np.isfinite(from_rate) & (from_rate > 0)
+    seconds = np.where(has_rate, from_rate, seconds)
+    return np.clip(seconds, 0.0, max_gap_s)
+
+def _op_hour_between(segments: _Segments, ts_ns: np.ndarray, start: int, end: int) -> np.ndarray:
+    """Events whose UTC hour is in [start, end), wrapping past midnight when start > end."""
+    hours = (ts_ns // 3_600_000_000_000) % 24
+    inside = (hours >= start) & (hours < end) if start <= end else (hours >= start) | (hours < end)
+    return inside & (ts_ns != _NAT)
+
+def _op_event_minutes(segments: _Segments, ts_ns: np.ndarray, sample_rate_hz: np.ndarray) -> np.ndarray:
+    return _event_seconds(ts_ns, segments.codes, sample_rate_hz, segments.max_gap_s) / 60.0
+
+def _event_minutes_ordered(ts_ns: np.ndarray, sample_rate_hz: np.ndarray) -> bool:
+    # Durations fall back to ts gaps only for events without a sample rate
+    return not np.all(sample_rate_hz > 0)
+
+# op name -> (function(segments, *args), whether it needs events in time order
+# within a trip: a bool, or a predicate over the op's unsorted raw arguments)
+INPUT_OPS: Dict[str, Tuple[Callable[..., np.ndarray], Any]] = {
+    'hypot': (lambda segments, x, y: np.hypot(x, y), False),
+    'le': (lambda segments, x, threshold: x <= threshold, False),
+    'lt': (lambda segments, x, threshold: x < threshold, False),
+    'ge': (lambda segments, x, threshold: x >= threshold, False),
+    'gt': (lambda segments, x, threshold: x > threshold, False),
+    'hour_between': (_op_hour_between, False),
+    'event_minutes': (_op_event_minutes, _event_minutes_ordered),
+}
+
+
+class FeatureSpec:
+    """One trip feature: aggregate ``source`` over the rows where ``where`` holds."""
+
+    def __init__(self, name: str, aggregation: str, source: Optional[str], where: Optional[str],
+                 dtype: str):
+        self.name = name
+        self.aggregation = aggregation
+        self.source = source
+        self.where = where
+        self.dtype = dtype
+
+    def inputs(self) -> List[str]:
+        return [name for name in (self.source, self.where) if name is not None]
+
+
+class TripFeaturePlan:
+    """A compiled, fused execution plan for trip-entity features.
+
+    Attributes:
+        manifest_hash: sha256 of the manifest the plan was compiled from.
+        features: FeatureSpecs in output column order.
+        input_columns: Raw telemetry columns the plan reads, trip_id first.
+        steps: Derived inputs in evaluation order, as (name, op, args).
+        reduction_keys: Partial reductions the features are finished from,
+            each computed once however many features share it.
+        unavailable: Manifest trip features that cannot be computed, with reasons.
+        policy_features: Policy-entity features (maintained by the policy aggregator).
+    """
+
+    def __init__(self, manifest_hash: str, features: List[FeatureSpec], inputs: Dict[str, Dict[str, Any]],
+                 unavailable: Dict[str, str], policy_features: List[str]):
+        self.manifest_hash = manifest_hash
+        self.features = features
+        self.unavailable = unavailable
+        self.policy_features = policy_features
+        self._inputs = inputs
+        self._selected: Dict[Tuple[str, ...], 'TripFeaturePlan'] = {}
+        self._lock = threading.Lock()
+
+        # Resolve derived inputs depth-first so each is evaluated after its arguments
+        self.steps: List[Tuple[str, str, List[Any]]] = []
+        raw: List[str] = []
+        state: Dict[str, str] = {}
+
+        def visit(name: str):
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError(f"Cycle in feature manifest inputs at '{name}'")
+            spec = inputs.get(name)
+            if spec is None:
+                if name not in raw:
+                    raw.append(name)
+                state[name] = 'done'
+                return
+            state[name] = 'visiting'
+            for arg in spec['args']:
+                if isinstance(arg, str):
+                    visit(arg)
+            self.steps.append((name, spec['op'], list(spec['args'])))
+            state[name] = 'done'
+
+        for feature in features:
+            for name in feature.inputs():
+                visit(name)
+        self.input_columns = ['trip_id'] + [name for name in raw if name != 'trip_id']
+        self.ordered = any(INPUT_OPS[op][1] is not False for _, op, _ in self.steps)
+
+        keys: List[ReductionKey] = []
+        for f in features:
+            if f.aggregation == 'avg':
+                keys += [('count', f.source, f.where), ('sum', f.source, f.where)]
+            elif f.aggregation == 'percentage':
+                keys += [('sum', f.source, None), ('sum', f.source, f.where)]
+            else:
+                keys.append((f.aggregation, f.source, f.where))
+        self.reduction_keys: List[ReductionKey] = list(dict.fromkeys(keys))
+
+    @property
+    def feature_columns(self) -> List[str]:
+        return [feature.name for feature in self.features]
+
+    def select(self, names: Sequence[str]) -> 'TripFeaturePlan':
+        """A plan computing only ``names``, in that order, and only the inputs they need."""
+        key = tuple(names)
+        with self._lock:
+            plan = self._selected.get(key)
+            if plan is None:
+                by_name = {feature.name: feature for feature in self.features}
+                missing = [name for name in names if name not in by_name]
+                if missing:
+                    reasons = [f"{name} ({self.unavailable.get(name, 'not a trip feature')})" for name in missing]
+                    raise ValueError(f"Features not computable from telemetry: {', '.join(reasons)}")
+                plan = self._selected[key] = TripFeaturePlan(
+                    self.manifest_hash, [by_name[name] for name in names], self._inputs, {}, [])
+        return plan
+
+    def _needs_order(self, values: Dict[str, np.ndarray]) -> bool:
+        for _, op, args in self.steps:
+            rule = INPUT_OPS[op][1]
+            if rule is True:
+                return True
+            if callable(rule):
+                # Derived arguments do not exist before sorting; assume they need it
+                if any(isinstance(arg, str) and arg not in values for arg in args):
+                    return True
+                if rule(*[values[arg] if isinstance(arg, str) else arg for arg in args]):
+                    return True
+        return False
+
+    def prepare(self, events: pd.DataFrame, max_gap_s: float = DEFAULT_MAX_GAP_S,
+                time_order: bool = False) -> PreparedEvents:
+        """Sort ``events`` into trip segments and derive the plan's inputs.
+
+        Args:
+            events: Telemetry with at least ``input_columns``; not modified.
+            max_gap_s: Upper bound on the seconds one event can represent.
+            time_order: Sort each trip's events by ts (and carry the parsed ts
+                in ``values``) even when no input needs it.
+        """
+        required = self.input_columns + ([TS_COLUMN] if time_order else [])
+        missing = [col for col in dict.fromkeys(required) if col not in events.columns]
+        if missing:
+            raise ValueError(f"Events are missing columns required by the feature plan: {missing}")
+
+        codes, trip_ids = pd.factorize(events['trip_id'], sort=True)
+        keep = np.flatnonzero(codes >= 0)
+        codes = codes[keep]
+
+        values: Dict[str, np.ndarray] = {}
+        for col in required[1:]:
+            if col == TS_COLUMN:
+                ts = parse_event_ts(events[col]).to_numpy(dtype='datetime64[ns]')
+                values[col] = ts.view(np.int64)[keep]
+            else:
+                values[col] = events[col].to_numpy(dtype=np.float64, na_value=np.nan)[keep]
+
+        ts_ns = values.get(TS_COLUMN)
+        needs_order = time_order or (self.ordered and self._needs_order(values))
+        if needs_order and ts_ns is not None and np.any(ts_ns[1:] < ts_ns[:-1]):
+            order = np.lexsort((ts_ns, codes))
+        else:
+            order = np.argsort(codes, kind='stable')
+        codes = codes[order]
+        for col in values:
+            values[col] = values[col][order]
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else codes[:0]
+        segments = _Segments(codes, starts, max_gap_s)
+
+        for name, op, args in self.steps:
+            func = INPUT_OPS[op][0]
+            values[name] = func(segments, *[values[arg] if isinstance(arg, str) else arg for arg in args])
+        return PreparedEvents(trip_ids[codes[starts]], starts, keep[order], values)
+
+    def reduce(self, prepared: PreparedEvents,
+               fold: Optional[np.ndarray] = None) -> Dict[ReductionKey, np.ndarray]:
+        """Per-trip partial reductions (``reduction_keys``) of prepared events.
+
+        Args:
+            prepared: Output of :meth:`prepare`.
+            fold: Optional boolean mask over the sorted rows; rows outside it
+                still feed derived inputs (e.g. as the next event of a gap) but
+                are left out of every reduction.
+        """
+        values, starts = prepared.values, prepared.starts
+        partials: Dict[ReductionKey, np.ndarray] = {}
+        for key in self.reduction_keys:
+            kind, source, where = key
+            mask = values[where].astype(bool) if where is not None else None
+            if fold is not None:
+                mask = fold if mask is None else mask & fold
+            if source is None:
+                partials[key] = np.add.reduceat(mask.astype(np.int64), starts)
+                continue
+            x = values[source].astype(np.float64, copy=False)
+            valid = ~np.isnan(x)
+            if mask is not None:
+                valid &= mask
+            if kind == 'count':
+                partials[key] = np.add.reduceat(valid.astype(np.int64), starts)
+            elif kind == 'sum':
+                partials[key] = np.add.reduceat(np.where(valid, x, 0.0), starts)
+            else:
+                # fmax/fmin skip NaN, matching pandas' skipna reductions
+                partials[key] = PARTIAL_MERGE[kind].reduceat(np.where(valid, x, np.nan), starts)
+        return partials
+
+    def finish(self, partials: Dict[ReductionKey, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Feature columns from (possibly merged, see ``PARTIAL_MERGE``) partial reductions."""
+        out: Dict[str, np.ndarray] = {}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for f in self.features:
+                if f.aggregation == 'avg':
+                    count = partials[('count', f.source, f.where)]
+                    result = np.where(count > 0, partials[('sum', f.source, f.where)] / count, np.nan)
+                elif f.aggregation == 'percentage':
+                    total = partials[('sum', f.source, None)]
+                    result = np.where(total > 0, 100.0 * partials[('sum', f.source, f.where)] / total, np.nan)
+                else:
+                    result = partials[(f.aggregation, f.source, f.where)]
+                out[f.name] = result.astype(f.dtype)
+        return out
+
+    def with_features(self, features: List[FeatureSpec]) -> 'TripFeaturePlan':
+        """A plan over the same manifest inputs computing ``features`` instead (uncached)."""
+        return TripFeaturePlan(self.manifest_hash, list(features), self._inputs, {}, [])
+
+    @instrumented('features.trip_plan', rows_from='events')
+    def compute(self, events: pd.DataFrame, first_columns: Sequence[str] = (),
+                max_gap_s: float = DEFAULT_MAX_GAP_S) -> pd.DataFrame:
+        """Compute every feature of the plan in one grouped pass.
+
+        Args:
+            events: Telemetry with at least ``input_columns``; not modified.
+            first_columns: Extra columns to carry through with each trip's
+                first value (e.g. policy_id).
+            max_gap_s: Upper bound on the seconds one event can represent.
+
+        Returns:
+            DataFrame with trip_id, ``first_columns`` and ``feature_columns``,
+            one row per trip sorted by trip_id.
+        """
+        missing = [col for col in first_columns if col not in events.columns]
+        if missing:
+            raise ValueError(f"Events are missing columns required by the feature plan: {missing}")
+        prepared = self.prepare(events, max_gap_s)
+        if not len(prepared.trip_ids):
+            columns = {'trip_id': pd.Series(dtype='object')}
+            columns.update({col: events[col].iloc[:0] for col in first_columns})
+            columns.update({f.name: pd.Series(dtype=f.dtype) for f in self.features})
+            return pd.DataFrame(columns)
+
+        out: Dict[str, Any] = {'trip_id': prepared.trip_ids}
+        first_rows = prepared.rows[prepared.starts]
+        for col in first_columns:
+            out[col] = events[col].take(first_rows).to_numpy()
+        out.update(self.finish(self.reduce(prepared)))
+        return pd.DataFrame(out)
+
+
+def _feature_spec(feature: Dict[str, Any]) -> Tuple[Optional[FeatureSpec], Optional[str]]:
+    """A FeatureSpec for a manifest entry, or (None, reason) when it has no telemetry source."""
+    name, aggregation = feature['name'], feature.get('aggregation')
+    source, where = feature.get('source'), feature.get('where')
+    if aggregation not in AGGREGATIONS:
+        raise ValueError(f"Feature {name}: unknown aggregation '{aggregation}'")
+    if source is None and where is None:
+        return None, 'no source in manifest'
+    if aggregation != 'count' and source is None:
+        raise ValueError(f"Feature {name}: {aggregation} needs a source")
+    if aggregation == 'percentage' and where is None:
+        raise ValueError(f"Feature {name}: percentage needs a where input")
+    # max/min/avg can be NaN for a trip with no valid values, so only counts and sums stay integral
+    integral = feature.get('type') == 'int' and aggregation in ('count', 'sum')
+    return FeatureSpec(name, aggregation, source, where, 'int64' if integral else 'float64'), None
+
+def compile_features(manifest: Dict[str, Any], manifest_hash: str = '') -> TripFeaturePlan:
+    """Compile a parsed manifest into a TripFeaturePlan (uncached)."""
+    inputs = manifest.get('inputs') or {}
+    for name, spec in inputs.items():
+        if spec.get('op') not in INPUT_OPS:
+            raise ValueError(f"Input {name}: unknown op '{spec.get('op')}'")
+    features, unavailable, policy_features = [], {}, []
+    for feature in manifest.get('features', []):
+        if feature.get('entity', 'trip') != 'trip':
+            policy_features.append(feature['name'])
+            continue
+        spec, reason = _feature_spec(feature)
+        if spec is None:
+            unavailable[feature['name']] = reason
+        else:
+            features.append(spec)
+    return TripFeaturePlan(manifest_hash, features, inputs, unavailable, policy_features)
+
+_plan_cache: Dict[str, TripFeaturePlan] = {}
+_plan_lock = threading.Lock()
+
+def compile_manifest(path: Optional[str] = None) -> TripFeaturePlan:
+    """Compile ``feature_manifest.yml`` (or ``path``); plans are cached by manifest hash."""
+    digest, manifest = load_manifest(path)
+    with _plan_lock:
+        plan = _plan_cache.get(digest)
+        if plan is None:
+            plan = _plan_cache[digest] = compile_features(manifest, digest)
+    return plan
+
+def compute_model_features(events: pd.DataFrame, first_columns: Sequence[str] = (),
+                           path: Optional[str] = None) -> pd.DataFrame:
+    """Compute the manifest's ``model_features`` per trip, in model column order."""
+    plan = compile_manifest(path).select(get_model_feature_order(path))
+    return plan.compute(events, first_columns=first_columns)
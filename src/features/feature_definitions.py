@@ -1,41 +1,70 @@
-"""Feature definitions for telematics risk scoring."""
-
-from typing import Dict, Any, List
-
-# Canonical feature set
-FEATURE_DEFINITIONS: Dict[str, Dict[str, Any]] = {
-    "f_trip_max_speed": {
-        "description": "Maximum speed during trip",
-        "entity": "trip",
-        "aggregation": "max",
-        "window": None
-    },
-    "f_trip_avg_accel": {
-        "description": "Average acceleration during trip",
-        "entity": "trip",
-        "aggregation": "avg",
-        "window": None
-    },
-    "f_trip_harsh_brake_count": {
-        "description": "Count of harsh braking events (>2.5 m/s² deceleration)",
-        "entity": "trip",
-        "aggregation": "count",
-        "window": None
-    },
-    "f_policy_monthly_miles_30d": {
-        "description": "Total miles driven in last 30 days",
-        "entity": "policy",
-        "aggregation": "sum",
-        "window": "30d"
-    },
-    "f_policy_percent_city_driving": {
-        "description": "Percentage of driving in city areas",
-        "entity": "policy",
-        "aggregation": "percent",
-        "window": None
+"""Feature definitions for telematics risk scoring.
+
+The canonical catalog is ``feature_manifest.yml`` next to this module; the
+definitions here are a read-only view of it so there is a single source. The
+manifest (and yaml) is only loaded when a definition is first needed.
+"""
+
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+MANIFEST_PATH = Path(__file__).with_name('feature_manifest.yml')
+
+_manifest_cache: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+# path -> ((size, mtime_ns), sha256), so an unchanged file is not re-read and re-hashed
+_digest_cache: Dict[str, Tuple[Tuple[int, int], str]] = {}
+_manifest_lock = threading.Lock()
+
+def load_manifest(path: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+    """Load a feature manifest.
+
+    Returns:
+        (sha256 of the file contents, parsed manifest). Parsed manifests are
+        cached by content hash, and the hash by file size and mtime, so an
+        edited file is picked up on the next call.
+    """
+    path = str(path or MANIFEST_PATH)
+    st = os.stat(path)
+    stamp = (st.st_size, st.st_mtime_ns)
+    with _manifest_lock:
+        known = _digest_cache.get(path)
+        if known is not None and known[0] == stamp and known[1] in _manifest_cache:
+            return _manifest_cache[known[1]]
+    data = Path(path).read_bytes()
+    digest = hashlib.sha256(data).hexdigest()
+    with _manifest_lock:
+        _digest_cache[path] = (stamp, digest)
+        cached = _manifest_cache.get(digest)
+        if cached is None:
+            import yaml
+
+            cached = _manifest_cache[digest] = (digest, yaml.safe_load(data))
+    return cached
+
+def _definitions(manifest: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    return {
+        feature['name']: {
+            "description": feature.get('description'),
+            "entity": feature.get('entity', 'trip'),
+            "aggregation": feature.get('aggregation'),
+            "window": None if feature.get('window') in (None, 'trip') else feature['window'],
+        }
+        for feature in manifest.get('features', [])
     }
-}
+
+def __getattr__(name: str):
+    # FEATURE_DEFINITIONS (the canonical feature set) is built on first access
+    if name == 'FEATURE_DEFINITIONS':
+        return _definitions(load_manifest()[1])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def get_feature_names() -> List[str]:
     """Get list of all defined feature names."""
-    return list(FEATURE_DEFINITIONS.keys())
+    return list(_definitions(load_manifest()[1]))
+
+def get_model_feature_order(path: Optional[str] = None) -> List[str]:
+    """Ordered feature columns the risk model is trained on and scored with."""
+    return list(load_manifest(path)[1]['model_features'])
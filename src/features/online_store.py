@@ -0,0 +1,447 @@
+"""Online feature store client.
+
+Features are stored per feature group (the manifest entity: 'trip' or
+'policy') as one hash per entity, keyed ``{namespace}:{group}:{entity_id}``.
+:class:`OnlineFeatureClient` puts an in-process LRU+TTL cache in front of a
+pluggable backend and fetches all cache misses of a batch in one pipelined
+round trip. :class:`BatchedFeatureWriter` buffers writes from the streaming
+aggregators and flushes them in pipelined batches.
+
+Backends: :class:`RedisBackend` (pooled connections; needs the ``redis``
+package) and :class:`InMemoryBackend`, a pure-Python stand-in for tests and
+local runs.
+"""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_NAMESPACE = 'features'
+DEFAULT_REDIS_PORT = 6379
+DEFAULT_CACHE_SIZE = 100_000
+DEFAULT_CACHE_TTL_S = 60.0
+DEFAULT_WRITE_BATCH_SIZE = 1_000
+
+# Feature name -> value; in writes, a None value deletes the field
+FeatureRow = Dict[str, Optional[float]]
+
+
+class OnlineStoreBackend(ABC):
+    """Storage interface: pipelined multi-get/multi-set of feature hashes."""
+
+    @abstractmethod
+    def get_many(self, keys: Sequence[str]) -> List[Optional[FeatureRow]]:
+        """Feature rows for ``keys``, in order; None where a key is absent."""
+
+    @abstractmethod
+    def set_many(self, rows: Dict[str, FeatureRow], ttl_s: Optional[float] = None):
+        """Merge feature values into each key's hash, optionally expiring the keys.
+
+        Fields whose value is None are deleted from the hash.
+        """
+
+    @abstractmethod
+    def delete_many(self, keys: Sequence[str]):
+        """Remove ``keys`` from the store."""
+
+    def close(self):
+        pass
+
+
+class InMemoryBackend(OnlineStoreBackend):
+    """Thread-safe dict-backed store with the same semantics as RedisBackend."""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[Optional[float], FeatureRow]] = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[FeatureRow]]:
+        now = time.monotonic()
+        out: List[Optional[FeatureRow]] = []
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is not None and entry[0] is not None and entry[0] <= now:
+                    del self._data[key]
+                    entry = None
+                out.append(dict(entry[1]) if entry is not None else None)
+        return out
+
+    def set_many(self, rows: Dict[str, FeatureRow], ttl_s: Optional[float] = None):
+        expires_at = time.monotonic() + ttl_s if ttl_s else None
+        with self._lock:
+            for key, values in rows.items():
+                entry = self._data.get(key)
+                merged = dict(entry[1]) if entry is not None else {}
+                for name, value in values.items():
+                    if value is None:
+                        merged.pop(name, None)
+                    else:
+                        merged[name] = value
+                self._data[key] = (expires_at, merged)
+
+    def delete_many(self, keys: Sequence[str]):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class RedisBackend(OnlineStoreBackend):
+    """Redis hashes behind a shared connection pool; batches use one pipeline."""
+
+    def __init__(self, host: str = 'localhost', port: int = DEFAULT_REDIS_PORT, db: int = 0,
+                 max_connections: int = 32, socket_timeout_s: float = 1.0):
+        import redis
+
+        self.pool = redis.ConnectionPool(host=host, port=port, db=db, max_connections=max_connections,
+                                         socket_timeout=socket_timeout_s)
+        self.client = redis.Redis(connection_pool=self.pool)
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[FeatureRow]]:
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.hgetall(key)
+        return [{name.decode(): float(value) for name, value in raw.items()} if raw else None
+                for raw in pipe.execute()]
+
+    def set_many(self, rows: Dict[str, FeatureRow], ttl_s: Optional[float] = None):
+        pipe = self.client.pipeline(transaction=False)
+        for key, values in rows.items():
+            mapping = {name: repr(float(value)) for name, value in values.items() if value is not None}
+            deleted = [name for name, value in values.items() if value is None]
+            if mapping:
+                pipe.hset(key, mapping=mapping)
+            if deleted:
+                pipe.hdel(key, *deleted)
+            if ttl_s:
+                pipe.pexpire(key, int(ttl_s * 1000))
+        pipe.execute()
+
+    def delete_many(self, keys: Sequence[str]):
+        if keys:
+            self.client.delete(*keys)
+
+    def close(self):
+        self.pool.disconnect()
+
+
+class FeatureStoreStats:
+    """Cache hit-rate and backend latency counters (thread-safe)."""
+
+    FIELDS = ('cache_hits', 'cache_misses', 'backend_found', 'backend_missing', 'read_calls',
+              'read_seconds', 'read_max_seconds', 'rows_written', 'write_calls', 'write_seconds',
+              'write_max_seconds')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            for field in self.FIELDS:
+                setattr(self, field, 0)
+
+    def record_lookup(self, hits: int, misses: int):
+        with self._lock:
+            self.cache_hits += hits
+            self.cache_misses += misses
+
+    def record_read(self, found: int, missing: int, seconds: float):
+        with self._lock:
+            self.backend_found += found
+            self.backend_missing += missing
+            self.read_calls += 1
+            self.read_seconds += seconds
+            self.read_max_seconds = max(self.read_max_seconds, seconds)
+
+    def record_write(self, rows: int, seconds: float):
+        with self._lock:
+            self.rows_written += rows
+            self.write_calls += 1
+            self.write_seconds += seconds
+            self.write_max_seconds = max(self.write_max_seconds, seconds)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.cache_hits + self.cache_misses
+        return self.cache_hits / lookups if lookups else 0.0
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            stats = {field: getattr(self, field) for field in self.FIELDS}
+        stats['hit_rate'] = self.hit_rate
+        stats['read_mean_seconds'] = stats['read_seconds'] / stats['read_calls'] if stats['read_calls'] else 0.0
+        stats['write_mean_seconds'] = stats['write_seconds'] / stats['write_calls'] if stats['write_calls'] else 0.0
+        return stats
+
+
+class _LRUTTLCache:
+    """LRU cache with a per-entry TTL and O(1) per-group invalidation.
+
+    Each entry records its group's generation when stored; invalidating a group
+    bumps the generation, so its stale entries miss and are dropped lazily.
+
+    Every write to a group (``discard`` or ``invalidate_group``) also bumps the
+    group's version. A reader takes the version before going to the backend
+    and passes it to ``put_many``, which caches nothing if a write happened in
+    between: the rows read may predate it.
+    """
+
+    def __init__(self, maxsize: int, ttl_s: float):
+        self.maxsize = maxsize
+        self.ttl_s = ttl_s
+        self._entries: 'OrderedDict[Tuple[str, str], Tuple[int, float, FeatureRow]]' = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, group: str, entity_id: str, now: float) -> Optional[FeatureRow]:
+        key = (group, entity_id)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        generation, expires_at, row = entry
+        if expires_at <= now or generation != self._generations.get(group, 0):
+            self._entries.pop(key, None)
+            return None
+        self._entries.move_to_end(key)
+        return row
+
+    def get_many(self, group: str, entity_ids: Sequence[str]) -> List[Optional[FeatureRow]]:
+        now = time.monotonic()
+        with self._lock:
+            return [self.get(group, entity_id, now) for entity_id in entity_ids]
+
+    def version(self, group: str) -> int:
+        with self._lock:
+            return self._versions.get(group, 0)
+
+    def put_many(self, group: str, rows: Dict[str, FeatureRow], version: Optional[int] = None):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if version is not None and version != self._versions.get(group, 0):
+                return
+            generation = self._generations.get(group, 0)
+            expires_at = time.monotonic() + self.ttl_s
+            for entity_id, row in rows.items():
+                key = (group, entity_id)
+                self._entries[key] = (generation, expires_at, row)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, group: str, entity_ids: Iterable[str]):
+        with self._lock:
+            self._versions[group] = self._versions.get(group, 0) + 1
+            for entity_id in entity_ids:
+                self._entries.pop((group, entity_id), None)
+
+    def invalidate_group(self, group: str):
+        with self._lock:
+            self._versions[group] = self._versions.get(group, 0) + 1
+            self._generations[group] = self._generations.get(group, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class OnlineFeatureClient:
+    """Read and write online features through a local LRU+TTL cache.
+
+    Args:
+        backend: Storage backend; an in-memory one when omitted.
+        cache_size: Entities kept in the local cache (0 disables it).
+        cache_ttl_s: Seconds a cached row may be served before re-reading.
+        namespace: Key prefix in the backend.
+        key_ttl_s: Optional expiry for keys written to the backend.
+    """
+
+    def __init__(self, backend: Optional[OnlineStoreBackend] = None, cache_size: int = DEFAULT_CACHE_SIZE,
+                 cache_ttl_s: float = DEFAULT_CACHE_TTL_S, namespace: str = DEFAULT_NAMESPACE,
+                 key_ttl_s: Optional[float] = None):
+        self.backend = backend if backend is not None else InMemoryBackend()
+        self.namespace = namespace
+        self.key_ttl_s = key_ttl_s
+        self.cache = _LRUTTLCache(cache_size, cache_ttl_s)
+        self.stats = FeatureStoreStats()
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]] = None, backend: Optional[str] = None,
+                    **kwargs) -> 'OnlineFeatureClient':
+        """Build a client from FEATURESTORE_REDIS ('host:port') or FEAST_REDIS_HOST.
+
+        ``backend`` is 'redis' or 'memory'; by default Redis is used when
+        either key is configured.
+        """
+        if config is None:
+            from src.utils.config import get_config
+            config = get_config()
+        address = config.get('FEATURESTORE_REDIS')
+        host, port = config.get('FEAST_REDIS_HOST'), DEFAULT_REDIS_PORT
+        if address:
+            host, _, port_text = str(address).partition(':')
+            port = int(port_text) if port_text else DEFAULT_REDIS_PORT
+        if backend is None:
+            backend = 'redis' if host else 'memory'
+        if backend == 'redis':
+            return cls(RedisBackend(host, port), **kwargs)
+        if backend == 'memory':
+            return cls(InMemoryBackend(), **kwargs)
+        raise ValueError(f"Unknown feature store backend: {backend}")
+
+    def _key(self, group: str, entity_id: str) -> str:
+        return f"{self.namespace}:{group}:{entity_id}"
+
+    def get_features(self, group: str, entity_ids: Sequence[str]) -> List[Optional[FeatureRow]]:
+        """Feature rows for ``entity_ids`` (None where absent), in order.
+
+        Cached rows are served locally; all misses go to the backend in one
+        pipelined multi-get and are cached on the way back, unless the group
+        was written meanwhile.
+        """
+        entity_ids = [str(entity_id) for entity_id in entity_ids]
+        rows = self.cache.get_many(group, entity_ids)
+        misses = [i for i, row in enumerate(rows) if row is None]
+        self.stats.record_lookup(len(rows) - len(misses), len(misses))
+        if not misses:
+            return rows
+
+        # Fetch each distinct missing id once, even if the batch repeats it
+        missing_ids = list(dict.fromkeys(entity_ids[i] for i in misses))
+        version = self.cache.version(group)
+        start = time.perf_counter()
+        fetched = self.backend.get_many([self._key(group, entity_id) for entity_id in missing_ids])
+        found = {entity_id: row for entity_id, row in zip(missing_ids, fetched) if row is not None}
+        self.stats.record_read(len(found), len(missing_ids) - len(found), time.perf_counter() - start)
+
+        self.cache.put_many(group, found, version)
+        for i in misses:
+            rows[i] = found.get(entity_ids[i])
+        return rows
+
+    def get_feature_frame(self, group: str, entity_ids: Sequence[str],
+                          feature_names: Sequence[str]) -> pd.DataFrame:
+        """``feature_names`` for each entity as a float DataFrame indexed by entity id.
+
+        Absent entities and features are NaN.
+        """
+        rows = self.get_features(group, entity_ids)
+        matrix = np.full((len(rows), len(feature_names)), np.nan)
+        for i, row in enumerate(rows):
+            if row is not None:
+                matrix[i] = [row.get(name, np.nan) for name in feature_names]
+        return pd.DataFrame(matrix, index=pd.Index(list(entity_ids), name=f"{group}_id"),
+                            columns=list(feature_names))
+
+    def write(self, group: str, rows: Dict[str, FeatureRow]):
+        """Write feature rows in one pipelined batch and drop them from the local cache."""
+        if not rows:
+            return
+        start = time.perf_counter()
+        self.backend.set_many({self._key(group, entity_id): values for entity_id, values in rows.items()},
+                              ttl_s=self.key_ttl_s)
+        self.stats.record_write(len(rows), time.perf_counter() - start)
+        self.cache.discard(group, rows)
+
+    def delete(self, group: str, entity_ids: Sequence[str]):
+        self.backend.delete_many([self._key(group, entity_id) for entity_id in entity_ids])
+        self.cache.discard(group, entity_ids)
+
+    def invalidate_group(self, group: str):
+        """Drop every cached row of a feature group, e.g. after a bulk backfill."""
+        self.cache.invalidate_group(group)
+
+    def close(self):
+        self.backend.close()
+
+
+class BatchedFeatureWriter:
+    """Buffer feature rows and flush them to the client in batches.
+
+    Rows for the same entity are merged in the buffer, so a policy updated by
+    several trips in one micro-batch is written once.
+
+    Args:
+        client: Client to write through.
+        group: Feature group the rows belong to.
+        batch_size: Buffered entities that trigger a flush.
+    """
+
+    def __init__(self, client: OnlineFeatureClient, group: str, batch_size: int = DEFAULT_WRITE_BATCH_SIZE):
+        self.client = client
+        self.group = group
+        self.batch_size = batch_size
+        self._buffer: Dict[str, FeatureRow] = {}
+
+    def write(self, entity_id: str, features: FeatureRow):
+        self._buffer.setdefault(str(entity_id), {}).update(features)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def write_frame(self, frame: pd.DataFrame, key_column: str):
+        """Buffer one row per entity from ``frame``; NaN features are deleted from the store."""
+        feature_columns = [col for col in frame.columns if col != key_column]
+        values = frame[feature_columns].to_numpy(dtype=np.float64, na_value=np.nan)
+        for entity_id, row in zip(frame[key_column].to_numpy(dtype=object), values.tolist()):
+            self._buffer.setdefault(str(entity_id), {}).update(
+                {col: value if value == value else None for col, value in zip(feature_columns, row)})
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            buffer, self._buffer = self._buffer, {}
+            self.client.write(self.group, buffer)
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def __enter__(self) -> 'BatchedFeatureWriter':
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+
+def publish_policy_features(aggregator, trips: pd.DataFrame, writer: BatchedFeatureWriter):
+    """Fold finalized trips into a PolicyWindowAggregator and queue the touched policies' features.
+
+    Args:
+        aggregator: ``PolicyWindowAggregator`` holding the rolling windows.
+        trips: Finalized trips (e.g. from ``TripAggregator.update``).
+        writer: Writer for the 'policy' feature group.
+    """
+    aggregator.update(trips)
+    policy_ids = trips['policy_id'].dropna().unique()
+    if len(policy_ids):
+        writer.write_frame(aggregator.features(policy_ids), 'policy_id')
+
+def publish_trip_features(trips: pd.DataFrame, writer: BatchedFeatureWriter, plan=None):
+    """Queue the manifest trip features of finalized trips.
+
+    Args:
+        trips: Finalized trips carrying the plan's feature columns (e.g. from
+               ``TripAggregator.update``).
+        writer: Writer for the 'trip' feature group.
+        plan: ``TripFeaturePlan`` whose ``feature_columns`` are written; the
+              compiled manifest when omitted.
+    """
+    if trips.empty:
+        return
+    if plan is None:
+        from src.features.feature_compiler import compile_manifest
+        plan = compile_manifest()
+    writer.write_frame(trips[['trip_id'] + plan.feature_columns], 'trip_id')
@@ -1,10 +1,26 @@
 """Telemetry generator for POC simulation."""
 
+import argparse
+import hashlib
 import json
+import os
 import random
 import uuid
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta, UTC
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.ingestion.telemetry_reader import EVENT_TYPES, LOCATION_PRECISIONS, TELEMETRY_COLUMNS
+
+DEFAULT_CHUNK_SIZE = 100_000
+OUTPUT_FORMATS = ('jsonl', 'avro', 'parquet')
+PROVIDERS = ['simulator-v1.0', 'oem-gateway', 'mobile-sdk']
+AVRO_SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schemas', 'telemetry_event.avsc')
+
+_EVENT_CODE = {name: code for code, name in enumerate(EVENT_TYPES)}
 
 def generate_telemetry_events(num_events: int = 100) -> List[Dict[str, Any]]:
     """Generate a list of sample telemetry events.
@@ -55,7 +71,293 @@ def generate_telemetry_events(num_events: int = 100) -> List[Dict[str, Any]]:
 
     return events
 
+def _uuid_strings(rng: np.random.Generator, n: int) -> List[str]:
+    raw = rng.bytes(16 * n)
+    return [str(uuid.UUID(bytes=raw[16 * i:16 * (i + 1)])) for i in range(n)]
+
+def _offsets_within(keys: np.ndarray, amounts: np.ndarray) -> np.ndarray:
+    """Sum of ``amounts`` of earlier items with the same key, in input order."""
+    order = np.argsort(keys, kind='stable')
+    sorted_amounts = amounts[order]
+    exclusive = np.cumsum(sorted_amounts) - sorted_amounts
+    sorted_keys = keys[order]
+    seg_start = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]
+    seg_id = np.cumsum(seg_start) - 1
+    result = np.empty_like(exclusive)
+    result[order] = exclusive - exclusive[seg_start][seg_id]
+    return result
+
+def _cumsum_within(values: np.ndarray, first: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Inclusive cumulative sum restarted at each trip."""
+    total = np.cumsum(values)
+    return total - np.repeat(total[first] - values[first], lengths)
+
+def _ar1(noise: np.ndarray, phi: float, pos: np.ndarray, first: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """AR(1) process x_t = phi * x_{t-1} + noise_t, restarted from zero at each trip.
+
+    One lfilter pass runs over all trips; the state carried across a trip
+    boundary decays as phi**k and is subtracted out.
+    """
+    from scipy.signal import lfilter
+
+    y = lfilter([1.0], [1.0, -phi], noise)
+    carried = np.r_[0.0, y][first]
+    return y - phi ** (pos + 1.0) * np.repeat(carried, lengths)
+
+class FleetSimulator:
+    """Seeded, vectorized simulation of many devices driving contiguous trips.
+
+    Each call to :meth:`next_chunk` simulates a batch of whole trips: speed is
+    a cruise level plus an autocorrelated random walk with ramps at both ends
+    and occasional hard-braking impulses, longitudinal acceleration follows
+    from the speed changes, position and heading integrate along the trip,
+    and per-device clocks and odometers carry over between trips so both are
+    monotone. Memory depends on the number of devices and the chunk size only.
+
+    Args:
+        num_devices: Devices in the fleet.
+        num_policies: Distinct policies the devices belong to; defaults to 80% of devices.
+        seed: Seed, or a ``np.random.SeedSequence``.
+        start_ts: Earliest trip start (UTC).
+        mean_trip_events: Mean events per trip.
+    """
+
+    def __init__(self, num_devices: int = 1000, num_policies: Optional[int] = None, seed=42,
+                 start_ts: str = '2025-11-01T00:00:00Z', mean_trip_events: int = 600):
+        self.rng = np.random.default_rng(seed)
+        self.num_devices = num_devices
+        self.mean_trip_events = mean_trip_events
+        rng = self.rng
+        n = num_devices
+
+        self.device_ids = _uuid_strings(rng, n)
+        num_policies = num_policies or max(1, n * 4 // 5)
+        policies = np.array(_uuid_strings(rng, num_policies), dtype=object)
+        self.policy_ids = policies[rng.integers(0, num_policies, size=n)]
+        drivers = [hashlib.sha256(d.encode('utf-8')).hexdigest() for d in self.device_ids]
+        self.driver_ids = np.where(rng.random(n) < 0.9, np.array(drivers, dtype=object), None)
+
+        start_ns = pd.Timestamp(start_ts).value
+        self.clock_ns = start_ns + rng.integers(0, 3600, size=n) * 1_000_000_000
+        self.odometer_km = rng.uniform(1_000, 150_000, size=n)
+        self.home_lat = rng.uniform(26.0, 48.0, size=n)
+        self.home_lon = rng.uniform(-122.0, -72.0, size=n)
+        self.sample_rate_hz = rng.choice([1.0, 2.0], size=n, p=[0.8, 0.2])
+        self.provider_codes = rng.integers(0, len(PROVIDERS), size=n)
+        self.precision_codes = rng.choice(len(LOCATION_PRECISIONS), size=n, p=[0.7, 0.2, 0.1])
+        self.battery_pct = rng.uniform(40, 100, size=n)
+
+    def next_chunk(self, max_events: int = DEFAULT_CHUNK_SIZE) -> pd.DataFrame:
+        """Simulate whole trips totalling at most ``max_events`` events (at least one trip).
+
+        Every trip has a start_trip and an end_trip event, so ``max_events``
+        below 2 still yields one two-event trip.
+        """
+        rng = self.rng
+        max_events = max(max_events, 2)
+        n_draw = max(1, 2 * max_events // self.mean_trip_events)
+        lengths = np.clip(rng.gamma(2.0, self.mean_trip_events / 2.0, size=n_draw).astype(np.int64), 2, max_events)
+        lengths = lengths[np.cumsum(lengths) <= max_events]
+        n_trips = len(lengths)
+        n_events = int(lengths.sum())
+
+        device = rng.integers(0, self.num_devices, size=n_trips)
+        rate = self.sample_rate_hz[device]
+        duration_ns = (lengths / rate * 1e9).astype(np.int64)
+        parked_ns = (rng.exponential(2 * 3600, size=n_trips) * 1e9).astype(np.int64)
+        trip_start = self.clock_ns[device] + _offsets_within(device, duration_ns + parked_ns) + parked_ns
+        np.add.at(self.clock_ns, device, duration_ns + parked_ns)
+
+        first = np.cumsum(lengths) - lengths
+        trip = np.repeat(np.arange(n_trips), lengths)
+        pos = np.arange(n_events) - np.repeat(first, lengths)
+        dev = device[trip]
+        event_rate = rate[trip]
+        ts_ns = trip_start[trip] + (pos * 1e9 / event_rate).astype(np.int64)
+
+        # Speed: cruise level + AR(1) drift + braking impulses, ramped in and out
+        impulses = np.where(rng.random(n_events) < 0.002, -rng.uniform(8, 20, size=n_events), 0.0)
+        drift = _ar1(rng.normal(0, 1.5, size=n_events) + impulses, 0.98, pos, first, lengths)
+        cruise = rng.uniform(30, 110, size=n_trips)[trip]
+        ramp = 30.0 * event_rate
+        length_e = lengths[trip]
+        envelope = np.minimum(1.0, np.minimum(pos + 1, length_e - pos) / ramp)
+        speed = np.clip(envelope * (cruise + drift), 0.0, 180.0)
+
+        dv = np.diff(speed, prepend=0.0)
+        dv[first] = 0.0
+        accel_y = dv / 3.6 * event_rate + rng.normal(0, 0.1, size=n_events)
+        accel_x = _ar1(rng.normal(0, 0.1, size=n_events), 0.9, pos, first, lengths)
+        accel_z = rng.normal(0, 0.15, size=n_events)
+
+        turn = _ar1(rng.normal(0, 0.5, size=n_events), 0.95, pos, first, lengths)
+        heading = (rng.uniform(0, 360, size=n_trips)[trip] + _cumsum_within(turn, first, lengths)) % 360.0
+        step_km = speed / 3600.0 / event_rate
+        lat0 = self.home_lat[dev] + rng.normal(0, 0.05, size=n_trips)[trip]
+        rad = np.radians(heading)
+        lat = lat0 + _cumsum_within(step_km * np.cos(rad), first, lengths) / 111.0
+        lon = self.home_lon[dev] + _cumsum_within(step_km * np.sin(rad), first, lengths) / (111.0 * np.cos(np.radians(lat0)))
+
+        distance = np.add.reduceat(step_km, first)
+        odometer = (self.odometer_km[device] + _offsets_within(device, distance))[trip] + _cumsum_within(step_km, first, lengths)
+        np.add.at(self.odometer_km, device, distance)
+
+        event_code = np.where(rng.random(n_events) < 0.03, _EVENT_CODE['heartbeat'], _EVENT_CODE['sample'])
+        event_code[accel_y <= -4.0] = _EVENT_CODE['alert']
+        event_code[first] = _EVENT_CODE['start_trip']
+        event_code[first + lengths - 1] = _EVENT_CODE['end_trip']
+
+        rpm = (800 + speed * 30 + rng.normal(0, 100, size=n_events)).astype(np.int32)
+        battery = np.clip(self.battery_pct[dev] - pos * 0.001, 5.0, 100.0)
+        self.battery_pct[device] = rng.uniform(40, 100, size=n_trips)
+
+        ts = pd.to_datetime(ts_ns, utc=True).astype('datetime64[ns, UTC]')
+        return pd.DataFrame({
+            'device_id': pd.Categorical.from_codes(dev, self.device_ids),
+            'policy_id': self.policy_ids[dev],
+            'trip_id': pd.Categorical.from_codes(trip, _uuid_strings(rng, n_trips)),
+            'ts': ts,
+            'event_type': pd.Categorical.from_codes(event_code, categories=EVENT_TYPES),
+            'lat': lat,
+            'lon': lon,
+            'gps_accuracy_m': 1.0 + rng.gamma(2.0, 2.5, size=n_events),
+            'speed_kmh': speed,
+            'accel_x_m_s2': accel_x,
+            'accel_y_m_s2': accel_y,
+            'accel_z_m_s2': accel_z,
+            'brake_strength': np.where(accel_y < -0.5, np.clip(-accel_y / 6.0, 0.0, 1.0), np.nan),
+            'steering_angle_deg': np.clip(turn * 10.0, -180.0, 180.0),
+            'heading_deg': heading,
+            'odometer_km': odometer,
+            'engine_rpm': pd.arrays.IntegerArray(rpm, rng.random(n_events) < 0.05),
+            'battery_level_pct': battery,
+            'sample_rate_hz': event_rate,
+            'provider': pd.Categorical.from_codes(self.provider_codes[dev], PROVIDERS),
+            'hashed_driver_id': self.driver_ids[dev],
+            'location_precision': pd.Categorical.from_codes(self.precision_codes[dev], LOCATION_PRECISIONS),
+        })
+
+def generate_telemetry_frames(num_events: int, num_devices: int = 1000, num_policies: Optional[int] = None,
+                              seed=42, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                              start_ts: str = '2025-11-01T00:00:00Z') -> Iterator[pd.DataFrame]:
+    """Yield ``num_events`` simulated events as DataFrames of at most ``chunk_size`` rows.
+
+    A trip needs at least two events, so when one event is left the last trip
+    adds one more.
+    """
+    fleet = FleetSimulator(num_devices, num_policies, seed, start_ts)
+    remaining = num_events
+    while remaining > 0:
+        frame = fleet.next_chunk(min(chunk_size, remaining))
+        remaining -= len(frame)
+        yield frame
+
+def _format_ts(ts: pd.Series) -> np.ndarray:
+    values = ts.to_numpy(dtype='datetime64[ns]').astype('datetime64[us]')
+    return np.char.add(np.datetime_as_string(values, unit='us'), 'Z')
+
+def _to_records(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    out = frame.astype(object)
+    out['ts'] = _format_ts(frame['ts'])
+    return out.where(frame.notna(), None).to_dict('records')
+
+def write_telemetry(frames: Iterator[pd.DataFrame], path: str, fmt: str = 'jsonl') -> int:
+    """Stream DataFrames to one JSONL, Avro or Parquet file, one chunk in memory at a time.
+
+    Returns:
+        Number of events written.
+    """
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+    rows = 0
+    if fmt == 'jsonl':
+        with open(path, 'w') as f:
+            for frame in frames:
+                out = frame[TELEMETRY_COLUMNS].copy()
+                out['ts'] = _format_ts(frame['ts'])
+                out.to_json(f, orient='records', lines=True, double_precision=7)
+                rows += len(frame)
+    elif fmt == 'avro':
+        import fastavro
+        from fastavro.write import Writer
+
+        with open(AVRO_SCHEMA_PATH, 'r') as f:
+            schema = fastavro.parse_schema(json.load(f))
+        with open(path, 'wb') as f:
+            writer = Writer(f, schema)
+            for frame in frames:
+                for record in _to_records(frame[TELEMETRY_COLUMNS]):
+                    writer.write(record)
+                rows += len(frame)
+            writer.flush()
+    else:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        from src.ingestion.telemetry_store import TELEMETRY_ARROW_SCHEMA
+
+        with pq.ParquetWriter(path, TELEMETRY_ARROW_SCHEMA, compression='zstd') as writer:
+            for frame in frames:
+                table = pa.Table.from_pandas(frame[TELEMETRY_COLUMNS], preserve_index=False)
+                writer.write_table(table.cast(TELEMETRY_ARROW_SCHEMA))
+                rows += len(frame)
+    return rows
+
+def _share(total: int, parts: int, index: int) -> int:
+    return total // parts + (1 if index < total % parts else 0)
+
+def _write_shard(args) -> str:
+    path, fmt, num_events, num_devices, num_policies, seed, chunk_size, start_ts = args
+    frames = generate_telemetry_frames(num_events, num_devices, num_policies, seed, chunk_size, start_ts)
+    write_telemetry(frames, path, fmt)
+    return path
+
+def generate_telemetry_files(output_dir: str, num_events: int, fmt: str = 'jsonl', num_devices: int = 1000,
+                             num_policies: Optional[int] = None, seed: int = 42, num_shards: int = 1,
+                             n_jobs: int = 1, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                             start_ts: str = '2025-11-01T00:00:00Z') -> List[str]:
+    """Write simulated telemetry as ``num_shards`` files under ``output_dir``.
+
+    Devices, policies and events are split evenly across shards, and each shard
+    gets its own child seed, so the output depends only on ``seed`` and
+    ``num_shards``; ``n_jobs`` only sets how many shards are written at once.
+
+    Returns:
+        Paths of the written files.
+    """
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+    os.makedirs(output_dir, exist_ok=True)
+    num_policies = num_policies or max(1, num_devices * 4 // 5)
+    seeds = np.random.SeedSequence(seed).spawn(num_shards)
+    tasks = []
+    for shard in range(num_shards):
+        path = os.path.join(output_dir, f'part-{shard:05d}.{fmt}')
+        tasks.append((path, fmt, _share(num_events, num_shards, shard),
+                      max(1, _share(num_devices, num_shards, shard)), max(1, _share(num_policies, num_shards, shard)),
+                      seeds[shard], chunk_size, start_ts))
+
+    if n_jobs > 1 and num_shards > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            return list(pool.map(_write_shard, tasks))
+    return [_write_shard(task) for task in tasks]
+
 if __name__ == "__main__":
-    events = generate_telemetry_events(10)
-    for event in events:
-        print(json.dumps(event))
+    parser = argparse.ArgumentParser(description="Generate synthetic telemetry.")
+    parser.add_argument('--output', help="Directory to write files to; prints 10 sample events when omitted")
+    parser.add_argument('--num-events', type=int, default=1_000_000)
+    parser.add_argument('--devices', type=int, default=1000)
+    parser.add_argument('--policies', type=int, default=None)
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='jsonl')
+    parser.add_argument('--shards', type=int, default=1)
+    parser.add_argument('--jobs', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    if args.output is None:
+        events = generate_telemetry_events(10)
+        for event in events:
+            print(json.dumps(event))
+    else:
+        paths = generate_telemetry_files(args.output, args.num_events, args.format, args.devices, args.policies,
+                                         args.seed, args.shards, args.jobs)
+        print(f"Wrote {args.num_events} events to {len(paths)} file(s) in {args.output}")
@@ -0,0 +1,412 @@
+"""Byte-offset secondary indexes over raw telemetry files.
+
+For every value of the indexed id columns the index records where its events
+live: byte ranges of JSONL lines, or row-group ids of Parquet files. A lookup
+reads only those ranges instead of scanning the files.
+
+Layout::
+
+    <index>/_index.json                        files, ids and segment list
+    <index>/seg-000001.trip_id.keys.npy        sorted distinct uint64 key hashes
+    <index>/seg-000001.trip_id.starts.npy      first range of each key (CSR offsets)
+    <index>/seg-000001.trip_id.ranges.npy      (file, length, offset), 16 bytes each
+
+Each :meth:`TelemetryIndex.update` writes one new segment for the files (or
+appended JSONL tails) it has not seen, so updates cost only the new data;
+:meth:`TelemetryIndex.compact` merges segments. Segments are memory-mapped, so
+opening an index reads no entries and a lookup touches O(log n) pages. Keys
+are 64-bit hashes of the id, and lookups re-check the decoded rows, so a hash
+collision costs a wasted read, never a wrong row.
+
+One thread may :meth:`~TelemetryIndex.update` while others look up: the new
+segment list is swapped in only once it is fully loaded.
+"""
+
+import hashlib
+import io
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from src.ingestion.telemetry_reader import (TELEMETRY_COLUMNS, _records_to_frame, concat_chunks, list_telemetry_files,
+                                            open_parquet, parquet_frame)
+
+INDEX_VERSION = 1
+MANIFEST_FILENAME = '_index.json'
+INDEXED_FIELDS = ('trip_id', 'device_id', 'policy_id', 'hashed_driver_id')
+# Bytes of JSONL decoded per indexing step
+BUILD_CHUNK_BYTES = 64 * 1024 * 1024
+# Ranges of one file closer than this are fetched with a single read
+READ_GAP_BYTES = 16 * 1024
+
+SEGMENT_PARTS = ('keys', 'starts', 'ranges')
+# Byte ranges for JSONL files (a merged run of lines stays below 4 GiB); (row group, 0) for Parquet
+RANGE_DTYPE = np.dtype([('file', '<u4'), ('length', '<u4'), ('offset', '<u8')])
+
+def key_hashes(values: Iterable[str]) -> np.ndarray:
+    """64-bit index keys for id strings (blake2b, stable across processes)."""
+    return np.array([int.from_bytes(hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest(), 'little')
+                     for value in values], dtype=np.uint64)
+
+def _column_keys(column) -> Tuple[np.ndarray, np.ndarray]:
+    """(row positions, key) for the non-null values of an arrow string column, hashing each distinct value once."""
+    import pyarrow as pa
+
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks()
+    encoded = column.dictionary_encode()
+    indices = encoded.indices.to_numpy(zero_copy_only=False)
+    valid = np.flatnonzero(encoded.indices.is_valid().to_numpy(zero_copy_only=False))
+    keys = key_hashes(encoded.dictionary.to_pylist())
+    return valid, keys[indices[valid].astype(np.int64)]
+
+def _merge_ranges(keys: np.ndarray, ranges: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Sort entries by (key, file, offset) and join byte ranges that continue each other."""
+    order = np.lexsort((ranges['offset'], ranges['file'], keys))
+    keys, ranges = keys[order], ranges[order]
+    if len(keys) < 2:
+        return keys, ranges
+    ends = ranges['offset'] + ranges['length']
+    # Row-group entries have length 0 and never merge
+    continues = ((keys[1:] == keys[:-1]) & (ranges['file'][1:] == ranges['file'][:-1])
+                 & (ranges['offset'][1:] == ends[:-1]) & (ranges['length'][1:] > 0))
+    # Cut runs into pieces by end offset in 2 GiB steps, so each piece spans
+    # under 4 GiB and its length fits in uint32
+    run_starts = np.flatnonzero(np.r_[True, ~continues])
+    run_start = np.repeat(ranges['offset'][run_starts], np.diff(np.r_[run_starts, len(keys)]))
+    piece = (ends - run_start) // (1 << 31)
+    continues &= piece[1:] == piece[:-1]
+    starts = np.flatnonzero(np.r_[True, ~continues])
+    merged = ranges[starts]
+    last = np.r_[starts[1:], len(keys)] - 1
+    merged['length'] = ends[last] - merged['offset']
+    return keys[starts], merged
+
+def _expand(segment: Tuple[np.ndarray, np.ndarray, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """(key per range, ranges) of a stored segment field."""
+    keys, starts, ranges = segment
+    return np.repeat(np.asarray(keys), np.diff(np.asarray(starts))), np.asarray(ranges)
+
+def _index_jsonl(path: str, file_id: int, start: int, fields: Sequence[str]) -> Tuple[Dict[str, list], int]:
+    """Entries per field for the complete lines of ``path`` from byte ``start``; returns (entries, end)."""
+    import pyarrow as pa
+    import pyarrow.json as pj
+
+    schema = pa.schema([(name, pa.string()) for name in fields])
+    parse_options = pj.ParseOptions(explicit_schema=schema, unexpected_field_behavior='ignore')
+    entries: Dict[str, list] = {name: [] for name in fields}
+    offset = start
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while True:
+            lines = f.readlines(BUILD_CHUNK_BYTES)
+            if not lines:
+                break
+            if not lines[-1].endswith(b'\n'):
+                # A line still being written is indexed by a later update
+                lines.pop()
+                if not lines:
+                    break
+            lengths = np.fromiter(map(len, lines), dtype=np.int64, count=len(lines))
+            offsets = offset + np.cumsum(lengths) - lengths
+            offset += int(lengths.sum())
+            filled = np.fromiter((bool(line.strip()) for line in lines), dtype=bool, count=len(lines))
+            if not filled.any():
+                continue
+            if not filled.all():
+                lines = [line for line, keep in zip(lines, filled) if keep]
+                lengths, offsets = lengths[filled], offsets[filled]
+            table = pj.read_json(io.BytesIO(b''.join(lines)), parse_options=parse_options,
+                                 read_options=pj.ReadOptions(block_size=max(1 << 20, int(lengths.max()) * 2)))
+            for name in fields:
+                rows, keys = _column_keys(table.column(name))
+                ranges = np.empty(len(rows), dtype=RANGE_DTYPE)
+                ranges['file'] = file_id
+                ranges['offset'] = offsets[rows]
+                ranges['length'] = lengths[rows]
+                entries[name].append(_merge_ranges(keys, ranges))
+    return entries, offset
+
+def _index_parquet(path: str, file_id: int, fields: Sequence[str]) -> Dict[str, list]:
+    """One entry per (value, row group) of ``path``."""
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    available = [name for name in fields if name in parquet_file.schema_arrow.names]
+    entries: Dict[str, list] = {name: [] for name in fields}
+    for group in range(parquet_file.num_row_groups):
+        table = parquet_file.read_row_group(group, columns=available)
+        for name in available:
+            column = table.column(name).cast('string')
+            _, keys = _column_keys(column.unique())
+            ranges = np.zeros(len(keys), dtype=RANGE_DTYPE)
+            ranges['file'] = file_id
+            ranges['offset'] = group
+            entries[name].append((keys, ranges))
+    return entries
+
+def _concat_entries(parts: List[Tuple[np.ndarray, np.ndarray]]) -> Tuple[np.ndarray, np.ndarray]:
+    if not parts:
+        return np.empty(0, dtype=np.uint64), np.empty(0, dtype=RANGE_DTYPE)
+    keys = np.concatenate([keys for keys, _ in parts])
+    ranges = np.concatenate([ranges for _, ranges in parts])
+    return _merge_ranges(keys, ranges)
+
+def _write_json_atomic(path: str, payload: Dict[str, Any]):
+    partial = f"{path}.partial"
+    with open(partial, 'w') as f:
+        json.dump(payload, f, indent=1)
+    os.replace(partial, path)
+
+def _file_format(path: str) -> Optional[str]:
+    if path.endswith(('.jsonl', '.json')):
+        return 'jsonl'
+    if path.endswith('.parquet'):
+        return 'parquet'
+    return None
+
+
+class TelemetryIndex:
+    """Memory-mapped secondary indexes on trip_id, device_id, policy_id and hashed_driver_id.
+
+    Args:
+        directory: Index directory; created on the first :meth:`update`.
+
+    Example::
+
+        index = TelemetryIndex('/data/telemetry_index')
+        index.update('/data/raw')               # only new files and appended tails
+        events = index.lookup('trip_id', trip_id)
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._load()
+
+    def _load(self):
+        path = os.path.join(self.directory, MANIFEST_FILENAME)
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                manifest = json.load(f)
+        else:
+            manifest = {'version': INDEX_VERSION, 'next_file_id': 0, 'next_segment': 1, 'files': {}, 'segments': []}
+        segments: List[Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]]] = []
+        for segment in manifest['segments']:
+            segments.append({
+                name: tuple(np.load(self._segment_path(segment, name, part), mmap_mode='r') for part in SEGMENT_PARTS)
+                for name in INDEXED_FIELDS})
+        # Swapped in together, so lookups on other threads never see a half-loaded index
+        by_id = {record['id']: (path, record) for path, record in manifest['files'].items()}
+        self._manifest, self._by_id, self._segments = manifest, by_id, segments
+
+    def _segment_path(self, segment: str, field: str, part: str) -> str:
+        return os.path.join(self.directory, f"{segment}.{field}.{part}.npy")
+
+    @property
+    def files(self) -> List[str]:
+        """Indexed files."""
+        return sorted(self._manifest['files'])
+
+    @property
+    def num_segments(self) -> int:
+        return len(self._segments)
+
+    def update(self, source: Union[str, Sequence[str]]) -> int:
+        """Index new files and the appended tail of grown JSONL files.
+
+        Files that shrank or whose start changed are re-indexed under a new
+        file id. When ``source`` is a directory, indexed files no longer in
+        it are dropped.
+
+        Args:
+            source: A file, a directory of telemetry files, or a list of files.
+
+        Returns:
+            Bytes (JSONL) plus row groups (Parquet) newly indexed.
+        """
+        if isinstance(source, str) and os.path.isdir(source):
+            paths = list_telemetry_files(source)
+            prefix = os.path.join(os.path.abspath(source), '')
+            present = {os.path.abspath(path) for path in paths}
+            gone = [path for path in self._manifest['files'] if path.startswith(prefix) and path not in present]
+        else:
+            paths = [source] if isinstance(source, str) else list(source)
+            gone = []
+
+        # Work on a copy so a failed update leaves the loaded index unchanged
+        manifest = json.loads(json.dumps(self._manifest))
+        files = manifest['files']
+        for path in gone:
+            del files[path]
+        parts: Dict[str, list] = {name: [] for name in INDEXED_FIELDS}
+        indexed = 0
+        for path in (os.path.abspath(p) for p in paths):
+            file_format = _file_format(path)
+            if file_format is None:
+                continue
+            st = os.stat(path)
+            record = files.get(path)
+            if record is not None and record['size'] == st.st_size and record['mtime_ns'] == st.st_mtime_ns:
+                continue
+            start = 0
+            if (record is not None and file_format == 'jsonl' and st.st_size >= record['indexed_bytes']
+                    and self._same_head(path, record)):
+                start = record['indexed_bytes']
+            else:
+                record = {'id': manifest['next_file_id'], 'format': file_format}
+                manifest['next_file_id'] += 1
+
+            if file_format == 'jsonl':
+                entries, end = _index_jsonl(path, record['id'], start, INDEXED_FIELDS)
+                indexed += end - start
+                record['indexed_bytes'] = end
+                record['head'] = self._head_digest(path, end)
+            else:
+                entries = _index_parquet(path, record['id'], INDEXED_FIELDS)
+                indexed += sum(len(part) for part in entries[INDEXED_FIELDS[0]])
+            record['size'], record['mtime_ns'] = st.st_size, st.st_mtime_ns
+            files[path] = record
+            for name in INDEXED_FIELDS:
+                parts[name].extend(entries[name])
+
+        if any(parts.values()):
+            segment = f"seg-{manifest['next_segment']:06d}"
+            manifest['next_segment'] += 1
+            self._write_segment(segment, {name: _concat_entries(parts[name]) for name in INDEXED_FIELDS})
+            manifest['segments'].append(segment)
+        if any(parts.values()) or gone:
+            _write_json_atomic(os.path.join(self.directory, MANIFEST_FILENAME), manifest)
+            self._load()
+        return indexed
+
+    @staticmethod
+    def _head_digest(path: str, end: int, size: int = 4096) -> str:
+        # Fingerprint of the first bytes, to tell an appended file from a rewritten one
+        with open(path, 'rb') as f:
+            return hashlib.blake2b(f.read(min(size, end)), digest_size=16).hexdigest()
+
+    def _same_head(self, path: str, record: Dict[str, Any]) -> bool:
+        return self._head_digest(path, record['indexed_bytes']) == record.get('head')
+
+    def _write_segment(self, segment: str, entries: Dict[str, Tuple[np.ndarray, np.ndarray]]):
+        os.makedirs(self.directory, exist_ok=True)
+        for name, (keys, ranges) in entries.items():
+            # One key per distinct id; its ranges are ranges[starts[i]:starts[i + 1]]
+            distinct, first = np.unique(keys, return_index=True)
+            starts = np.r_[first, len(keys)].astype(np.int64)
+            np.save(self._segment_path(segment, name, 'keys'), distinct.astype(np.uint64))
+            np.save(self._segment_path(segment, name, 'starts'), starts)
+            np.save(self._segment_path(segment, name, 'ranges'), np.ascontiguousarray(ranges, dtype=RANGE_DTYPE))
+
+    def compact(self):
+        """Merge all segments into one, dropping entries of files no longer indexed."""
+        if len(self._segments) <= 1 and not self._has_dead_entries():
+            return
+        live = np.array(sorted(self._by_id), dtype=np.uint32)
+        merged = {}
+        for name in INDEXED_FIELDS:
+            expanded = [_expand(seg[name]) for seg in self._segments]
+            keys = np.concatenate([keys for keys, _ in expanded])
+            ranges = np.concatenate([ranges for _, ranges in expanded])
+            alive = np.isin(ranges['file'], live)
+            merged[name] = _merge_ranges(keys[alive], ranges[alive])
+
+        manifest = self._manifest
+        old = list(manifest['segments'])
+        segment = f"seg-{manifest['next_segment']:06d}"
+        manifest['next_segment'] += 1
+        self._write_segment(segment, merged)
+        manifest['segments'] = [segment]
+        _write_json_atomic(os.path.join(self.directory, MANIFEST_FILENAME), manifest)
+        self._load()
+        for name in old:
+            for field in INDEXED_FIELDS:
+                for part in SEGMENT_PARTS:
+                    try:
+                        os.remove(self._segment_path(name, field, part))
+                    except FileNotFoundError:
+                        pass
+
+    def _has_dead_entries(self) -> bool:
+        live = np.array(sorted(self._by_id), dtype=np.uint32)
+        return any(not np.isin(seg[name][2]['file'], live).all() for seg in self._segments for name in INDEXED_FIELDS)
+
+    def locate(self, field: str, value: str) -> Dict[str, List[Tuple[int, int]]]:
+        """Where rows with ``field == value`` may be: file -> sorted (offset, length) byte ranges,
+        or (row_group, 0) for Parquet files."""
+        if field not in INDEXED_FIELDS:
+            raise ValueError(f"Not an indexed field: {field} (indexed: {', '.join(INDEXED_FIELDS)})")
+        key = key_hashes([value])[0]
+        found: Dict[str, List[Tuple[int, int]]] = {}
+        for segment in self._segments:
+            keys, starts, ranges = segment[field]
+            i = int(np.searchsorted(keys, key))
+            if i == len(keys) or keys[i] != key:
+                continue
+            for entry in ranges[int(starts[i]):int(starts[i + 1])]:
+                owner = self._by_id.get(int(entry['file']))
+                if owner is not None:
+                    found.setdefault(owner[0], []).append((int(entry['offset']), int(entry['length'])))
+        return {path: sorted(set(spans)) for path, spans in found.items()}
+
+    def lookup(self, field: str, value: str, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Rows with ``field == value``, reading only the indexed byte ranges / row groups.
+
+        Args:
+            field: One of INDEXED_FIELDS.
+            value: The id to look up.
+            columns: Columns to return; all telemetry fields when omitted.
+
+        Returns:
+            DataFrame with the same dtypes as ``telemetry_reader.read_telemetry``,
+            in file order.
+        """
+        names = list(columns) if columns is not None else None
+        read_names = names if names is None or field in names else names + [field]
+        chunks = []
+        files = self._manifest['files']
+        for path, spans in sorted(self.locate(field, value).items()):
+            if path not in files:
+                # Dropped by an update on another thread since it was located
+                continue
+            if files[path]['format'] == 'jsonl':
+                records = [record for record in self._read_jsonl(path, spans) if record.get(field) == value]
+                if records:
+                    chunks.append(_records_to_frame(records, read_names))
+            else:
+                chunks.extend(self._read_parquet(path, [group for group, _ in spans], read_names, field, value))
+        frame = concat_chunks(chunks)
+        if names is not None:
+            frame = frame[names]
+        return frame.reset_index(drop=True)
+
+    @staticmethod
+    def _read_jsonl(path: str, spans: List[Tuple[int, int]]) -> List[Dict[str, Any]]:
+        # Coalesce nearby ranges so a trip of interleaved lines costs few reads
+        reads = []
+        for offset, length in spans:
+            if reads and offset - (reads[-1][0] + reads[-1][1]) <= READ_GAP_BYTES:
+                reads[-1][1] = max(reads[-1][1], offset + length - reads[-1][0])
+            else:
+                reads.append([offset, length])
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            blocks = [os.pread(fd, length, offset) for offset, length in reads]
+        finally:
+            os.close(fd)
+        lines = [line for block in blocks for line in block.splitlines() if line.strip()]
+        return json.loads(b'[' + b','.join(lines) + b']') if lines else []
+
+    @staticmethod
+    def _read_parquet(path: str, groups: List[int], names: Optional[List[str]], field: str,
+                      value: str) -> List[pd.DataFrame]:
+        import pyarrow.compute as pc
+
+        names = names if names is not None else TELEMETRY_COLUMNS
+        parquet_file, available = open_parquet(path, names)
+        table = parquet_file.read_row_groups(groups, columns=available)
+        table = table.filter(pc.equal(table.column(field).cast('string'), value))
+        return [parquet_frame(table, names)] if table.num_rows else []
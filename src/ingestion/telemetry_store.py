@@ -0,0 +1,282 @@
+"""Partitioned Parquet telemetry store with predicate pushdown.
+
+Layout::
+
+    <root>/_store.json
+    <root>/event_date=2025-11-10/device_bucket=3/part-<run>.parquet
+
+Rows are partitioned by the UTC date of ``ts`` and ``crc32(device_id) %
+num_buckets``, and sorted by (device_id, ts) within each row group so the
+per-row-group min/max statistics prune device and time filters. String
+columns are dictionary encoded.
+"""
+
+import json
+import os
+import uuid
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from src.ingestion.telemetry_reader import (DEFAULT_CHUNK_SIZE, TELEMETRY_COLUMNS, TELEMETRY_DTYPES,
+                                            as_object, enum_categorical, iter_telemetry_files, list_telemetry_files)
+
+STORE_VERSION = 1
+METADATA_FILENAME = '_store.json'
+DEFAULT_NUM_BUCKETS = 16
+DEFAULT_ROW_GROUP_SIZE = 128 * 1024
+NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+# Low-cardinality columns read back as pandas categoricals
+DICTIONARY_COLUMNS = [name for name, dtype in TELEMETRY_DTYPES.items()
+                      if isinstance(dtype, pd.CategoricalDtype) or dtype == 'category']
+
+_ARROW_TYPES = {'float32': pa.float32(), 'Int32': pa.int32()}
+
+TELEMETRY_ARROW_SCHEMA = pa.schema([
+    (name, pa.timestamp('ns', tz='UTC') if name == 'ts' else _ARROW_TYPES.get(dtype, pa.string()))
+    for name, dtype in TELEMETRY_DTYPES.items()
+])
+
+PARTITIONING = ds.partitioning(pa.schema([('event_date', pa.string()), ('device_bucket', pa.int32())]),
+                               flavor='hive')
+
+def device_bucket(device_ids: Sequence[str], num_buckets: int) -> np.ndarray:
+    """Stable bucket for each device id (crc32, so it is the same in every process)."""
+    return np.array([zlib.crc32(str(d).encode('utf-8')) % num_buckets for d in device_ids], dtype=np.int32)
+
+def _chunk_buckets(device_id: pd.Series, num_buckets: int) -> np.ndarray:
+    # Hash each distinct device once
+    codes, uniques = pd.factorize(device_id)
+    buckets = device_bucket(uniques, num_buckets)
+    return np.where(codes >= 0, buckets[codes], 0)
+
+def _read_metadata(root: str) -> Dict[str, Any]:
+    path = os.path.join(root, METADATA_FILENAME)
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError as e:
+        raise FileNotFoundError(f"Not a telemetry store (no {METADATA_FILENAME}): {root}") from e
+
+class TelemetryStoreWriter:
+    """Append typed telemetry chunks to a partitioned store.
+
+    Rows are buffered per partition and written as one row group once
+    ``row_group_size`` rows have accumulated, so memory is bounded by
+    partitions x row_group_size. Each writer adds new files, so several
+    conversions can append to the same store.
+
+    Args:
+        root: Store directory.
+        num_buckets: device_id hash buckets per day; fixed when the store is created.
+        row_group_size: Rows per Parquet row group.
+        compression: Parquet compression codec.
+    """
+
+    def __init__(self, root: str, num_buckets: int = DEFAULT_NUM_BUCKETS,
+                 row_group_size: int = DEFAULT_ROW_GROUP_SIZE, compression: str = 'zstd'):
+        self.root = root
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.rows_written = 0
+        self._run_id = uuid.uuid4().hex[:12]
+        self._buffers: Dict[Tuple[str, int], List[pa.Table]] = {}
+        self._buffered_rows: Dict[Tuple[str, int], int] = {}
+        self._writers: Dict[Tuple[str, int], pq.ParquetWriter] = {}
+
+        os.makedirs(root, exist_ok=True)
+        meta_path = os.path.join(root, METADATA_FILENAME)
+        if os.path.exists(meta_path):
+            self.num_buckets = _read_metadata(root)['num_buckets']
+        else:
+            self.num_buckets = num_buckets
+            with open(meta_path, 'w') as f:
+                json.dump({'version': STORE_VERSION, 'num_buckets': num_buckets}, f)
+
+    def __enter__(self) -> 'TelemetryStoreWriter':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, chunk: pd.DataFrame):
+        """Partition one chunk (all telemetry columns) and buffer it for writing."""
+        missing = [name for name in TELEMETRY_COLUMNS if name not in chunk.columns]
+        if missing:
+            raise ValueError(f"Missing telemetry columns: {missing}")
+        if not len(chunk):
+            return
+
+        table = pa.Table.from_pandas(chunk[TELEMETRY_COLUMNS], preserve_index=False).cast(TELEMETRY_ARROW_SCHEMA)
+        ts = chunk['ts']
+        days = np.where(ts.isna().to_numpy(), -1,
+                        ts.to_numpy(dtype='datetime64[ns]').view(np.int64) // 86_400_000_000_000)
+        keys = days * self.num_buckets + _chunk_buckets(chunk['device_id'], self.num_buckets)
+
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.searchsorted(inverse[order], np.arange(len(unique_keys) + 1))
+        for i, key in enumerate(unique_keys):
+            day, bucket = divmod(int(key), self.num_buckets)
+            date = NULL_PARTITION if day < 0 else str(np.datetime64(day, 'D'))
+            part = (date, bucket)
+            self._buffers.setdefault(part, []).append(table.take(order[bounds[i]:bounds[i + 1]]))
+            self._buffered_rows[part] = self._buffered_rows.get(part, 0) + int(bounds[i + 1] - bounds[i])
+            if self._buffered_rows[part] >= self.row_group_size:
+                self._flush(part)
+
+    def _flush(self, part: Tuple[str, int]):
+        pieces = self._buffers.pop(part, None)
+        self._buffered_rows.pop(part, None)
+        if not pieces:
+            return
+        table = pa.concat_tables(pieces).sort_by([('device_id', 'ascending'), ('ts', 'ascending')])
+        writer = self._writers.get(part)
+        if writer is None:
+            directory = os.path.join(self.root, f'event_date={part[0]}', f'device_bucket={part[1]}')
+            os.makedirs(directory, exist_ok=True)
+            writer = pq.ParquetWriter(os.path.join(directory, f'part-{self._run_id}.parquet'),
+                                      TELEMETRY_ARROW_SCHEMA, compression=self.compression,
+                                      use_dictionary=True, write_statistics=True)
+            self._writers[part] = writer
+        writer.write_table(table, row_group_size=self.row_group_size)
+        self.rows_written += table.num_rows
+
+    def close(self):
+        """Flush all buffered rows and close every partition file."""
+        for part in list(self._buffers):
+            self._flush(part)
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+def convert_to_store(source: Union[str, Sequence[str]], root: str, num_buckets: int = DEFAULT_NUM_BUCKETS,
+                     chunk_size: int = DEFAULT_CHUNK_SIZE, row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+                     n_jobs: int = 1) -> int:
+    """Convert raw JSONL/Avro telemetry into a partitioned store.
+
+    Args:
+        source: A file, a directory of files, or a list of files.
+        root: Store directory; created if needed, appended to if it exists.
+        num_buckets: device_id hash buckets per day for a new store.
+        chunk_size: Rows decoded at a time.
+        row_group_size: Rows per Parquet row group.
+        n_jobs: Processes decoding input files.
+
+    Returns:
+        Number of rows written.
+    """
+    if isinstance(source, str):
+        paths = list_telemetry_files(source) if os.path.isdir(source) else [source]
+    else:
+        paths = list(source)
+
+    with TelemetryStoreWriter(root, num_buckets, row_group_size) as writer:
+        for chunk in iter_telemetry_files(paths, chunk_size=chunk_size, n_jobs=n_jobs):
+            writer.write(chunk)
+    return writer.rows_written
+
+def _to_utc(value) -> pd.Timestamp:
+    ts = pd.Timestamp(value)
+    return ts.tz_localize('UTC') if ts.tzinfo is None else ts.tz_convert('UTC')
+
+def _as_list(values: Union[str, Sequence[str]]) -> List[str]:
+    return [values] if isinstance(values, str) else list(values)
+
+def build_filter(start=None, end=None, device_ids=None, trip_ids=None, policy_ids=None,
+                 num_buckets: int = DEFAULT_NUM_BUCKETS) -> Optional[ds.Expression]:
+    """Dataset filter for the given predicates, including partition pruning.
+
+    ``start`` is inclusive and ``end`` exclusive; naive times are taken as UTC.
+    """
+    conditions = []
+    if start is not None:
+        start = _to_utc(start)
+        conditions.append(ds.field('event_date') >= start.strftime('%Y-%m-%d'))
+        conditions.append(ds.field('ts') >= pa.scalar(start.value, type=pa.timestamp('ns', tz='UTC')))
+    if end is not None:
+        end = _to_utc(end)
+        conditions.append(ds.field('event_date') <= end.strftime('%Y-%m-%d'))
+        conditions.append(ds.field('ts') < pa.scalar(end.value, type=pa.timestamp('ns', tz='UTC')))
+    if device_ids is not None:
+        device_ids = _as_list(device_ids)
+        buckets = sorted(set(device_bucket(device_ids, num_buckets).tolist()))
+        conditions.append(ds.field('device_bucket').isin(buckets))
+        conditions.append(ds.field('device_id').isin(device_ids))
+    if trip_ids is not None:
+        conditions.append(ds.field('trip_id').isin(_as_list(trip_ids)))
+    if policy_ids is not None:
+        conditions.append(ds.field('policy_id').isin(_as_list(policy_ids)))
+
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+def open_store(root: str) -> ds.Dataset:
+    """Open a store as a pyarrow dataset with hive partitioning."""
+    _read_metadata(root)
+    file_format = ds.ParquetFileFormat(dictionary_columns=DICTIONARY_COLUMNS)
+    return ds.dataset(root, format=file_format, partitioning=PARTITIONING)
+
+def _to_frame(table: pa.Table) -> pd.DataFrame:
+    df = table.to_pandas(types_mapper={pa.int32(): pd.Int32Dtype()}.get)
+    for name in df.columns:
+        dtype = TELEMETRY_DTYPES.get(name)
+        # Fixed enums keep their full category list (and any unknown values); strings stay object
+        if isinstance(dtype, pd.CategoricalDtype):
+            df[name] = enum_categorical(df[name], dtype)
+        elif dtype == 'object':
+            df[name] = as_object(df[name])
+    return df
+
+def _scan_args(root: str, columns, start, end, device_ids, trip_ids, policy_ids):
+    dataset = open_store(root)
+    num_buckets = _read_metadata(root)['num_buckets']
+    expression = build_filter(start, end, device_ids, trip_ids, policy_ids, num_buckets)
+    names = list(columns) if columns is not None else TELEMETRY_COLUMNS
+    return dataset, names, expression
+
+def read_telemetry_store(root: str, columns: Optional[Sequence[str]] = None, start=None, end=None,
+                         device_ids=None, trip_ids=None, policy_ids=None) -> pd.DataFrame:
+    """Read telemetry from a store, reading only matching partitions and row groups.
+
+    Args:
+        root: Store directory.
+        columns: Columns to return; all telemetry fields when omitted. Filter
+                 columns do not need to be projected.
+        start, end: ``ts`` range, start inclusive, end exclusive.
+        device_ids, trip_ids, policy_ids: Keep only rows matching one of the ids.
+
+    Returns:
+        DataFrame with the same dtypes as ``telemetry_reader.read_telemetry``.
+    """
+    dataset, names, expression = _scan_args(root, columns, start, end, device_ids, trip_ids, policy_ids)
+    return _to_frame(dataset.to_table(columns=names, filter=expression))
+
+def iter_telemetry_store(root: str, columns: Optional[Sequence[str]] = None, start=None, end=None,
+                         device_ids=None, trip_ids=None, policy_ids=None,
+                         batch_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """Like :func:`read_telemetry_store`, but yields DataFrames of up to ``batch_size`` rows."""
+    dataset, names, expression = _scan_args(root, columns, start, end, device_ids, trip_ids, policy_ids)
+    for batch in dataset.to_batches(columns=names, filter=expression, batch_size=batch_size):
+        if batch.num_rows:
+            yield _to_frame(pa.Table.from_batches([batch]))
+
+# Example usage
+if __name__ == "__main__":
+    import tempfile
+    from src.streaming.telemetry_transform import TRIP_INPUT_COLUMNS, compute_trip_features_vectorized
+
+    root = os.path.join(tempfile.mkdtemp(), 'telemetry')
+    rows = convert_to_store('data/samples/poc_telemetry.jsonl', root)
+    print(f"Wrote {rows} rows to {root}")
+
+    events = read_telemetry_store(root, columns=TRIP_INPUT_COLUMNS, start='2025-11-10T02:00:00Z')
+    print(compute_trip_features_vectorized(events).head())
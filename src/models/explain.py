@@ -1,44 +1,117 @@
-"""Model explanation utilities using SHAP."""
+"""Model explanation utilities using SHAP.
+
+shap (and numba/llvmlite behind it) takes about a second to import, so it is
+imported on the first explainer rather than with this module.
+"""
 
-import shap
 import pandas as pd
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Dict, Any
+from src.utils.instrumentation import instrumented
+
+def create_explainer(model):
+    """Create a SHAP explainer for a tree model."""
+    import shap
+
+    return shap.TreeExplainer(model)
+
+def _shap_matrix(explainer, features: pd.DataFrame) -> np.ndarray:
+    """SHAP values as an (n_rows, n_features) array."""
+    values = np.asarray(explainer.shap_values(features))
+    return values.reshape(len(features), -1)
+
+def _top_k(shap_values: np.ndarray, k: int):
+    """Indices and values of the k largest |contributions| per row, ordered descending."""
+    magnitude = np.abs(shap_values)
+    if k < shap_values.shape[1]:
+        candidates = np.argpartition(-magnitude, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(shap_values.shape[1]), shap_values.shape)
+    # Order only the k survivors, row-wise
+    order = np.argsort(-np.take_along_axis(magnitude, candidates, axis=1), axis=1, kind='stable')
+    indices = np.take_along_axis(candidates, order, axis=1)
+    return indices.astype(np.int32), np.take_along_axis(shap_values, indices, axis=1)
+
+_worker_explainer = None
+
+def _init_worker(model):
+    global _worker_explainer
+    _worker_explainer = create_explainer(model)
+
+def _explain_chunk(args):
+    features, k = args
+    return _top_k(_shap_matrix(_worker_explainer, features), k)
+
+@instrumented('models.shap_batch', rows_from='features')
+def get_top_features_shap_batch(model, features: pd.DataFrame, top_n: int = 3, explainer=None,
+                                chunk_size: int = 10_000, n_jobs: int = 1) -> Dict[str, Any]:
+    """Get the top N SHAP contributions for every row of a feature matrix.
+
+    Args:
+        model: Trained tree model
+        features: Feature DataFrame, one row per prediction
+        top_n: Number of top features to return per row
+        explainer: Prebuilt explainer for ``model``; created on the fly when omitted
+        chunk_size: Rows explained per SHAP call
+        n_jobs: Worker processes, each holding its own explainer; chunks are
+            spread across them when the batch spans more than one chunk
+
+    Returns:
+        Columnar dict with 'feature_names' (list), 'indices' (int32 array of
+        shape (n_rows, k) into feature_names, ordered by |contribution|) and
+        'contributions' (float array of the same shape).
+    """
+    feature_names = list(features.columns)
+    k = max(0, min(top_n, len(feature_names)))
+    n_rows = len(features)
+    indices = np.empty((n_rows, k), dtype=np.int32)
+    contributions = np.empty((n_rows, k), dtype=np.float64)
+    bounds = [(start, min(start + chunk_size, n_rows)) for start in range(0, n_rows, chunk_size)]
+
+    if k and bounds:
+        if n_jobs > 1 and len(bounds) > 1:
+            with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(model,)) as pool:
+                chunks = pool.map(_explain_chunk, ((features.iloc[start:end], k) for start, end in bounds))
+                for (start, end), (idx, values) in zip(bounds, chunks):
+                    indices[start:end] = idx
+                    contributions[start:end] = values
+        else:
+            if explainer is None:
+                explainer = create_explainer(model)
+            for start, end in bounds:
+                idx, values = _top_k(_shap_matrix(explainer, features.iloc[start:end]), k)
+                indices[start:end] = idx
+                contributions[start:end] = values
 
-def get_top_features_shap(model, features: pd.DataFrame, top_n: int = 3) -> List[Dict[str, Any]]:
+    return {
+        'feature_names': feature_names,
+        'indices': indices,
+        'contributions': contributions
+    }
+
+@instrumented('models.shap')
+def get_top_features_shap(model, features: pd.DataFrame, top_n: int = 3, explainer=None) -> List[Dict[str, Any]]:
     """Get top N features contributing to prediction using SHAP.
 
     Args:
         model: Trained model with predict method
         features: Feature DataFrame for a single prediction
         top_n: Number of top features to return
+        explainer: Prebuilt explainer for ``model`` (e.g. from the model
+            registry); created on the fly when omitted
 
     Returns:
         List of dicts with feature name and contribution
     """
-    # Create SHAP explainer
-    explainer = shap.TreeExplainer(model)
-
-    # Get SHAP values for the instance
-    shap_values = explainer.shap_values(features)
-
-    # For single prediction, shap_values might be 1D
-    if len(features) == 1:
-        shap_values = shap_values.reshape(1, -1)
-
-    # Get feature importances for this prediction
-    instance_shap = shap_values[0]  # First (only) instance
-    feature_names = features.columns
-
-    # Sort by absolute contribution
-    contributions = list(zip(feature_names, instance_shap))
-    contributions.sort(key=lambda x: abs(x[1]), reverse=True)
+    # Only the first (only) instance is explained
+    result = get_top_features_shap_batch(model, features.iloc[:1], top_n=top_n, explainer=explainer)
+    feature_names = result['feature_names']
 
-    # Return top N
     top_features = []
-    for name, contrib in contributions[:top_n]:
+    for idx, contrib in zip(result['indices'][0].tolist(), result['contributions'][0].tolist()):
         top_features.append({
-            'feature': name,
+            'feature': feature_names[idx],
             'contribution': float(contrib)
         })
 
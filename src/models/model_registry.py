@@ -0,0 +1,166 @@
+"""Process-wide cache of loaded models and their SHAP explainers."""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import joblib
+
+from src.models.explain import create_explainer
+
+MODEL_CARD_FILENAME = 'model_card.json'
+
+def read_model_version(model_path: str) -> str:
+    """Read the model version from the ``model_card.json`` next to the artifact.
+
+    Falls back to the artifact's directory name (e.g. ``v20251109_1``) when the
+    card is missing or has no version.
+    """
+    model_dir = os.path.dirname(os.path.abspath(model_path))
+    card_path = os.path.join(model_dir, MODEL_CARD_FILENAME)
+    try:
+        with open(card_path, 'r') as f:
+            card = json.load(f)
+        version = card.get('model_details', {}).get('version')
+        if version:
+            return version
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+    return os.path.basename(model_dir)
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class ModelEntry:
+    """A loaded model artifact with a lazily built SHAP explainer."""
+
+    def __init__(self, path: str, key: Tuple, model: Any, version: str):
+        self.path = path
+        self.key = key
+        self.model = model
+        self.version = version
+        self._explainer = None
+        self._lock = threading.Lock()
+        self.explainer_build_s = 0.0
+
+    @property
+    def explainer(self):
+        """SHAP TreeExplainer for this model, built on first use."""
+        if self._explainer is None:
+            with self._lock:
+                if self._explainer is None:
+                    start = time.perf_counter()
+                    self._explainer = create_explainer(self.model)
+                    self.explainer_build_s = time.perf_counter() - start
+        return self._explainer
+
+class ModelRegistry:
+    """LRU cache of model artifacts keyed by path and file identity.
+
+    An entry's key is (absolute path, mtime, size) plus, with ``verify_hash``,
+    the SHA-256 of the file, so replacing an artifact on disk is picked up on
+    the next lookup without a restart.
+
+    Args:
+        max_entries: Number of model versions kept in memory.
+        verify_hash: Also hash file contents when building keys. Catches
+            replacements that keep mtime and size, at the cost of reading the
+            file on every lookup.
+    """
+
+    def __init__(self, max_entries: int = 4, verify_hash: bool = False):
+        if max_entries < 1:
+            raise ValueError("max_entries must be >= 1")
+        self.max_entries = max_entries
+        self.verify_hash = verify_hash
+        self._entries: 'OrderedDict[str, ModelEntry]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'load_time_s': 0.0}
+
+    def _key(self, path: str) -> Tuple:
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        if self.verify_hash:
+            key += (_file_digest(path),)
+        return key
+
+    def _lookup(self, path: str, key: Tuple) -> Optional[ModelEntry]:
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.key == key:
+                self._entries.move_to_end(path)
+                self._counters['hits'] += 1
+                return entry
+        return None
+
+    def get(self, model_path: str) -> ModelEntry:
+        """Return the cached entry for ``model_path``, loading it on a miss."""
+        path = os.path.abspath(model_path)
+        key = self._key(path)
+        entry = self._lookup(path, key)
+        if entry is not None:
+            return entry
+
+        # One loader per path, so concurrent misses deserialize the artifact once
+        with self._lock:
+            load_lock = self._load_locks.setdefault(path, threading.Lock())
+        with load_lock:
+            entry = self._lookup(path, key)
+            if entry is not None:
+                return entry
+
+            start = time.perf_counter()
+            entry = ModelEntry(path, key, joblib.load(path), read_model_version(path))
+            elapsed = time.perf_counter() - start
+
+            with self._lock:
+                self._counters['misses'] += 1
+                self._counters['load_time_s'] += elapsed
+                self._entries[path] = entry
+                self._entries.move_to_end(path)
+                while len(self._entries) > self.max_entries:
+                    evicted, _ = self._entries.popitem(last=False)
+                    self._load_locks.pop(evicted, None)
+                    self._counters['evictions'] += 1
+        return entry
+
+    def get_model(self, model_path: str) -> Any:
+        return self.get(model_path).model
+
+    def get_explainer(self, model_path: str):
+        return self.get(model_path).explainer
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters, total load time and cached versions."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._entries)
+            stats['versions'] = [entry.version for entry in self._entries.values()]
+            stats['explainer_build_s'] = sum(entry.explainer_build_s for entry in self._entries.values())
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._load_locks.clear()
+
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+def get_registry() -> ModelRegistry:
+    """Get the process-wide model registry."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry()
+    return _registry
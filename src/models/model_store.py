@@ -0,0 +1,228 @@
+"""Versioned model store with hot swapping."""
+
+import logging
+import os
+import re
+import signal
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+import joblib
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_ROOT = Path(__file__).resolve().parents[2] / 'models' / 'riskscore'
+MODEL_FILENAME = 'model.pkl'
+ACTIVE_FILENAME = 'ACTIVE'
+# How a serving process picks up new versions: poll the directory, on SIGHUP, or not at all
+RELOAD_MODES = ('poll', 'signal', 'off')
+
+class ModelNotFoundError(FileNotFoundError):
+    """Raised when a requested model version or artifact does not exist."""
+
+def _natural_key(name: str) -> List[Any]:
+    # v20251109_10 sorts after v20251109_2
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', name)]
+
+class ModelVersion:
+    """An immutable, loaded model version.
+
+    Requests hold a reference to the ``ModelVersion`` they started with, so a
+    swap never changes the model under an in-flight request.
+    """
+
+    def __init__(self, algo: str, version: str, path: str, model: Any, key: Tuple):
+        self.algo = algo
+        self.version = version
+        self.path = path
+        self.model = model
+        self.key = key
+        self.loaded_at = time.time()
+
+    def __repr__(self) -> str:
+        return f"ModelVersion({self.algo}/{self.version})"
+
+class ModelStore:
+    """Discovers and serves model versions under ``<root>/<algo>/<version>/model.pkl``.
+
+    The active version is the one named in ``<root>/<algo>/ACTIVE`` if that file
+    exists, otherwise the newest version directory. Unpickled models are
+    private to each process (sklearn copies its tree node arrays on load);
+    pages are shared between workers by the 'compiled' scoring backend, which
+    memory-maps flat node arrays saved next to the artifact (see
+    ``compiled_ensemble``).
+
+    :meth:`refresh` rescans the directory and atomically swaps the active
+    version when it (or its artifact) changed; call it from :meth:`watch`, a
+    signal handler (:meth:`install_signal_handler`) or a deploy hook.
+
+    Args:
+        root: Directory holding one subdirectory per algorithm.
+        algo: Algorithm subdirectory, e.g. 'gbm'.
+        mmap_mode: joblib mmap mode for plain NumPy arrays in the pickle;
+                   None (the default) loads fully into memory.
+        max_pinned: Non-active versions kept loaded for pinned requests.
+    """
+
+    def __init__(self, root: str = str(DEFAULT_MODEL_ROOT), algo: str = 'gbm', mmap_mode: Optional[str] = None,
+                 max_pinned: int = 2):
+        self.root = Path(root)
+        self.algo = algo
+        self.mmap_mode = mmap_mode
+        self.max_pinned = max_pinned
+        self._active: Optional[ModelVersion] = None
+        self._pinned: 'OrderedDict[str, ModelVersion]' = OrderedDict()
+        self._lock = threading.RLock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def algo_dir(self) -> Path:
+        return self.root / self.algo
+
+    def list_versions(self) -> List[str]:
+        """Versions with a model artifact, oldest first."""
+        if not self.algo_dir.is_dir():
+            return []
+        versions = [d.name for d in self.algo_dir.iterdir() if (d / MODEL_FILENAME).is_file()]
+        return sorted(versions, key=_natural_key)
+
+    def artifact_path(self, version: str) -> str:
+        """Path to a version's artifact; raises ModelNotFoundError if missing."""
+        path = self.algo_dir / version / MODEL_FILENAME
+        if not path.is_file():
+            raise ModelNotFoundError(f"No model artifact for {self.algo}/{version} at {path}")
+        return str(path)
+
+    def resolve_active_version(self) -> str:
+        """Version that should be active according to the files on disk."""
+        pointer = self.algo_dir / ACTIVE_FILENAME
+        if pointer.is_file():
+            version = pointer.read_text().strip()
+            if version:
+                return version
+        versions = self.list_versions()
+        if not versions:
+            raise ModelNotFoundError(f"No model versions under {self.algo_dir}")
+        return versions[-1]
+
+    def _load(self, version: str) -> ModelVersion:
+        path = self.artifact_path(version)
+        stat = os.stat(path)
+        model = joblib.load(path, mmap_mode=self.mmap_mode)
+        return ModelVersion(self.algo, version, path, model, (version, stat.st_mtime_ns, stat.st_size))
+
+    @property
+    def active(self) -> ModelVersion:
+        """The active version, loaded on first access."""
+        active = self._active
+        if active is None:
+            with self._lock:
+                if self._active is None:
+                    self._active = self._load(self.resolve_active_version())
+                active = self._active
+        return active
+
+    def get(self, version: Optional[str] = None) -> ModelVersion:
+        """Get the active version, or pin a specific one for this request."""
+        active = self.active
+        if version is None or version == active.version:
+            return active
+        with self._lock:
+            pinned = self._pinned.get(version)
+            if pinned is None:
+                pinned = self._load(version)
+                self._pinned[version] = pinned
+                while len(self._pinned) > self.max_pinned:
+                    self._pinned.popitem(last=False)
+            else:
+                self._pinned.move_to_end(version)
+            return pinned
+
+    def activate(self, version: str) -> ModelVersion:
+        """Load ``version`` and make it active. The swap is a single reference write."""
+        loaded = self._load(version)
+        with self._lock:
+            self._active = loaded
+            self._pinned.pop(version, None)
+        return loaded
+
+    def refresh(self) -> bool:
+        """Rescan the store and swap if the active version or its artifact changed.
+
+        Returns:
+            True if a new version was activated.
+        """
+        version = self.resolve_active_version()
+        stat = os.stat(self.artifact_path(version))
+        current = self._active
+        if current is not None and current.key == (version, stat.st_mtime_ns, stat.st_size):
+            return False
+        self.activate(version)
+        return True
+
+    def watch(self, interval_s: float = 5.0):
+        """Poll for new versions in a daemon thread."""
+        if self._watcher is not None:
+            return
+
+        def _poll():
+            while not self._stop.wait(interval_s):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    # Keep serving the current version; a half-written artifact
+                    # is retried on the next poll
+                    logger.warning("Model refresh failed: %s", e)
+
+        self._watcher = threading.Thread(target=_poll, name='model-store-watch', daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        """Stop the :meth:`watch` thread; it can be started again afterwards."""
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+        self._stop.clear()
+
+    def start_reloading(self, mode: str = 'poll', interval_s: float = 5.0):
+        """Pick up new versions without a restart, by ``mode`` (one of RELOAD_MODES)."""
+        if mode not in RELOAD_MODES:
+            raise ValueError(f"Unknown reload mode: {mode}")
+        if mode == 'poll':
+            self.watch(interval_s)
+        elif mode == 'signal':
+            self.install_signal_handler()
+
+    def install_signal_handler(self, signum: int = signal.SIGHUP):
+        """Refresh the store when the process receives ``signum``.
+
+        The reload runs on a helper thread so the handler returns immediately
+        and requests keep being served while the new artifact loads.
+        """
+        def _handler(*_):
+            threading.Thread(target=self.refresh, name='model-store-reload', daemon=True).start()
+
+        signal.signal(signum, _handler)
+
+_store: Optional[ModelStore] = None
+_store_lock = threading.Lock()
+
+def get_model_store() -> ModelStore:
+    """Get the process-wide store for the default model root."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ModelStore()
+    return _store
+
+# Example usage
+if __name__ == "__main__":
+    store = get_model_store()
+    print(f"Versions: {store.list_versions()}")
+    print(f"Active: {store.active} from {store.active.path}")
@@ -1,8 +1,11 @@
 """Pricing engine for premium adjustments."""
 
 from src.models.explain import get_top_features_shap
-import joblib
+from src.models.model_registry import get_registry
+from src.models.model_store import get_model_store
+from src.utils.instrumentation import instrumented
 import pandas as pd
+from typing import Optional
 
 def map_score_to_premium(base_premium: float, risk_score: float, alpha: float = 0.02) -> float:
     """Map a risk score (0-100) to a new premium.
@@ -19,11 +22,12 @@ def map_score_to_premium(base_premium: float, risk_score: float, alpha: float =
     delta = (risk_score - 50) / 50.0
     return base_premium * (1 + alpha * delta)
 
-def get_pricing_explanation(model_path: str, features_df: pd.DataFrame, risk_score: float, top_n: int = 3) -> dict:
+@instrumented('models.pricing_explanation')
+def get_pricing_explanation(model_path: Optional[str], features_df: pd.DataFrame, risk_score: float, top_n: int = 3) -> dict:
     """Get pricing explanation with top contributing features.
 
     Args:
-        model_path: Path to trained model
+        model_path: Path to trained model; None uses the model store's active version
         features_df: DataFrame with features for this prediction
         risk_score: The predicted risk score
         top_n: Number of top features to include
@@ -31,13 +35,17 @@ def get_pricing_explanation(model_path: str, features_df: pd.DataFrame, risk_sco
     Returns:
         Dict with explanation data
     """
-    model = joblib.load(model_path)
-    top_features = get_top_features_shap(model, features_df, top_n=top_n)
+    if model_path is None:
+        model_path = get_model_store().active.path
+
+    # Model and explainer are loaded once per artifact and reused across requests
+    entry = get_registry().get(model_path)
+    top_features = get_top_features_shap(entry.model, features_df, top_n=top_n, explainer=entry.explainer)
 
     return {
         'risk_score': risk_score,
         'top_features': top_features,
-        'model_version': 'v20251109_1'
+        'model_version': entry.version
     }
 
 # Example usage
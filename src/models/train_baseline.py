@@ -1,15 +1,21 @@
 """Baseline model training for risk scoring."""
 
 import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import GradientBoostingRegressor
-from sklearn.metrics import mean_squared_error
 import joblib
 import os
 import argparse
+import logging
 import numpy as np
+from typing import TYPE_CHECKING
+from src.utils.instrumentation import instrumented
 
-def train_risk_model(features: pd.DataFrame, labels: pd.Series, seed: int = 42) -> GradientBoostingRegressor:
+if TYPE_CHECKING:
+    from sklearn.ensemble import GradientBoostingRegressor
+
+logger = logging.getLogger(__name__)
+
+@instrumented('models.train', rows_from='features')
+def train_risk_model(features: pd.DataFrame, labels: pd.Series, seed: int = 42) -> 'GradientBoostingRegressor':
     """Train a baseline GBM model for risk scoring.
 
     Args:
@@ -20,6 +26,12 @@ def train_risk_model(features: pd.DataFrame, labels: pd.Series, seed: int = 42)
     Returns:
         Trained model.
     """
+    # sklearn's training modules are imported here so that importing this
+    # module (e.g. for load_trip_features) stays cheap
+    from sklearn.ensemble import GradientBoostingRegressor
+    from sklearn.metrics import mean_squared_error
+    from sklearn.model_selection import train_test_split
+
     # Set seeds for reproducibility
     np.random.seed(seed)
 
@@ -30,12 +42,33 @@ def train_risk_model(features: pd.DataFrame, labels: pd.Series, seed: int = 42)
 
     y_pred = model.predict(X_test)
     mse = mean_squared_error(y_test, y_pred)
-    print(f"Test MSE: {mse}")
+    logger.info("Test MSE: %s", mse)
 
     return model
 
+def load_trip_features(store_root: str, start=None, end=None, policy_ids=None) -> pd.DataFrame:
+    """Build per-trip model features straight from a partitioned telemetry store.
+
+    The features come from the compiled feature manifest plan, in model
+    column order. Only the columns the plan needs are read, and ``start``/``end``/
+    ``policy_ids`` are pushed down to the store, so a training window does not
+    parse the rest of the data.
+
+    Returns:
+        DataFrame indexed by trip_id with policy_id and the model feature columns.
+    """
+    from src.features.feature_compiler import compile_manifest
+    from src.features.feature_definitions import get_model_feature_order
+    from src.ingestion.telemetry_store import read_telemetry_store
+
+    plan = compile_manifest().select(get_model_feature_order())
+    events = read_telemetry_store(store_root, start=start, end=end, policy_ids=policy_ids,
+                                  columns=plan.input_columns + ['policy_id'])
+    return plan.compute(events, first_columns=['policy_id']).set_index('trip_id')
+
 # Example usage
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     parser = argparse.ArgumentParser()
     parser.add_argument('--seed', type=int, default=2025, help='Random seed')
     args = parser.parse_args()
@@ -50,6 +83,8 @@ if __name__ == "__main__":
 
     model = train_risk_model(features, labels, seed=args.seed)
 
-    # Save model
+    # Save model, with the drift baseline the model server compares live features against
+    from src.dq.drift import baseline_path, build_baseline
     os.makedirs('models/riskscore/gbm/v20251109_1', exist_ok=True)
     joblib.dump(model, 'models/riskscore/gbm/v20251109_1/model.pkl')
+    build_baseline(features, list(features.columns)).save(baseline_path('models/riskscore/gbm/v20251109_1/model.pkl'))
@@ -0,0 +1,385 @@
+"""Scalable risk model training: histogram GBMs on memory-mapped float32 data.
+
+Training features live on disk as raw float32 row-major matrices (``X.f32``,
+``y.f32`` and ``meta.json``), written chunk by chunk by
+:class:`TrainingDataWriter` and opened read-only with ``np.memmap``, so the
+book never has to fit in a DataFrame. Models are
+``HistGradientBoostingRegressor`` ('hist') or LightGBM ('lightgbm'), both
+multithreaded.
+
+The hyperparameter search runs candidates in a process pool. Before it
+starts, the training and hold-out rows are written once to a scratch
+directory as separate matrices, in the dtype the model fits on without
+converting (float64 for HistGradientBoostingRegressor, float32 for
+LightGBM). Every worker maps those files read-only, so the OS page cache
+holds the only copy of the data and each worker keeps just its own binned
+dataset; hold-out rows take no part in binning or leaf statistics. Results
+are deterministic for a given ``--seed``: candidate sampling, the hold-out
+split and each model's random state all derive from it.
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.utils.instrumentation import instrumented
+
+logger = logging.getLogger(__name__)
+
+MODEL_KINDS = ('hist', 'lightgbm')
+DEFAULT_CHUNK_ROWS = 1_000_000
+DEFAULT_VALID_FRACTION = 0.2
+META_FILENAME = 'meta.json'
+# Dtype each model kind fits on without copying its input
+FIT_DTYPES = {'hist': np.float64, 'lightgbm': np.float32}
+
+# Defaults and search space per model kind; candidates are sampled from the space
+DEFAULT_PARAMS = {
+    'hist': {'max_iter': 200, 'learning_rate': 0.1, 'max_leaf_nodes': 31, 'min_samples_leaf': 20,
+             'l2_regularization': 0.0},
+    'lightgbm': {'n_estimators': 200, 'learning_rate': 0.1, 'num_leaves': 31, 'min_child_samples': 20,
+                 'reg_lambda': 0.0},
+}
+SEARCH_SPACE = {
+    'hist': {'max_iter': [100, 200, 400], 'learning_rate': [0.03, 0.05, 0.1, 0.2],
+             'max_leaf_nodes': [15, 31, 63], 'min_samples_leaf': [20, 50, 100],
+             'l2_regularization': [0.0, 0.1, 1.0]},
+    'lightgbm': {'n_estimators': [100, 200, 400], 'learning_rate': [0.03, 0.05, 0.1, 0.2],
+                 'num_leaves': [15, 31, 63], 'min_child_samples': [20, 50, 100],
+                 'reg_lambda': [0.0, 0.1, 1.0]},
+}
+
+
+class TrainingDataWriter:
+    """Append feature/label chunks to a training data directory.
+
+    Args:
+        directory: Output directory (created if needed; existing data is replaced).
+        feature_names: Column order of the feature matrix.
+    """
+
+    def __init__(self, directory: str, feature_names: Sequence[str]):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.feature_names = list(feature_names)
+        self.rows = 0
+        self._x = open(os.path.join(directory, 'X.f32'), 'wb')
+        self._y = open(os.path.join(directory, 'y.f32'), 'wb')
+
+    def write(self, features: pd.DataFrame, labels: Sequence[float]):
+        matrix = np.ascontiguousarray(features[self.feature_names].to_numpy(dtype=np.float32))
+        target = np.ascontiguousarray(np.asarray(labels, dtype=np.float32))
+        if len(target) != len(matrix):
+            raise ValueError(f"{len(matrix)} feature rows but {len(target)} labels")
+        matrix.tofile(self._x)
+        target.tofile(self._y)
+        self.rows += len(matrix)
+
+    def close(self):
+        self._x.close()
+        self._y.close()
+        with open(os.path.join(self.directory, META_FILENAME), 'w') as f:
+            json.dump({'rows': self.rows, 'feature_names': self.feature_names, 'dtype': 'float32'}, f)
+
+    def __enter__(self) -> 'TrainingDataWriter':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_training_data(directory: str) -> Tuple[np.memmap, np.memmap, List[str]]:
+    """Open a training data directory read-only as (X, y, feature_names) memmaps."""
+    with open(os.path.join(directory, META_FILENAME), 'r') as f:
+        meta = json.load(f)
+    rows, names = meta['rows'], meta['feature_names']
+    X = np.memmap(os.path.join(directory, 'X.f32'), dtype=np.float32, mode='r', shape=(rows, len(names)))
+    y = np.memmap(os.path.join(directory, 'y.f32'), dtype=np.float32, mode='r', shape=(rows,))
+    return X, y, names
+
+def write_synthetic_training_data(directory: str, rows: int, seed: int,
+                                  chunk_rows: int = DEFAULT_CHUNK_ROWS) -> List[str]:
+    """Write a deterministic synthetic book of trip features and claim-probability labels."""
+    from src.features.feature_definitions import get_model_feature_order
+
+    names = get_model_feature_order()
+    rng = np.random.default_rng(seed)
+    with TrainingDataWriter(directory, names) as writer:
+        for start in range(0, rows, chunk_rows):
+            n = min(chunk_rows, rows - start)
+            features = pd.DataFrame({
+                'f_trip_max_speed': rng.gamma(9.0, 10.0, n),
+                'f_trip_avg_accel': rng.gamma(2.0, 0.4, n),
+                'f_trip_harsh_brake_count': rng.poisson(0.8, n).astype(np.float64),
+            })
+            logit = (-3.0 + 0.02 * (features['f_trip_max_speed'] - 90) + 0.8 * features['f_trip_avg_accel']
+                     + 0.5 * features['f_trip_harsh_brake_count'] + rng.normal(0, 0.5, n))
+            writer.write(features, 1 / (1 + np.exp(-logit)))
+    return names
+
+def iter_row_chunks(n_rows: int, chunk_rows: int) -> Iterator[slice]:
+    for start in range(0, n_rows, chunk_rows):
+        yield slice(start, min(start + chunk_rows, n_rows))
+
+def holdout_mask(n_rows: int, valid_fraction: float, seed: int) -> np.ndarray:
+    """Deterministic boolean mask of hold-out rows."""
+    return np.random.default_rng(seed).random(n_rows) < valid_fraction
+
+SPLIT_PARTS = ('train', 'valid')
+
+def write_search_split(X: np.ndarray, y: np.ndarray, mask: np.ndarray, directory: str, dtype,
+                       chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Dict[str, int]:
+    """Write the training (``~mask``) and hold-out (``mask``) rows as separate raw matrices.
+
+    Returns:
+        Rows per part ('train', 'valid'), for :func:`load_search_split`.
+    """
+    files = {part: (open(os.path.join(directory, f'{part}_X.bin'), 'wb'),
+                    open(os.path.join(directory, f'{part}_y.bin'), 'wb')) for part in SPLIT_PARTS}
+    try:
+        for rows in iter_row_chunks(len(y), chunk_rows):
+            valid = mask[rows]
+            for part, keep in zip(SPLIT_PARTS, (~valid, valid)):
+                x_file, y_file = files[part]
+                np.ascontiguousarray(X[rows][keep], dtype=dtype).tofile(x_file)
+                np.ascontiguousarray(y[rows][keep], dtype=dtype).tofile(y_file)
+    finally:
+        for x_file, y_file in files.values():
+            x_file.close()
+            y_file.close()
+    n_valid = int(mask.sum())
+    return {'train': len(mask) - n_valid, 'valid': n_valid}
+
+def load_search_split(directory: str, rows: Dict[str, int], n_features: int,
+                      dtype) -> Dict[str, Tuple[np.memmap, np.memmap]]:
+    """Map the parts written by :func:`write_search_split` read-only as {part: (X, y)}."""
+    split = {}
+    for part in SPLIT_PARTS:
+        # An empty part cannot be mapped
+        n = rows[part]
+        if n:
+            split[part] = (np.memmap(os.path.join(directory, f'{part}_X.bin'), dtype=dtype, mode='r',
+                                     shape=(n, n_features)),
+                           np.memmap(os.path.join(directory, f'{part}_y.bin'), dtype=dtype, mode='r', shape=(n,)))
+        else:
+            split[part] = (np.empty((0, n_features), dtype=dtype), np.empty(0, dtype=dtype))
+    return split
+
+def make_model(kind: str, params: Dict[str, Any], seed: int, n_threads: int):
+    if kind == 'hist':
+        from sklearn.ensemble import HistGradientBoostingRegressor
+        # Early stopping would draw its own validation split; the hold-out is fixed instead
+        return HistGradientBoostingRegressor(random_state=seed, early_stopping=False, **params)
+    if kind == 'lightgbm':
+        import lightgbm
+        return lightgbm.LGBMRegressor(random_state=seed, n_jobs=n_threads, deterministic=True,
+                                      force_row_wise=True, verbose=-1, **params)
+    raise ValueError(f"Unknown model kind: {kind}")
+
+def fit_model(kind: str, params: Dict[str, Any], X: np.ndarray, y: np.ndarray, weights: Optional[np.ndarray],
+              seed: int, n_threads: int, feature_names: Optional[Sequence[str]] = None):
+    """Fit on all rows of ``X``, limiting OpenMP to ``n_threads``.
+
+    ``feature_names`` are recorded on the model (``feature_names_in_``) so the
+    scorer reads its column order from the artifact.
+    """
+    from threadpoolctl import threadpool_limits
+
+    model = make_model(kind, params, seed, n_threads)
+    fit_params = {'feature_name': list(feature_names)} if kind == 'lightgbm' and feature_names else {}
+    with threadpool_limits(limits=n_threads, user_api='openmp'):
+        model.fit(X, y, sample_weight=weights, **fit_params)
+    if kind == 'hist' and feature_names:
+        # Fitted on an unnamed memmap; the names come from meta.json
+        model.feature_names_in_ = np.asarray(feature_names, dtype=object)
+    return model
+
+def evaluate(model, X: np.ndarray, y: np.ndarray, mask: np.ndarray, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> float:
+    """Mean squared error over the rows in ``mask``, predicted chunk by chunk."""
+    squared, count = 0.0, 0
+    for rows in iter_row_chunks(len(y), chunk_rows):
+        keep = mask[rows]
+        if not keep.any():
+            continue
+        with warnings.catch_warnings():
+            # The memmap has no column names even when the model records them
+            warnings.filterwarnings('ignore', message='X does not have valid feature names')
+            prediction = model.predict(X[rows][keep])
+        squared += float(np.sum((prediction - y[rows][keep]) ** 2))
+        count += int(keep.sum())
+    return squared / count if count else float('nan')
+
+def sample_candidates(kind: str, n_candidates: int, seed: int) -> List[Dict[str, Any]]:
+    """The default parameters followed by ``n_candidates - 1`` distinct samples of the space."""
+    space = SEARCH_SPACE[kind]
+    rng = np.random.default_rng(seed)
+    candidates = [dict(DEFAULT_PARAMS[kind])]
+    seen = {tuple(sorted(candidates[0].items()))}
+    attempts = 0
+    while len(candidates) < n_candidates and attempts < 100 * n_candidates:
+        attempts += 1
+        params = {name: values[int(rng.integers(len(values)))] for name, values in space.items()}
+        key = tuple(sorted(params.items()))
+        if key not in seen:
+            seen.add(key)
+            candidates.append(params)
+    return candidates
+
+_worker_split: Optional[Dict[str, Tuple[np.memmap, np.memmap]]] = None
+
+def _init_worker(directory: str, rows: Dict[str, int], n_features: int, dtype):
+    # Each worker maps the same files; pages are shared through the OS cache
+    global _worker_split
+    _worker_split = load_search_split(directory, rows, n_features, dtype)
+
+def _evaluate_candidate(args) -> Tuple[int, float, float]:
+    index, kind, params, seed, n_threads = args
+    X_train, y_train = _worker_split['train']
+    X_valid, y_valid = _worker_split['valid']
+    start = time.perf_counter()
+    model = fit_model(kind, params, X_train, y_train, None, seed, n_threads)
+    mse = evaluate(model, X_valid, y_valid, np.ones(len(y_valid), dtype=bool))
+    return index, mse, time.perf_counter() - start
+
+
+class PhaseTimer:
+    """Wall-clock seconds and rows/s per named phase."""
+
+    def __init__(self):
+        self.phases: Dict[str, Dict[str, float]] = {}
+
+    @contextmanager
+    def phase(self, name: str, rows: int = 0):
+        start = time.perf_counter()
+        yield
+        seconds = time.perf_counter() - start
+        self.phases[name] = {'seconds': seconds, 'rows': rows,
+                             'rows_per_s': rows / seconds if rows and seconds > 0 else 0.0}
+        rate = f", {rows / seconds:,.0f} rows/s" if rows and seconds > 0 else ""
+        logger.info("%s: %.2fs%s", name, seconds, rate)
+
+
+@instrumented('models.train_scalable')
+def train_scalable(directory: str, kind: str = 'hist', n_candidates: int = 1, n_jobs: int = 1,
+                   n_threads: Optional[int] = None, seed: int = 2025,
+                   valid_fraction: float = DEFAULT_VALID_FRACTION) -> Tuple[Any, Dict[str, Any]]:
+    """Search hyperparameters and fit the final model on all rows.
+
+    Args:
+        directory: Training data written by :class:`TrainingDataWriter`.
+        kind: 'hist' (HistGradientBoostingRegressor) or 'lightgbm'.
+        n_candidates: Parameter sets to evaluate on the hold-out; 1 fits the defaults.
+        n_jobs: Search worker processes.
+        n_threads: Threads per fit; defaults to the CPUs divided among the workers.
+        seed: Seeds candidate sampling, the hold-out split and the models.
+        valid_fraction: Share of rows held out for the search.
+
+    Returns:
+        (final model, report with the chosen parameters, search results and
+        per-phase timings).
+    """
+    global _worker_split
+    if kind not in MODEL_KINDS:
+        raise ValueError(f"Unknown model kind: {kind}")
+    cpus = os.cpu_count() or 1
+    timer = PhaseTimer()
+
+    with timer.phase('load'):
+        X, y, feature_names = load_training_data(directory)
+    n_rows = len(y)
+
+    candidates = sample_candidates(kind, max(1, n_candidates), seed)
+    results: List[Dict[str, Any]] = []
+    if len(candidates) > 1:
+        workers = max(1, min(n_jobs, len(candidates)))
+        threads = n_threads or max(1, cpus // workers)
+        tasks = [(i, kind, params, seed, threads) for i, params in enumerate(candidates)]
+        dtype = FIT_DTYPES[kind]
+        split_dir = tempfile.mkdtemp(prefix='.search-', dir=directory)
+        try:
+            with timer.phase('split', rows=n_rows):
+                rows = write_search_split(X, y, holdout_mask(n_rows, valid_fraction, seed), split_dir, dtype)
+            initargs = (split_dir, rows, len(feature_names), dtype)
+            with timer.phase('search', rows=rows['train'] * len(candidates)):
+                if workers > 1:
+                    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                             initargs=initargs) as pool:
+                        outcomes = list(pool.map(_evaluate_candidate, tasks))
+                else:
+                    _init_worker(*initargs)
+                    outcomes = [_evaluate_candidate(task) for task in tasks]
+        finally:
+            _worker_split = None
+            shutil.rmtree(split_dir, ignore_errors=True)
+        for index, mse, seconds in outcomes:
+            results.append({'params': candidates[index], 'valid_mse': mse, 'seconds': seconds})
+        # Ties go to the earlier candidate, so the choice does not depend on scheduling
+        best = min(range(len(results)), key=lambda i: (results[i]['valid_mse'], i))
+    else:
+        best = 0
+    params = candidates[best]
+
+    with timer.phase('fit', rows=n_rows):
+        model = fit_model(kind, params, X, y, np.ones(n_rows, dtype=np.float32), seed, n_threads or cpus,
+                          feature_names)
+
+    with timer.phase('evaluate', rows=n_rows):
+        train_mse = evaluate(model, X, y, np.ones(n_rows, dtype=bool))
+
+    report = {
+        'kind': kind,
+        'rows': n_rows,
+        'feature_names': feature_names,
+        'seed': seed,
+        'params': params,
+        'train_mse': train_mse,
+        'search': results,
+        'phases': timer.phases,
+    }
+    return model, report
+
+# Example usage
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(description="Train the risk model on memory-mapped training data.")
+    parser.add_argument('--data', required=True, help="Training data directory")
+    parser.add_argument('--synthetic-rows', type=int, default=0,
+                        help="Write this many synthetic rows to --data first")
+    parser.add_argument('--model', choices=MODEL_KINDS, default='hist')
+    parser.add_argument('--search', type=int, default=1, help="Hyperparameter candidates to evaluate")
+    parser.add_argument('--jobs', type=int, default=1, help="Search worker processes")
+    parser.add_argument('--threads', type=int, default=None, help="Threads per fit")
+    parser.add_argument('--seed', type=int, default=2025, help='Random seed')
+    parser.add_argument('--output', default=None, help="Path to save the model (joblib)")
+    parser.add_argument('--report', default=None, help="Path to save the JSON report")
+    args = parser.parse_args()
+
+    if args.synthetic_rows:
+        write_synthetic_training_data(args.data, args.synthetic_rows, args.seed)
+
+    model, report = train_scalable(args.data, kind=args.model, n_candidates=args.search, n_jobs=args.jobs,
+                                   n_threads=args.threads, seed=args.seed)
+    logger.info("Chosen params: %s, train MSE %.6f", report['params'], report['train_mse'])
+
+    if args.output:
+        import joblib
+        from src.dq.drift import baseline_path, build_baseline
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        joblib.dump(model, args.output)
+        # Sketched chunk by chunk from the memory-mapped matrix
+        X, _, feature_names = load_training_data(args.data)
+        build_baseline(X, feature_names).save(baseline_path(args.output))
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,228 @@
+"""Adaptive request micro-batching for the scoring server.
+
+Concurrent requests are queued and coalesced into one vectorized predict.
+A batch is dispatched as soon as it is full or ``max_wait_s`` after its first
+request arrived, whichever comes first; when requests are already queued
+they are taken without waiting, so the wait only applies to light traffic.
+The predict itself runs in a thread pool so the event loop never blocks,
+with up to ``workers`` batches in flight. If a batched predict raises, each
+request in it is scored on its own, so one bad request only fails itself.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_MAX_BATCH_SIZE = 256
+DEFAULT_MAX_WAIT_S = 0.002
+DEFAULT_MAX_QUEUE = 4_096
+DEFAULT_WORKERS = 2
+
+# Upper bounds of the batch size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+class QueueFullError(Exception):
+    """Raised when the batcher's queue is full; the server answers 429."""
+
+
+class BatchMetrics:
+    """Per-batch size and latency counters (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.rows = 0
+        self.requests = 0
+        self.rejected = 0
+        self.failed_batches = 0
+        self.size_histogram = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self.predict_seconds = 0.0
+        self.predict_max_seconds = 0.0
+        self.queue_wait_seconds = 0.0
+        self.queue_wait_max_seconds = 0.0
+
+    def record_batch(self, requests: int, rows: int, predict_s: float, queue_wait_s: float,
+                     queue_wait_max_s: float, failed: bool):
+        with self._lock:
+            self.batches += 1
+            self.requests += requests
+            self.rows += rows
+            self.failed_batches += int(failed)
+            self.size_histogram[int(np.searchsorted(BATCH_SIZE_BUCKETS, rows))] += 1
+            self.predict_seconds += predict_s
+            self.predict_max_seconds = max(self.predict_max_seconds, predict_s)
+            self.queue_wait_seconds += queue_wait_s
+            self.queue_wait_max_seconds = max(self.queue_wait_max_seconds, queue_wait_max_s)
+
+    def record_rejected(self):
+        with self._lock:
+            self.rejected += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            batches = self.batches
+            labels = [f"le_{bound}" for bound in BATCH_SIZE_BUCKETS] + ['le_inf']
+            return {
+                'batches': batches,
+                'requests': self.requests,
+                'rows': self.rows,
+                'rejected': self.rejected,
+                'failed_batches': self.failed_batches,
+                'mean_batch_size': self.rows / batches if batches else 0.0,
+                'batch_size_buckets': list(self.size_histogram),
+                'batch_size_histogram': dict(zip(labels, self.size_histogram)),
+                'predict_seconds': self.predict_seconds,
+                'predict_mean_seconds': self.predict_seconds / batches if batches else 0.0,
+                'predict_max_seconds': self.predict_max_seconds,
+                'queue_wait_seconds': self.queue_wait_seconds,
+                'queue_wait_mean_seconds': self.queue_wait_seconds / self.requests if self.requests else 0.0,
+                'queue_wait_max_seconds': self.queue_wait_max_seconds,
+            }
+
+
+class MicroBatcher:
+    """Coalesce concurrent scoring requests into batched calls of ``predict_fn``.
+
+    Args:
+        predict_fn: Called in a worker thread with a list of rows; returns one
+                    score per row.
+        max_batch_size: Rows at which a batch stops taking more requests. A
+                        single request larger than this is scored as one batch.
+        max_wait_s: Longest a request waits for others to join its batch.
+        max_queue: Pending requests before ``submit`` raises QueueFullError.
+        workers: Batches predicted concurrently (thread pool size).
+    """
+
+    def __init__(self, predict_fn: Callable[[List[Any]], Sequence[float]],
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_wait_s: float = DEFAULT_MAX_WAIT_S,
+                 max_queue: int = DEFAULT_MAX_QUEUE, workers: int = DEFAULT_WORKERS):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_s
+        self.max_queue = max_queue
+        self.workers = workers
+        self.metrics = BatchMetrics()
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._inflight: set = set()
+        # Requests the dispatcher has taken off the queue but not yet handed to a worker
+        self._collecting: List[Tuple[List[Any], asyncio.Future, float]] = []
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='scorer')
+        self._slots = asyncio.Semaphore(self.workers)
+        self._dispatcher = asyncio.get_running_loop().create_task(self._dispatch())
+
+    async def stop(self):
+        """Stop taking batches, finish the ones in flight and shut the pool down."""
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+        pending = [future for _, future, _ in self._collecting]
+        self._collecting = []
+        while self._queue is not None and not self._queue.empty():
+            pending.append(self._queue.get_nowait()[1])
+        for future in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("Scoring server is shutting down"))
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, rows: List[Any]) -> List[float]:
+        """Score ``rows`` as part of the next batch.
+
+        Raises:
+            QueueFullError: The queue is at ``max_queue`` pending requests.
+        """
+        if self._queue is None:
+            raise RuntimeError("MicroBatcher.start() has not been called")
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((rows, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.metrics.record_rejected()
+            raise QueueFullError(f"Scoring queue is full ({self.max_queue} pending requests)") from None
+        return await future
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            first = await self._queue.get()
+            batch = self._collecting = [first]
+            n_rows = len(first[0])
+            deadline = loop.time() + self.max_wait_s
+            while n_rows < self.max_batch_size:
+                if self._queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = self._queue.get_nowait()
+                batch.append(item)
+                n_rows += len(item[0])
+
+            # Wait for a free worker before taking the next batch; requests
+            # keep queueing meanwhile, so the next batch is fuller under load
+            await self._slots.acquire()
+            task = loop.create_task(self._run(batch, n_rows))
+            self._collecting = []
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _run(self, batch: List[Tuple[List[Any], asyncio.Future, float]], n_rows: int):
+        loop = asyncio.get_running_loop()
+        rows = [row for item_rows, _, _ in batch for row in item_rows]
+        started = time.perf_counter()
+        waits = [started - enqueued for _, _, enqueued in batch]
+        failed = False
+        try:
+            scores = await loop.run_in_executor(self._executor, self.predict_fn, rows)
+        except Exception as e:
+            failed = True
+            if len(batch) == 1:
+                if not batch[0][1].done():
+                    batch[0][1].set_exception(e)
+            else:
+                # Find the request(s) that broke the batch; the others still get scores
+                for item_rows, future, _ in batch:
+                    try:
+                        item_scores = await loop.run_in_executor(self._executor, self.predict_fn, item_rows)
+                    except Exception as item_error:
+                        if not future.done():
+                            future.set_exception(item_error)
+                    else:
+                        if not future.done():
+                            future.set_result([float(score) for score in item_scores])
+        else:
+            offset = 0
+            for item_rows, future, _ in batch:
+                if not future.done():
+                    future.set_result([float(score) for score in scores[offset:offset + len(item_rows)]])
+                offset += len(item_rows)
+        finally:
+            self._slots.release()
+            self.metrics.record_batch(len(batch), n_rows, time.perf_counter() - started, sum(waits), max(waits),
+                                     failed)
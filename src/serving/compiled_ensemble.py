@@ -0,0 +1,482 @@
+"""Flat-array tree ensemble evaluator for low-latency scoring.
+
+A compiled ensemble is saved as ``.npy`` files in a ``compiled/`` directory
+next to the model artifact (see :func:`load_compiled_ensemble`) and loaded
+back with ``np.load(..., mmap_mode='r')``, so every serving process that maps
+the same version shares one copy of the node arrays and the cell table in the
+page cache.
+"""
+
+import json
+import logging
+import os
+import shutil
+import uuid
+import warnings
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+COMPILED_DIRNAME = 'compiled'
+COMPILED_META_FILENAME = 'meta.json'
+# Size and mtime of the artifact the saved arrays were compiled from
+COMPILED_SOURCE_FILENAME = 'source.json'
+# Arrays scoring reads, saved one .npy file each
+_SAVED_ARRAYS = ('feature', 'threshold', 'left', 'right', 'missing_left', 'value', 'roots', '_rank',
+                 '_feature_idx', '_child', '_roots_idx', '_split_values', '_split_offsets', '_table_values')
+
+# Largest batch the level-by-level walk scores; above it, without a cell table,
+# the source model's own (compiled) predict is faster
+WALK_MAX_ROWS = 32
+
+class CompiledEnsemble:
+    """A fitted tree ensemble flattened into contiguous NumPy node arrays.
+
+    All trees share one set of node arrays; ``roots`` holds each tree's first
+    node. Leaves point both children at themselves, so a batch can be walked
+    level by level for ``max_depth`` steps without checking which rows are done.
+
+    Every split compares one feature against a threshold, so each input value is
+    first reduced to its rank among that feature's distinct thresholds (one
+    ``searchsorted`` per feature); the walk then only compares small integers.
+    When the thresholds cut the input space into at most ``max_table_cells``
+    cells, the ensemble output of every cell is precomputed and a batch becomes a
+    single table lookup.
+
+    Without a table the walk only beats the source library for small batches,
+    so batches of more than WALK_MAX_ROWS rows go to ``fallback`` (the source
+    model's predict, set by :func:`compile_ensemble`) when there is one.
+
+    Leaf values are pre-multiplied by the learning rate and accumulated tree by
+    tree in the same order as the source model, so sklearn results match exactly.
+
+    Args:
+        feature: int32 split feature per node (0 on leaves).
+        threshold: float64 split threshold per node; rows go left when x <= threshold.
+        left: int32 index of the left child per node.
+        right: int32 index of the right child per node.
+        missing_left: bool, whether NaN goes to the left child per node.
+        value: float64 contribution of each leaf (already scaled).
+        roots: int32 root node of each tree.
+        max_depth: Deepest root-to-leaf path over all trees.
+        base: Constant added to every prediction (the model's init estimate).
+        n_features: Width of the expected input.
+        input_dtype: dtype rows are cast to before comparisons, matching the
+            source library.
+        max_table_cells: Largest cell table to precompute; 0 disables it.
+        fallback: Batch predict used instead of the walk for large batches
+            when there is no table; None always walks.
+    """
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, left: np.ndarray, right: np.ndarray,
+                 missing_left: np.ndarray, value: np.ndarray, roots: np.ndarray, max_depth: int,
+                 base: float, n_features: int, input_dtype: Any = np.float32,
+                 max_table_cells: int = 1 << 20, fallback: Optional[Callable[[np.ndarray], Any]] = None):
+        self.fallback = fallback
+        self.feature = np.ascontiguousarray(feature, dtype=np.int32)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.left = np.ascontiguousarray(left, dtype=np.int32)
+        self.right = np.ascontiguousarray(right, dtype=np.int32)
+        self.missing_left = np.ascontiguousarray(missing_left, dtype=bool)
+        self.value = np.ascontiguousarray(value, dtype=np.float64)
+        self.roots = np.ascontiguousarray(roots, dtype=np.int32)
+        self.max_depth = int(max_depth)
+        self.base = float(base)
+        self.n_features = int(n_features)
+        self.input_dtype = np.dtype(input_dtype)
+        self.max_table_cells = int(max_table_cells)
+
+        # Walk-time layout: node -> (feature, rank of its threshold), interleaved children
+        is_leaf = self.left == np.arange(len(self.left))
+        split_points: List[np.ndarray] = []
+        self._rank = np.zeros(len(self.feature), dtype=np.int32)
+        for f in range(self.n_features):
+            splits = (self.feature == f) & ~is_leaf
+            points = np.unique(self.threshold[splits])
+            split_points.append(points)
+            self._rank[splits] = np.searchsorted(points, self.threshold[splits])
+        self._split_values = np.concatenate(split_points) if split_points else np.empty(0)
+        self._split_offsets = np.cumsum([0] + [len(points) for points in split_points]).astype(np.int64)
+        self._feature_idx = self.feature.astype(np.intp)
+        self._child = np.empty(2 * len(self.left), dtype=np.intp)
+        self._child[0::2] = self.left
+        self._child[1::2] = self.right
+        self._roots_idx = self.roots.astype(np.intp).reshape(-1, 1)
+        self._split_points = self._points_views()
+        self._table_values, self._table_shape = self._build_table(max_table_cells)
+        self._finish()
+
+    def _points_views(self) -> List[np.ndarray]:
+        offsets = self._split_offsets
+        return [self._split_values[offsets[f]:offsets[f + 1]] for f in range(self.n_features)]
+
+    def _finish(self):
+        """Set the small state derived from the saved arrays."""
+        self._has_missing_left = bool(self.missing_left.any())
+        self._table = None
+        if self._table_shape is not None:
+            shape = self._table_shape
+            strides = np.array([int(np.prod(shape[f + 1:], dtype=np.int64)) for f in range(len(shape))],
+                               dtype=np.intp)
+            self._table = self._table_values.reshape(shape), strides
+        self._split_lists = [points.tolist() for points in self._split_points]
+
+    def save(self, directory: str):
+        """Write the arrays as ``.npy`` files plus a ``meta.json`` into ``directory``."""
+        os.makedirs(directory, exist_ok=True)
+        for name in _SAVED_ARRAYS:
+            np.save(os.path.join(directory, f"{name.lstrip('_')}.npy"), getattr(self, name))
+        meta = {'max_depth': self.max_depth, 'base': self.base, 'n_features': self.n_features,
+                'input_dtype': self.input_dtype.str, 'max_table_cells': self.max_table_cells,
+                'table_shape': list(self._table_shape) if self._table_shape is not None else None}
+        with open(os.path.join(directory, COMPILED_META_FILENAME), 'w') as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: Optional[str] = 'r') -> 'CompiledEnsemble':
+        """Load an ensemble written by :meth:`save`, memory-mapping its arrays by default."""
+        with open(os.path.join(directory, COMPILED_META_FILENAME), 'r') as f:
+            meta = json.load(f)
+        compiled = cls.__new__(cls)
+        for name in _SAVED_ARRAYS:
+            setattr(compiled, name, np.load(os.path.join(directory, f"{name.lstrip('_')}.npy"), mmap_mode=mmap_mode))
+        compiled.max_depth = meta['max_depth']
+        compiled.base = meta['base']
+        compiled.n_features = meta['n_features']
+        compiled.input_dtype = np.dtype(meta['input_dtype'])
+        compiled.max_table_cells = meta['max_table_cells']
+        compiled._table_shape = tuple(meta['table_shape']) if meta['table_shape'] is not None else None
+        compiled.fallback = None
+        compiled._split_points = compiled._points_views()
+        compiled._finish()
+        return compiled
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def has_table(self) -> bool:
+        return self._table is not None
+
+    def _ranks(self, X: np.ndarray) -> np.ndarray:
+        """Number of each feature's split points strictly below each value (n x F)."""
+        X = X.astype(self.input_dtype, copy=False).astype(np.float64, copy=False)
+        ranks = np.empty(X.shape, dtype=np.int32)
+        for f, points in enumerate(self._split_points):
+            # NaN sorts past every point, so it goes right like ``NaN <= t``
+            ranks[:, f] = np.searchsorted(points, X[:, f], side='left')
+        return ranks
+
+    def _walk(self, ranks: np.ndarray, nan_mask: Any) -> np.ndarray:
+        """Leaf node per (tree, row), walking every tree one level at a time."""
+        n = ranks.shape[0]
+        flat_ranks = ranks.ravel()
+        row_offset = np.arange(n, dtype=np.intp) * self.n_features
+        nodes = np.broadcast_to(self._roots_idx, (self.n_trees, n))
+        for _ in range(self.max_depth):
+            cell = row_offset + self._feature_idx.take(nodes)
+            go_right = flat_ranks.take(cell) > self._rank.take(nodes)
+            if nan_mask is not None:
+                go_right &= ~(nan_mask.take(cell) & self.missing_left.take(nodes))
+            nodes = self._child.take(2 * nodes + go_right)
+        return nodes
+
+    def _accumulate(self, leaves: np.ndarray) -> np.ndarray:
+        acc = np.full(leaves.shape[1], self.base)
+        for row in leaves:
+            acc += row
+        return acc
+
+    def _build_table(self, max_table_cells: int) -> Tuple[np.ndarray, Optional[Tuple[int, ...]]]:
+        """Ensemble output per cell (flat) and the table shape; (empty, None) when it does not fit."""
+        shape = tuple(len(points) + 1 for points in self._split_points)
+        cells = int(np.prod(shape, dtype=np.float64)) if shape else 1
+        if max_table_cells <= 0 or cells > max_table_cells:
+            return np.empty(0), None
+        # Rank r covers (points[r-1], points[r]]; every value in a cell takes the same path
+        grids = np.meshgrid(*[np.arange(size, dtype=np.int32) for size in shape], indexing='ij')
+        ranks = np.stack([grid.ravel() for grid in grids], axis=1)
+        table = np.empty(cells, dtype=np.float64)
+        for start in range(0, cells, 1024):
+            leaves = self.value.take(self._walk(ranks[start:start + 1024], None))
+            table[start:start + 1024] = self._accumulate(leaves)
+        return table, shape
+
+    def _predict_ranked(self, ranks: np.ndarray, nan_mask: Any) -> np.ndarray:
+        if self._table is not None and nan_mask is None:
+            table, strides = self._table
+            return table.ravel().take(ranks @ strides)
+        return self._accumulate(self.value.take(self._walk(ranks, nan_mask)))
+
+    def predict(self, X: np.ndarray, chunk_size: Optional[int] = None) -> np.ndarray:
+        """Predict a batch of rows.
+
+        Args:
+            X: Array of shape (n_rows, n_features) in training column order.
+            chunk_size: Rows processed at once; bounds the (trees x rows) node
+                buffer. Defaults to a cache-sized chunk for the walk and a large
+                one for table lookups.
+
+        Returns:
+            float64 predictions, one per row.
+        """
+        X = np.asarray(X)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got {X.shape[1]}")
+        if X.shape[0] == 1:
+            return np.array([self.predict_one(X[0])])
+        if self._table is None and self.fallback is not None and X.shape[0] > WALK_MAX_ROWS:
+            with warnings.catch_warnings():
+                # Rows are already in training column order
+                warnings.filterwarnings('ignore', message='X does not have valid feature names')
+                return np.asarray(self.fallback(X), dtype=np.float64)
+        if chunk_size is None:
+            chunk_size = 65_536 if self._table is not None else 1024
+
+        out = np.empty(X.shape[0], dtype=np.float64)
+        for start in range(0, X.shape[0], chunk_size):
+            chunk = X[start:start + chunk_size]
+            nan_mask = None
+            if self._has_missing_left:
+                isnan = np.isnan(chunk)
+                nan_mask = isnan.ravel() if isnan.any() else None
+            out[start:start + len(chunk)] = self._predict_ranked(self._ranks(chunk), nan_mask)
+        return out
+
+    def predict_one(self, x: np.ndarray) -> float:
+        """Predict a single row with scalar rank lookups and no batch buffers."""
+        values = np.asarray(x, dtype=self.input_dtype).ravel().tolist()
+        if len(values) != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got {len(values)}")
+        has_nan = any(v != v for v in values)
+        ranks = [len(points) if v != v else bisect_left(points, v)
+                 for v, points in zip(values, self._split_lists)]
+        if self._table is not None and not (has_nan and self._has_missing_left):
+            return float(self._table[0][tuple(ranks)])
+
+        rank_arr = np.array(ranks, dtype=np.int32)
+        nan_arr = np.isnan(np.array(values))
+        nodes = self.roots.astype(np.intp)
+        for _ in range(self.max_depth):
+            feats = self._feature_idx.take(nodes)
+            go_right = rank_arr.take(feats) > self._rank.take(nodes)
+            if has_nan and self._has_missing_left:
+                go_right &= ~(nan_arr.take(feats) & self.missing_left.take(nodes))
+            nodes = self._child.take(2 * nodes + go_right)
+        acc = self.base
+        for leaf in self.value.take(nodes).tolist():
+            acc += leaf
+        return acc
+
+def _append_sklearn_tree(tree, offset: int, scale: float, parts: List[Tuple[np.ndarray, ...]]) -> int:
+    is_leaf = tree.children_left == -1
+    idx = np.arange(tree.node_count)
+    feature = np.where(is_leaf, 0, tree.feature)
+    left = np.where(is_leaf, idx, tree.children_left) + offset
+    right = np.where(is_leaf, idx, tree.children_right) + offset
+    missing = getattr(tree, 'missing_go_to_left', None)
+    missing_left = np.zeros(tree.node_count, dtype=bool) if missing is None else (np.asarray(missing) == 1) & ~is_leaf
+    value = np.where(is_leaf, scale * tree.value[:, 0, 0], 0.0)
+    parts.append((feature, tree.threshold, left, right, missing_left, value))
+    return tree.max_depth
+
+def compile_sklearn_gbm(model, max_table_cells: int = 1 << 20) -> CompiledEnsemble:
+    """Compile a fitted sklearn ``GradientBoostingRegressor``."""
+    if getattr(model, 'estimators_', None) is None or model.estimators_.shape[1] != 1:
+        raise ValueError("Only fitted single-output gradient boosting regressors are supported")
+    n_features = model.n_features_in_
+    if model.init_ == 'zero':
+        base = 0.0
+    else:
+        base = float(np.ravel(model.init_.predict(np.zeros((1, n_features))))[0])
+
+    parts: List[Tuple[np.ndarray, ...]] = []
+    roots = []
+    max_depth = 0
+    offset = 0
+    for estimator in model.estimators_[:, 0]:
+        roots.append(offset)
+        max_depth = max(max_depth, _append_sklearn_tree(estimator.tree_, offset, model.learning_rate, parts))
+        offset += estimator.tree_.node_count
+
+    columns = [np.concatenate(col) for col in zip(*parts)]
+    return CompiledEnsemble(*columns, roots=np.array(roots), max_depth=max_depth, base=base,
+                            n_features=n_features, input_dtype=np.float32, max_table_cells=max_table_cells)
+
+def compile_sklearn_hist_gbm(model, max_table_cells: int = 1 << 20) -> CompiledEnsemble:
+    """Compile a fitted sklearn ``HistGradientBoostingRegressor`` with numerical splits.
+
+    Only identity-link losses (e.g. squared error) are supported: for the others
+    ``predict`` applies an inverse link to the raw tree sum.
+    """
+    predictors = getattr(model, '_predictors', None)
+    if predictors is None or any(len(iteration) != 1 for iteration in predictors):
+        raise ValueError("Only fitted single-output histogram gradient boosting regressors are supported")
+    if type(model._loss.link).__name__ != 'IdentityLink':
+        raise ValueError(f"Unsupported loss for compilation: {model.loss}")
+
+    parts: List[Tuple[np.ndarray, ...]] = []
+    roots = []
+    max_depth = 0
+    offset = 0
+    for (predictor,) in predictors:
+        nodes = predictor.nodes
+        if nodes['is_categorical'].any():
+            raise ValueError("Categorical splits are not supported")
+        is_leaf = nodes['is_leaf'].astype(bool)
+        idx = np.arange(len(nodes))
+        roots.append(offset)
+        parts.append((np.where(is_leaf, 0, nodes['feature_idx']),
+                      np.where(is_leaf, 0.0, nodes['num_threshold']),
+                      np.where(is_leaf, idx, nodes['left']) + offset,
+                      np.where(is_leaf, idx, nodes['right']) + offset,
+                      (nodes['missing_go_to_left'] == 1) & ~is_leaf,
+                      # Leaf values already carry the learning rate
+                      np.where(is_leaf, nodes['value'], 0.0)))
+        max_depth = max(max_depth, int(nodes['depth'].max()))
+        offset += len(nodes)
+
+    columns = [np.concatenate(col) for col in zip(*parts)]
+    return CompiledEnsemble(*columns, roots=np.array(roots), max_depth=max_depth,
+                            base=float(np.ravel(model._baseline_prediction)[0]), n_features=model.n_features_in_,
+                            input_dtype=np.float64, max_table_cells=max_table_cells)
+
+def compile_lightgbm(model, max_table_cells: int = 1 << 20) -> CompiledEnsemble:
+    """Compile a fitted LightGBM regressor or ``Booster`` with numerical splits."""
+    booster = model.booster_ if hasattr(model, 'booster_') else model
+    dump = booster.dump_model()
+    if dump.get('num_tree_per_iteration', 1) != 1:
+        raise ValueError("Only single-output LightGBM models are supported")
+
+    feature, threshold, left, right, missing_left, value = [], [], [], [], [], []
+    roots = []
+    max_depth = 0
+
+    for tree_info in dump['tree_info']:
+        roots.append(len(feature))
+        # Iterative pre-order flattening; children are patched once they are placed
+        stack = [(tree_info['tree_structure'], None, False, 0)]
+        while stack:
+            node, parent, is_left, depth = stack.pop()
+            idx = len(feature)
+            if parent is not None:
+                (left if is_left else right)[parent] = idx
+            max_depth = max(max_depth, depth)
+            if 'leaf_value' in node:
+                feature.append(0)
+                threshold.append(0.0)
+                left.append(idx)
+                right.append(idx)
+                missing_left.append(False)
+                value.append(node['leaf_value'])
+                continue
+            if node.get('decision_type', '<=') != '<=':
+                raise ValueError("Categorical LightGBM splits are not supported")
+            feature.append(node['split_feature'])
+            threshold.append(float(node['threshold']))
+            left.append(-1)
+            right.append(-1)
+            missing_type = node.get('missing_type', 'None')
+            if missing_type == 'NaN':
+                missing_left.append(bool(node.get('default_left', True)))
+            elif missing_type == 'None':
+                # LightGBM treats NaN as 0.0 when no missing values were seen in training
+                missing_left.append(0.0 <= threshold[-1])
+            else:
+                raise ValueError(f"Unsupported LightGBM missing_type: {missing_type}")
+            value.append(0.0)
+            stack.append((node['right_child'], idx, False, depth + 1))
+            stack.append((node['left_child'], idx, True, depth + 1))
+
+    return CompiledEnsemble(np.array(feature), np.array(threshold), np.array(left), np.array(right),
+                            np.array(missing_left), np.array(value), np.array(roots), max_depth,
+                            base=0.0, n_features=booster.num_feature(), input_dtype=np.float64,
+                            max_table_cells=max_table_cells)
+
+def compile_ensemble(model, max_table_cells: int = 1 << 20) -> CompiledEnsemble:
+    """Compile a fitted sklearn GBM (classic or histogram) or LightGBM model into a ``CompiledEnsemble``.
+
+    The model's own predict is kept as the ensemble's ``fallback`` for large
+    batches when no cell table fits.
+    """
+    module = type(model).__module__
+    if module.startswith('lightgbm'):
+        compiled = compile_lightgbm(model, max_table_cells)
+    elif module.startswith('sklearn.ensemble') and hasattr(model, '_predictors'):
+        compiled = compile_sklearn_hist_gbm(model, max_table_cells)
+    elif module.startswith('sklearn.ensemble'):
+        compiled = compile_sklearn_gbm(model, max_table_cells)
+    else:
+        raise TypeError(f"Cannot compile model of type {type(model).__name__}")
+    compiled.fallback = model.predict
+    return compiled
+
+def compiled_dir(model_path: str) -> str:
+    """Where the compiled arrays of a model artifact are saved."""
+    return os.path.join(os.path.dirname(model_path), COMPILED_DIRNAME)
+
+def _artifact_stamp(model_path: str) -> Dict[str, int]:
+    stat = os.stat(model_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def _saved_matches(directory: str, stamp: Dict[str, int]) -> bool:
+    # The saved arrays are of this artifact, compiled with the same settings
+    try:
+        with open(os.path.join(directory, COMPILED_SOURCE_FILENAME), 'r') as f:
+            return json.load(f) == stamp
+    except (OSError, ValueError):
+        return False
+
+def load_compiled_ensemble(model_path: str, max_table_cells: int = 1 << 20, model: Any = None,
+                           mmap_mode: Optional[str] = 'r') -> CompiledEnsemble:
+    """Compiled ensemble of a model artifact, memory-mapped from ``compiled/`` next to it.
+
+    The arrays are compiled and saved on first use, and again whenever the
+    artifact changes. If the directory is not writable the ensemble is served
+    from private memory instead.
+
+    Args:
+        model_path: joblib model artifact.
+        max_table_cells: Largest cell table to precompute.
+        model: The already loaded artifact; loaded from ``model_path`` if None.
+        mmap_mode: np.load mode for the saved arrays; None reads them into memory.
+    """
+    if model is None:
+        model = joblib.load(model_path)
+    directory = compiled_dir(model_path)
+    stamp = dict(_artifact_stamp(model_path), max_table_cells=max_table_cells)
+    if not _saved_matches(directory, stamp):
+        compiled = compile_ensemble(model, max_table_cells)
+        # Written beside the final directory and renamed into place, so readers never see a partial one
+        tmp = f"{directory}.tmp-{uuid.uuid4().hex}"
+        try:
+            compiled.save(tmp)
+            with open(os.path.join(tmp, COMPILED_SOURCE_FILENAME), 'w') as f:
+                json.dump(stamp, f)
+            shutil.rmtree(directory, ignore_errors=True)
+            os.rename(tmp, directory)
+        except OSError as e:
+            # Read-only model directory, or another process saved it first
+            shutil.rmtree(tmp, ignore_errors=True)
+            if not _saved_matches(directory, stamp):
+                logger.warning("Could not save compiled arrays to %s, serving them from private memory: %s",
+                               directory, e)
+                return compiled
+
+    compiled = CompiledEnsemble.load(directory, mmap_mode=mmap_mode)
+    compiled.fallback = model.predict
+    return compiled
+
+# Example usage
+if __name__ == "__main__":
+    compiled = load_compiled_ensemble('models/riskscore/gbm/v20251109_1/model.pkl')
+    print(f"Trees: {compiled.n_trees}, nodes: {len(compiled.feature)}, max depth: {compiled.max_depth}, "
+          f"cell table: {compiled._table is not None}")
+    print(compiled.predict_one(np.array([70.0, 0.8, 1.0])))
@@ -1,36 +1,279 @@
 """Model serving for risk scoring."""
 
+import logging
+import threading
+import warnings
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Sequence, Tuple, Union
+
 import joblib
+import numpy as np
 import pandas as pd
-from typing import Dict, Any
-from src.models.train_baseline import train_risk_model  # For fallback
+from src.serving.compiled_ensemble import load_compiled_ensemble
+from src.models.model_store import ModelNotFoundError, ModelStore, ModelVersion, get_model_store
+from src.features.feature_definitions import get_model_feature_order
+from src.utils.instrumentation import instrumented
+
+if TYPE_CHECKING:
+    from src.dq.drift import DriftMonitor
+    from src.features.online_store import OnlineFeatureClient
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 65_536
+BACKENDS = ('sklearn', 'compiled')
+# Model versions kept wrapped (and compiled) per scorer, for pinned requests
+MAX_CACHED_VERSIONS = 4
+
+BatchInput = Union[pd.DataFrame, Sequence[Dict[str, float]], np.ndarray]
+
+class _ScoringModel:
+    """A loaded model plus everything derived from it for scoring."""
+
+    def __init__(self, model: Any, model_path: str, version: Optional[str], backend: str):
+        self.model = model
+        self.model_path = model_path
+        self.version = version
+        # Resolve the column order once; every batch is laid out to match it.
+        # Models fitted without column names use the manifest's model_features.
+        names = getattr(model, 'feature_names_in_', None)
+        self.feature_names: List[str] = list(names) if names is not None else get_model_feature_order()
+        # Saved next to the artifact and memory-mapped, so every process serving
+        # this version shares one copy of the arrays
+        self.compiled = load_compiled_ensemble(model_path, model=model) if backend == 'compiled' else None
+
+    def predict(self, matrix: np.ndarray) -> np.ndarray:
+        if self.compiled is not None:
+            return self.compiled.predict(matrix)
+        with warnings.catch_warnings():
+            # The model was fitted on a DataFrame; the columns are already ordered
+            warnings.filterwarnings('ignore', message='X does not have valid feature names')
+            return self.model.predict(matrix)
 
 class RiskScorer:
-    """Risk scoring service."""
-
-    def __init__(self, model_path: str = 'models/riskscore/gbm/v20251109_1/model.pkl'):
-        try:
-            self.model = joblib.load(model_path)
-        except FileNotFoundError:
-            # Fallback to training a dummy model
-            features = pd.DataFrame({'f_trip_max_speed': [60], 'f_trip_avg_accel': [0.5], 'f_trip_harsh_brake_count': [0]})
-            labels = pd.Series([0.5])
-            self.model = train_risk_model(features, labels)
-
-    def score(self, features: Dict[str, float]) -> float:
+    """Risk scoring service.
+
+    With no ``model_path`` the scorer serves the active version of a
+    :class:`~src.models.model_store.ModelStore` and follows its hot swaps: each
+    call resolves the model once and keeps that reference until it returns, so
+    a swap never affects a request in flight. Individual calls can pin a
+    version. A missing artifact raises ``ModelNotFoundError``.
+
+    Set ``drift_monitor`` to a :class:`~src.dq.drift.DriftMonitor` to record
+    every scored batch's features for drift checks. When the active version
+    changes the monitor switches to that model's baseline; batches scored by
+    another model (a pinned version) are not recorded.
+
+    Args:
+        model_path: Path to a joblib model artifact to serve instead of the store.
+        backend: 'sklearn' calls the model's own predict; 'compiled' flattens
+                 the trees into NumPy arrays (see ``compiled_ensemble``) for
+                 lower per-call overhead; large batches of models with too
+                 many split cells for a lookup table still use the model's
+                 predict. Compiling supports sklearn's
+                 GradientBoosting and HistGradientBoosting regressors and
+                 LightGBM, with numerical splits only.
+        store: Model store to serve from; defaults to the process-wide store.
+    """
+
+    def __init__(self, model_path: Optional[str] = None, backend: str = 'sklearn',
+                 store: Optional[ModelStore] = None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend: {backend}")
+        self.backend = backend
+        self.drift_monitor: Optional['DriftMonitor'] = None
+        self._by_version: 'OrderedDict[Tuple, _ScoringModel]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._current: Optional[_ScoringModel] = None
+
+        if model_path is not None:
+            self.store = None
+            try:
+                model = joblib.load(model_path)
+            except FileNotFoundError as e:
+                raise ModelNotFoundError(f"Model artifact not found: {model_path}") from e
+            self._current = _ScoringModel(model, model_path, None, backend)
+        else:
+            self.store = store if store is not None else get_model_store()
+            self._resolve()
+
+    def _wrap(self, loaded: ModelVersion) -> _ScoringModel:
+        with self._lock:
+            runtime = self._by_version.get(loaded.key)
+            if runtime is None:
+                runtime = _ScoringModel(loaded.model, loaded.path, loaded.version, self.backend)
+                self._by_version[loaded.key] = runtime
+                while len(self._by_version) > MAX_CACHED_VERSIONS:
+                    self._by_version.popitem(last=False)
+            return runtime
+
+    def _resolve(self, version: Optional[str] = None) -> _ScoringModel:
+        """Model to use for one call: the store's active version unless pinned."""
+        if self.store is None:
+            if version is not None and version != self._current.version:
+                raise ModelNotFoundError(f"Scorer is bound to {self._current.model_path}; cannot pin {version}")
+            return self._current
+        runtime = self._wrap(self.store.get(version))
+        if version is None:
+            if runtime is not self._current:
+                self._follow_drift(runtime)
+            self._current = runtime
+        return runtime
+
+    def _follow_drift(self, runtime: _ScoringModel):
+        # Drift is measured against the active model's own training baseline
+        monitor = self.drift_monitor
+        if monitor is not None and not monitor.follow(runtime.model_path):
+            logger.warning("No drift baseline next to %s; drift monitoring is paused until a model with one "
+                           "is active", runtime.model_path)
+
+    @property
+    def model(self) -> Any:
+        return self._current.model
+
+    @property
+    def model_path(self) -> str:
+        return self._current.model_path
+
+    @property
+    def model_version(self) -> Optional[str]:
+        return self._current.version
+
+    @property
+    def feature_names(self) -> List[str]:
+        return self._current.feature_names
+
+    def score(self, features: Dict[str, float], version: Optional[str] = None) -> float:
         """Compute risk score from features.
 
         Args:
             features: Dictionary of feature values.
+            version: Model version to pin for this call; defaults to the active one.
 
         Returns:
             Risk score (0-100).
         """
-        df = pd.DataFrame([features])
-        prediction = self.model.predict(df)[0]
+        return float(self.score_batch([features], version=version)[0])
+
+    @staticmethod
+    def _to_matrix(features: BatchInput, names: List[str]) -> np.ndarray:
+        if isinstance(features, np.ndarray):
+            matrix = np.ascontiguousarray(features, dtype=np.float32)
+            if matrix.ndim == 1:
+                matrix = matrix.reshape(1, -1)
+        elif isinstance(features, pd.DataFrame):
+            missing = [name for name in names if name not in features.columns]
+            if missing:
+                raise ValueError(f"Missing features: {missing}")
+            matrix = features[names].to_numpy(dtype=np.float32)
+        else:
+            try:
+                rows = [[record[name] for name in names] for record in features]
+            except KeyError as e:
+                raise ValueError(f"Missing feature: {e.args[0]}") from e
+            matrix = np.array(rows, dtype=np.float32).reshape(len(rows), len(names))
+
+        if matrix.shape[1] != len(names):
+            raise ValueError(f"Expected {len(names)} features, got {matrix.shape[1]}")
+        return matrix
+
+    def to_matrix(self, features: BatchInput) -> np.ndarray:
+        """Lay out a batch as a float32 matrix in model feature order.
+
+        Args:
+            features: DataFrame with the model's feature columns, a list of
+                      feature dicts, or an ndarray already in feature order.
+
+        Returns:
+            C-contiguous float32 array of shape (n_rows, n_features).
+        """
+        return self._to_matrix(features, self.feature_names)
+
+    @instrumented('serving.score_batch', rows_from='features')
+    def score_batch(self, features: BatchInput, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    n_jobs: int = 1, version: Optional[str] = None) -> np.ndarray:
+        """Compute risk scores for many rows.
+
+        Args:
+            features: DataFrame, list of feature dicts, or a float32 ndarray
+                      already in ``self.feature_names`` order.
+            chunk_size: Rows scored per predict call; bounds temporary memory.
+            n_jobs: Worker processes to fan chunks out to. Only used when the
+                    batch spans more than one chunk.
+            version: Model version to pin for this call; defaults to the active one.
+
+        Returns:
+            float64 array of risk scores (0-100), one per row.
+        """
+        runtime = self._resolve(version)
+        matrix = self._to_matrix(features, runtime.feature_names)
+        monitor = self.drift_monitor
+        if monitor is not None and monitor.model_path in (None, runtime.model_path):
+            monitor.observe(matrix, runtime.feature_names)
+        n_rows = matrix.shape[0]
+        scores = np.empty(n_rows, dtype=np.float64)
+        bounds = [(start, min(start + chunk_size, n_rows)) for start in range(0, n_rows, chunk_size)]
+
+        if n_jobs > 1 and len(bounds) > 1:
+            with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                     initargs=(runtime.model_path, self.backend)) as pool:
+                chunks = pool.map(_predict_chunk, (matrix[start:end] for start, end in bounds))
+                for (start, end), prediction in zip(bounds, chunks):
+                    scores[start:end] = prediction
+        else:
+            for start, end in bounds:
+                scores[start:end] = runtime.predict(matrix[start:end])
+
         # Scale to 0-100
-        score = min(100, max(0, prediction * 100))
-        return score
+        np.multiply(scores, 100, out=scores)
+        return np.clip(scores, 0, 100, out=scores)
+
+    @instrumented('serving.score_entities', rows_from='entity_ids')
+    def score_entities(self, entity_ids: Sequence[str], client: 'OnlineFeatureClient', group: str = 'trip',
+                       version: Optional[str] = None) -> np.ndarray:
+        """Score entities whose features are read from the online feature store.
+
+        Args:
+            entity_ids: Trip (or other group) ids to score.
+            client: Online feature client; the batch is one pipelined multi-get
+                    after the local cache.
+            group: Feature group the model's features live in.
+            version: Model version to pin for this call; defaults to the active one.
+
+        Returns:
+            float64 array of risk scores, NaN for entities missing any feature.
+        """
+        runtime = self._resolve(version)
+        frame = client.get_feature_frame(group, entity_ids, runtime.feature_names)
+        matrix = frame.to_numpy(dtype=np.float32)
+        complete = ~np.isnan(matrix).any(axis=1)
+        scores = np.full(len(matrix), np.nan)
+        if complete.any():
+            scores[complete] = self.score_batch(matrix[complete], version=runtime.version)
+        return scores
+
+_worker_scorer: Optional[RiskScorer] = None
+
+def _init_worker(model_path: str, backend: str):
+    global _worker_scorer
+    _worker_scorer = RiskScorer(model_path, backend=backend)
+
+def _predict_chunk(matrix: np.ndarray) -> np.ndarray:
+    return _worker_scorer._current.predict(matrix)
+
+_app = None
+
+def __getattr__(name: str):
+    # ``uvicorn src.serving.risk_scorer:app`` builds the HTTP server on first
+    # access, so importing the scorer does not pull in FastAPI.
+    global _app
+    if name == 'app':
+        if _app is None:
+            from src.serving.server import create_app_from_config
+            _app = create_app_from_config()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Example usage
 if __name__ == "__main__":
@@ -42,3 +285,4 @@ if __name__ == "__main__":
     }
     score = scorer.score(sample_features)
     print(f"Risk Score: {score}")
+    print(scorer.score_batch([sample_features, dict(sample_features, f_trip_max_speed=120.0)]))
@@ -0,0 +1,228 @@
+"""Async HTTP scoring server around RiskScorer.
+
+Requests are coalesced by a :class:`~src.serving.batching.MicroBatcher` into
+vectorized ``RiskScorer.score_batch`` calls run off the event loop. When the
+queue is full the server answers 429 with Retry-After instead of queueing
+without bound.
+
+With drift monitoring on, every scored batch is also folded into a
+:class:`~src.dq.drift.DriftMonitor` against the baseline saved with the
+model. ``/drift`` reports PSI/KS per feature and ``/drift/sketch`` exports the
+worker's window for merging across workers.
+
+Run with ``uvicorn src.serving.risk_scorer:app`` (see bin/serve_model_local.sh).
+"""
+
+import logging
+import math
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+
+from src.dq.drift import KS_THRESHOLD, MIN_COUNT, PSI_THRESHOLD, DriftMonitor
+from src.serving.batching import (BATCH_SIZE_BUCKETS, DEFAULT_MAX_BATCH_SIZE, DEFAULT_MAX_QUEUE,
+                                  DEFAULT_MAX_WAIT_S, DEFAULT_WORKERS, MicroBatcher, QueueFullError)
+from src.serving.risk_scorer import RiskScorer
+from src.utils import instrumentation
+from src.utils.instrumentation import METRIC_PREFIX, prometheus_lines
+
+logger = logging.getLogger(__name__)
+
+RETRY_AFTER_S = 1
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class ScoreRequest(BaseModel):
+    features: Dict[str, float]
+
+
+class BatchScoreRequest(BaseModel):
+    rows: List[Dict[str, float]]
+
+
+def _batcher_collector(batcher: MicroBatcher):
+    """Prometheus lines for the micro-batcher's counters."""
+
+    def collect() -> List[str]:
+        stats = batcher.metrics.snapshot()
+        name = f"{METRIC_PREFIX}_serving_batch_size"
+        lines = [f"# HELP {name} Rows per predict batch.", f"# TYPE {name} histogram"]
+        cumulative = 0
+        for bound, count in zip(BATCH_SIZE_BUCKETS + (float('inf'),), stats['batch_size_buckets']):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else str(bound)
+            lines.append(f'{name}_bucket{{le="{le}"}} {cumulative}')
+        lines.append(f"{name}_sum {stats['rows']}")
+        lines.append(f"{name}_count {stats['batches']}")
+        for metric, key, help_text in (
+                ('serving_requests_total', 'requests', 'Scoring requests batched.'),
+                ('serving_rejected_total', 'rejected', 'Requests rejected with 429.'),
+                ('serving_failed_batches_total', 'failed_batches', 'Predict batches that raised.'),
+                ('serving_predict_seconds_total', 'predict_seconds', 'Time spent in batched predicts.'),
+                ('serving_queue_wait_seconds_total', 'queue_wait_seconds', 'Time requests waited for a batch.')):
+            lines.extend(prometheus_lines(metric, 'counter', help_text, [({}, stats[key])]))
+        lines.extend(prometheus_lines('serving_queue_depth', 'gauge', 'Requests waiting for a batch.',
+                                      [({}, batcher.queue_depth)]))
+        return lines
+
+    return collect
+
+def _drift_collector(monitor: DriftMonitor):
+    """Prometheus gauges for the drift window: per-feature PSI, KS, rows and alert state."""
+
+    def collect() -> List[str]:
+        report = monitor.report()
+        lines = []
+        for metric, key, help_text in (
+                ('drift_psi', 'psi', 'Population stability index of the live window against the baseline.'),
+                ('drift_ks', 'ks', 'Kolmogorov-Smirnov statistic of the live window against the baseline.'),
+                ('drift_window_values', 'count', 'Non-missing values in the live drift window.'),
+                ('drift_alert', 'drifting', 'Whether the feature is past a drift threshold.')):
+            lines.extend(prometheus_lines(metric, 'gauge', help_text,
+                                          [({'feature': name}, float(stats[key]))
+                                           for name, stats in report.items() if stats[key] is not None]))
+        return lines
+
+    return collect
+
+def create_app(scorer: Optional[RiskScorer] = None, backend: str = 'sklearn',
+               max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_wait_s: float = DEFAULT_MAX_WAIT_S,
+               max_queue: int = DEFAULT_MAX_QUEUE, workers: int = DEFAULT_WORKERS,
+               profile_dir: Optional[str] = None, monitor_drift: bool = False,
+               drift_options: Optional[Dict[str, Any]] = None, reload_mode: str = 'off',
+               reload_interval_s: float = 5.0) -> FastAPI:
+    """Build the scoring app.
+
+    Args:
+        scorer: Scorer to serve; by default one is created on startup from the
+                model store with ``backend``.
+        max_batch_size, max_wait_s, max_queue, workers: MicroBatcher settings.
+        profile_dir: Where the slowest profiled calls are dumped on shutdown
+                     when instrumentation profiling is enabled.
+        monitor_drift: Record scored features in a DriftMonitor, if the
+                       served model has a saved drift baseline.
+        drift_options: DriftMonitor thresholds (psi_threshold, ks_threshold, min_count).
+        reload_mode: How a store-backed scorer picks up new model versions:
+                     'poll' every ``reload_interval_s``, 'signal' on SIGHUP, or 'off'.
+    """
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        app.state.scorer = scorer if scorer is not None else RiskScorer(backend=backend)
+        store = app.state.scorer.store
+        if store is not None and reload_mode != 'off':
+            store.start_reloading(reload_mode, reload_interval_s)
+        app.state.batcher = MicroBatcher(app.state.scorer.score_batch, max_batch_size=max_batch_size,
+                                         max_wait_s=max_wait_s, max_queue=max_queue, workers=workers)
+        await app.state.batcher.start()
+        collectors = [_batcher_collector(app.state.batcher)]
+        app.state.drift = None
+        if monitor_drift:
+            app.state.drift = DriftMonitor.for_model(app.state.scorer.model_path, **(drift_options or {}))
+            if app.state.drift is None:
+                logger.warning("No drift baseline next to %s; drift monitoring is off",
+                               app.state.scorer.model_path)
+            else:
+                app.state.scorer.drift_monitor = app.state.drift
+                collectors.append(_drift_collector(app.state.drift))
+        for collector in collectors:
+            instrumentation.register_collector(collector)
+        try:
+            yield
+        finally:
+            for collector in collectors:
+                instrumentation.unregister_collector(collector)
+            await app.state.batcher.stop()
+            if store is not None:
+                store.stop()
+            if profile_dir:
+                instrumentation.dump_profiles(profile_dir)
+
+    app = FastAPI(title="Risk scoring", lifespan=lifespan)
+
+    async def score_rows(rows: List[Dict[str, float]]) -> List[float]:
+        names = app.state.scorer.feature_names
+        for row in rows:
+            missing = [name for name in names if name not in row]
+            if missing:
+                raise HTTPException(status_code=422, detail=f"Missing features: {missing}")
+            invalid = [name for name in names if not math.isfinite(row[name])]
+            if invalid:
+                raise HTTPException(status_code=422, detail=f"Non-finite feature values: {invalid}")
+        try:
+            return await app.state.batcher.submit(rows)
+        except QueueFullError as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={'Retry-After': str(RETRY_AFTER_S)})
+
+    @app.post('/score')
+    async def score(request: ScoreRequest) -> Dict[str, Any]:
+        scores = await score_rows([request.features])
+        return {'risk_score': scores[0]}
+
+    @app.post('/score/batch')
+    async def score_batch(request: BatchScoreRequest) -> Dict[str, Any]:
+        return {'risk_scores': await score_rows(request.rows) if request.rows else []}
+
+    @app.get('/metrics')
+    async def metrics() -> PlainTextResponse:
+        """Stage and batching metrics in Prometheus text format."""
+        return PlainTextResponse(instrumentation.render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+    @app.get('/metrics/batching')
+    async def batching_metrics() -> Dict[str, Any]:
+        stats = app.state.batcher.metrics.snapshot()
+        stats['queue_depth'] = app.state.batcher.queue_depth
+        return stats
+
+    def drift_monitor() -> DriftMonitor:
+        if app.state.drift is None:
+            raise HTTPException(status_code=404, detail="Drift monitoring is not enabled")
+        return app.state.drift
+
+    @app.get('/drift')
+    async def drift() -> Dict[str, Any]:
+        """Drift statistics of this worker's window against the training baseline."""
+        monitor = drift_monitor()
+        report = monitor.report()
+        return {'model_version': app.state.scorer.model_version, 'features': report,
+                'alerts': [name for name, stats in report.items() if stats['drifting']]}
+
+    @app.get('/drift/sketch')
+    async def drift_sketch(reset: bool = False) -> Dict[str, Any]:
+        """This worker's window sketch, to merge with other workers'; ``reset`` starts a new window."""
+        return drift_monitor().window(reset=reset).to_dict()
+
+    @app.get('/health')
+    async def health() -> Dict[str, Any]:
+        return {'status': 'ok', 'model_version': app.state.scorer.model_version}
+
+    return app
+
+def create_app_from_config(config: Optional[Dict[str, Any]] = None) -> FastAPI:
+    """Build the app with MODEL_SERVER_* batching and DRIFT_* monitoring settings from the config."""
+    if config is None:
+        from src.utils.config import get_config
+        config = get_config()
+    if str(config.get('INSTRUMENTATION_ENABLED', False)).lower() in ('1', 'true', 'yes'):
+        instrumentation.enable(
+            profile_slowest=int(config.get('INSTRUMENTATION_PROFILE_SLOWEST', 0)),
+            profile_rate=float(config.get('INSTRUMENTATION_PROFILE_RATE', instrumentation.DEFAULT_PROFILE_RATE)))
+    return create_app(
+        backend=config.get('MODEL_SERVER_BACKEND', 'sklearn'),
+        max_batch_size=int(config.get('MODEL_SERVER_MAX_BATCH_SIZE', DEFAULT_MAX_BATCH_SIZE)),
+        max_wait_s=float(config.get('MODEL_SERVER_MAX_WAIT_MS', DEFAULT_MAX_WAIT_S * 1000)) / 1000,
+        max_queue=int(config.get('MODEL_SERVER_MAX_QUEUE', DEFAULT_MAX_QUEUE)),
+        workers=int(config.get('MODEL_SERVER_WORKERS', DEFAULT_WORKERS)),
+        reload_mode=config.get('MODEL_STORE_RELOAD', 'off'),
+        reload_interval_s=float(config.get('MODEL_STORE_POLL_S', 5.0)),
+        profile_dir=config.get('INSTRUMENTATION_PROFILE_DIR'),
+        monitor_drift=str(config.get('DRIFT_MONITOR_ENABLED', False)).lower() in ('1', 'true', 'yes'),
+        drift_options={
+            'psi_threshold': float(config.get('DRIFT_PSI_THRESHOLD', PSI_THRESHOLD)),
+            'ks_threshold': float(config.get('DRIFT_KS_THRESHOLD', KS_THRESHOLD)),
+            'min_count': int(config.get('DRIFT_MIN_COUNT', MIN_COUNT)),
+        },
+    )
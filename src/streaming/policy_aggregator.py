@@ -0,0 +1,307 @@
+"""Rolling-window policy features over finalized trips."""
+
+import os
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from src.utils.instrumentation import instrumented
+
+KM_TO_MILES = 0.621371
+CITY_MAX_AVG_SPEED_KMH = 50.0
+HIGHWAY_MIN_AVG_SPEED_KMH = 80.0
+
+POLICY_FEATURE_COLUMNS = [
+    'policy_id',
+    'f_policy_monthly_miles_30d',
+    'f_policy_percent_city_driving',
+    'f_policy_percent_highway',
+    'f_policy_local_accident_density',
+]
+
+_NS_PER_DAY = 86_400 * 1_000_000_000
+_EMPTY = np.iinfo(np.int32).min
+
+
+class _RingWindow:
+    """Per-row ring buffers of time buckets for a set of summed metrics.
+
+    Row ``r`` holds the buckets ``(head[r] - num_buckets, head[r]]``; bucket
+    ``b`` lives in slot ``b % num_buckets``. Moving a row's head forward clears
+    the slots it passes over, so an update touches at most one slot plus the
+    slots of skipped buckets.
+    """
+
+    def __init__(self, metrics: Sequence[str], num_buckets: int, bucket_days: int, capacity: int, dtype):
+        self.metrics = list(metrics)
+        self.num_buckets = num_buckets
+        self.bucket_days = bucket_days
+        self.head = np.full(capacity, _EMPTY, dtype=np.int32)
+        self.values = np.zeros((len(self.metrics), capacity, num_buckets), dtype=dtype)
+
+    def grow(self, capacity: int):
+        head = np.full(capacity, _EMPTY, dtype=np.int32)
+        head[:len(self.head)] = self.head
+        values = np.zeros((len(self.metrics), capacity, self.num_buckets), dtype=self.values.dtype)
+        values[:, :self.values.shape[1]] = self.values
+        self.head, self.values = head, values
+
+    @property
+    def nbytes(self) -> int:
+        return self.head.nbytes + self.values.nbytes
+
+    def _advance(self, rows: np.ndarray, new_head: np.ndarray):
+        """Move heads forward to ``new_head`` (>= current), clearing passed slots."""
+        old = self.head[rows].astype(np.int64)
+        steps = np.where(old == _EMPTY, self.num_buckets, np.minimum(new_head - old, self.num_buckets))
+        for k in range(1, self.num_buckets + 1):
+            clear = steps >= k
+            if not clear.any():
+                break
+            self.values[:, rows[clear], (new_head[clear] - k + 1) % self.num_buckets] = 0
+        self.head[rows] = new_head
+
+    def add(self, rows: np.ndarray, days: np.ndarray, amounts: np.ndarray):
+        """Add ``amounts`` (n_metrics, n) for events on ``days`` to ``rows``."""
+        buckets = days // self.bucket_days
+        # Heads only move forward; the latest bucket per row wins
+        latest = pd.Series(buckets).groupby(rows).max()
+        touched = latest.index.to_numpy()
+        target = np.maximum(latest.to_numpy(), self.head[touched].astype(np.int64))
+        moved = target != self.head[touched]
+        if moved.any():
+            self._advance(touched[moved], target[moved])
+
+        keep = buckets > self.head[rows].astype(np.int64) - self.num_buckets
+        slots = buckets[keep] % self.num_buckets
+        for i in range(len(self.metrics)):
+            np.add.at(self.values[i], (rows[keep], slots), amounts[i][keep])
+
+    def add_one(self, row: int, day: int, amounts: Sequence[float]):
+        """Scalar :meth:`add` for a single event."""
+        bucket = day // self.bucket_days
+        head = int(self.head[row])
+        if bucket > head:
+            steps = self.num_buckets if head == _EMPTY else min(bucket - head, self.num_buckets)
+            for k in range(steps):
+                self.values[:, row, (bucket - k) % self.num_buckets] = 0
+            self.head[row] = bucket
+        elif bucket <= head - self.num_buckets:
+            return
+        slot = bucket % self.num_buckets
+        for i, amount in enumerate(amounts):
+            self.values[i, row, slot] += amount
+
+    def sums(self, rows: np.ndarray, as_of_day: int) -> np.ndarray:
+        """Window sums ending at ``as_of_day`` (inclusive), shape (n_metrics, len(rows))."""
+        as_of = as_of_day // self.bucket_days
+        head = self.head[rows].astype(np.int64)[:, None]
+        slots = np.arange(self.num_buckets)
+        # Bucket id held by each slot, given the row's head
+        bucket = head - ((head - slots) % self.num_buckets)
+        live = (head != _EMPTY) & (bucket <= as_of) & (bucket > as_of - self.num_buckets)
+        return np.einsum('mrb,rb->mr', self.values[:, rows].astype(np.float64), live)
+
+
+class PolicyWindowAggregator:
+    """Rolling-window policy features from finalized trips, keyed by policy_id.
+
+    State is a set of daily ring buffers per policy in contiguous NumPy arrays:
+    a 30-day window of odometer-delta miles and city / highway / total driving
+    seconds, and a 90-day window of distance and distance-weighted accident
+    density. Folding in a trip touches one bucket per metric, so streaming
+    updates cost O(1) per trip regardless of history, and at the defaults a
+    policy takes 30*4 + 30*2 float32 buckets plus two heads (~730 bytes).
+
+    A trip counts as city driving when its average speed is below 50 km/h
+    and as highway driving above 80 km/h, as defined in feature_manifest.yml.
+
+    Args:
+        capacity: Initial number of policy rows; grows by doubling.
+        density_bucket_days: Days per bucket of the 90-day window.
+        dtype: Bucket dtype.
+    """
+
+    def __init__(self, capacity: int = 1024, density_bucket_days: int = 3, dtype=np.float32):
+        self._rows: Dict[str, int] = {}
+        self._policy_ids: List[str] = []
+        self.window_30d = _RingWindow(['miles', 'city_s', 'highway_s', 'drive_s'], 30, 1, capacity, dtype)
+        self.window_90d = _RingWindow(['density_km', 'density_weighted'], 90 // density_bucket_days,
+                                      density_bucket_days, capacity, dtype)
+        self.latest_day = _EMPTY
+
+    def __len__(self) -> int:
+        return len(self._policy_ids)
+
+    @property
+    def nbytes(self) -> int:
+        return self.window_30d.nbytes + self.window_90d.nbytes
+
+    def _row_indices(self, policy_ids: Sequence[str]) -> np.ndarray:
+        codes, uniques = pd.factorize(np.asarray(policy_ids, dtype=object))
+        rows = np.empty(len(uniques), dtype=np.int64)
+        for i, policy_id in enumerate(uniques):
+            row = self._rows.get(policy_id)
+            if row is None:
+                row = self._add_policy(policy_id)
+            rows[i] = row
+        return rows[codes]
+
+    def _add_policy(self, policy_id: str) -> int:
+        row = len(self._policy_ids)
+        if row == len(self.window_30d.head):
+            for window in (self.window_30d, self.window_90d):
+                window.grow(2 * row)
+        self._rows[policy_id] = row
+        self._policy_ids.append(policy_id)
+        return row
+
+    @staticmethod
+    def _trip_metrics(trips: pd.DataFrame):
+        end_ns = pd.to_datetime(trips['trip_end_ts'], utc=True).to_numpy(dtype='datetime64[ns]').view(np.int64)
+        start_ns = pd.to_datetime(trips['trip_start_ts'], utc=True).to_numpy(dtype='datetime64[ns]').view(np.int64)
+        days = end_ns // _NS_PER_DAY
+        km = np.nan_to_num(trips['trip_distance_km'].to_numpy(dtype=np.float64, na_value=np.nan)).clip(min=0)
+        drive_s = np.maximum(end_ns - start_ns, 0) / 1e9
+        avg_speed = trips['trip_avg_speed'].to_numpy(dtype=np.float64, na_value=np.nan)
+        city_s = np.where(avg_speed < CITY_MAX_AVG_SPEED_KMH, drive_s, 0.0)
+        highway_s = np.where(avg_speed > HIGHWAY_MIN_AVG_SPEED_KMH, drive_s, 0.0)
+        if 'accident_density' in trips.columns:
+            density = trips['accident_density'].to_numpy(dtype=np.float64, na_value=np.nan)
+        else:
+            density = np.full(len(trips), np.nan)
+        has_density = ~np.isnan(density)
+        density_km = np.where(has_density, km, 0.0)
+        density_weighted = np.where(has_density, density * km, 0.0)
+        return days, np.stack([km * KM_TO_MILES, city_s, highway_s, drive_s]), np.stack([density_km, density_weighted])
+
+    @instrumented('streaming.policy_window_update', rows_from='trips')
+    def update(self, trips: pd.DataFrame):
+        """Fold finalized trips into the windows.
+
+        Args:
+            trips: Trips with policy_id, trip_start_ts, trip_end_ts,
+                   trip_distance_km and trip_avg_speed (e.g. the output of
+                   ``TripAggregator.update``), plus an optional
+                   accident_density (accidents/km²) for the trip's area.
+                   Trips are bucketed by the UTC day they end on; trips
+                   without a policy_id are ignored.
+        """
+        trips = trips[trips['policy_id'].notna()]
+        if trips.empty:
+            return
+        days, metrics_30d, metrics_90d = self._trip_metrics(trips)
+        rows = self._row_indices(trips['policy_id'].to_numpy(dtype=object))
+        self.window_30d.add(rows, days, metrics_30d)
+        self.window_90d.add(rows, days, metrics_90d)
+        self.latest_day = max(self.latest_day, int(days.max()))
+
+    def update_trip(self, policy_id: str, trip_start_ts, trip_end_ts, trip_distance_km: float,
+                    trip_avg_speed: float, accident_density: Optional[float] = None):
+        """Fold in a single trip without building a DataFrame."""
+        start_ns = pd.Timestamp(trip_start_ts).value
+        end_ns = pd.Timestamp(trip_end_ts).value
+        day = end_ns // _NS_PER_DAY
+        km = max(trip_distance_km or 0.0, 0.0)
+        drive_s = max(end_ns - start_ns, 0) / 1e9
+        city_s = drive_s if trip_avg_speed < CITY_MAX_AVG_SPEED_KMH else 0.0
+        highway_s = drive_s if trip_avg_speed > HIGHWAY_MIN_AVG_SPEED_KMH else 0.0
+        row = self._rows.get(policy_id)
+        if row is None:
+            row = self._add_policy(policy_id)
+        self.window_30d.add_one(row, day, (km * KM_TO_MILES, city_s, highway_s, drive_s))
+        if accident_density is not None and not np.isnan(accident_density):
+            self.window_90d.add_one(row, day, (km, accident_density * km))
+        self.latest_day = max(self.latest_day, day)
+
+    @classmethod
+    def backfill(cls, trips: pd.DataFrame, **kwargs) -> 'PolicyWindowAggregator':
+        """Build state for the whole book from historical trips in one vectorized pass."""
+        aggregator = cls(capacity=max(1024, int(trips['policy_id'].nunique())), **kwargs)
+        aggregator.update(trips)
+        return aggregator
+
+    def features(self, policy_ids: Optional[Sequence[str]] = None, as_of=None) -> pd.DataFrame:
+        """Window features per policy.
+
+        Args:
+            policy_ids: Policies to return; all known policies when omitted.
+                        Unknown policies get 0 miles and NaN percentages.
+            as_of: Day the windows end on (inclusive); defaults to the latest
+                   trip day seen. Later days age trips out of the windows;
+                   buckets older than a policy's latest update are already
+                   recycled, so earlier days give partial windows.
+
+        Returns:
+            DataFrame with POLICY_FEATURE_COLUMNS.
+        """
+        if policy_ids is None:
+            policy_ids = self._policy_ids
+        policy_ids = list(policy_ids)
+        as_of_day = self.latest_day if as_of is None else pd.Timestamp(as_of).value // _NS_PER_DAY
+
+        rows = np.array([self._rows.get(p, -1) for p in policy_ids], dtype=np.int64)
+        known = rows >= 0
+        miles, city_s, highway_s, drive_s = np.zeros((4, len(rows)))
+        density_km, density_weighted = np.zeros((2, len(rows)))
+        if known.any() and as_of_day != _EMPTY:
+            miles[known], city_s[known], highway_s[known], drive_s[known] = \
+                self.window_30d.sums(rows[known], as_of_day)
+            density_km[known], density_weighted[known] = self.window_90d.sums(rows[known], as_of_day)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percent_city = np.where(drive_s > 0, 100.0 * city_s / drive_s, np.nan)
+            percent_highway = np.where(drive_s > 0, 100.0 * highway_s / drive_s, np.nan)
+            density = np.where(density_km > 0, density_weighted / density_km, np.nan)
+
+        return pd.DataFrame({
+            'policy_id': policy_ids,
+            'f_policy_monthly_miles_30d': miles,
+            'f_policy_percent_city_driving': percent_city,
+            'f_policy_percent_highway': percent_highway,
+            'f_policy_local_accident_density': density,
+        }, columns=POLICY_FEATURE_COLUMNS)
+
+    def save(self, path: str):
+        """Write state to a compressed .npz file (atomically)."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(
+                f,
+                policy_ids=np.array(self._policy_ids, dtype=object).astype(str),
+                latest_day=np.int64(self.latest_day),
+                density_bucket_days=np.int64(self.window_90d.bucket_days),
+                head_30d=self.window_30d.head[:len(self)], values_30d=self.window_30d.values[:, :len(self)],
+                head_90d=self.window_90d.head[:len(self)], values_90d=self.window_90d.values[:, :len(self)],
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'PolicyWindowAggregator':
+        with np.load(path) as data:
+            policy_ids = data['policy_ids'].tolist()
+            aggregator = cls(capacity=max(1024, len(policy_ids)), density_bucket_days=int(data['density_bucket_days']),
+                             dtype=data['values_30d'].dtype)
+            n = len(policy_ids)
+            aggregator._policy_ids = policy_ids
+            aggregator._rows = {policy_id: row for row, policy_id in enumerate(policy_ids)}
+            aggregator.latest_day = int(data['latest_day'])
+            aggregator.window_30d.head[:n] = data['head_30d']
+            aggregator.window_30d.values[:, :n] = data['values_30d']
+            aggregator.window_90d.head[:n] = data['head_90d']
+            aggregator.window_90d.values[:, :n] = data['values_90d']
+        return aggregator
+
+
+# Example usage
+if __name__ == "__main__":
+    trips = pd.DataFrame({
+        'policy_id': ['p1', 'p1', 'p2'],
+        'trip_start_ts': pd.to_datetime(['2025-11-01T08:00Z', '2025-11-20T17:00Z', '2025-11-21T09:00Z']),
+        'trip_end_ts': pd.to_datetime(['2025-11-01T08:30Z', '2025-11-20T17:45Z', '2025-11-21T09:20Z']),
+        'trip_distance_km': [12.0, 60.0, 8.0],
+        'trip_avg_speed': [35.0, 85.0, 40.0],
+    })
+    aggregator = PolicyWindowAggregator.backfill(trips)
+    print(aggregator.features())
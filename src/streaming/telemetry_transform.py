@@ -1,9 +1,70 @@
 """Streaming transformations for telemetry."""
 
+import threading
+import numpy as np
 import pandas as pd
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Tuple
 from datetime import datetime
+from src.features.feature_compiler import INPUT_OPS, FeatureSpec, compile_manifest, parse_event_ts
+from src.utils.instrumentation import instrumented
 
+TRIP_FEATURE_COLUMNS = ['trip_id', 'trip_max_speed', 'trip_avg_speed', 'harsh_brake_count', 'night_driving_minutes']
+
+# Manifest feature behind each trip feature column, for the plan-driven paths
+TRIP_FEATURE_SOURCES = {
+    'trip_max_speed': 'f_trip_max_speed',
+    'trip_avg_speed': 'f_trip_avg_speed',
+    'harsh_brake_count': 'f_trip_harsh_brake_count',
+    'night_driving_minutes': 'f_trip_night_driving_minutes',
+}
+
+_trip_plans: Dict[Tuple[str, str], Any] = {}
+_trip_plans_lock = threading.Lock()
+
+def _trip_plan(night_weighting: str = 'elapsed'):
+    """The compiled manifest plan for TRIP_FEATURE_SOURCES.
+
+    With 'event' weighting, night driving counts the events matching the night
+    feature's ``where`` input instead of summing their durations.
+    """
+    manifest_plan = compile_manifest()
+    key = (manifest_plan.manifest_hash, night_weighting)
+    with _trip_plans_lock:
+        plan = _trip_plans.get(key)
+    if plan is None:
+        plan = manifest_plan.select(list(TRIP_FEATURE_SOURCES.values()))
+        if night_weighting == 'event':
+            night_name = TRIP_FEATURE_SOURCES['night_driving_minutes']
+            night = next(feature for feature in plan.features if feature.name == night_name)
+            if night.where is None:
+                raise ValueError(f"{night.name} has no where input to count events by")
+            plan = plan.with_features([FeatureSpec(night.name, 'count', None, night.where, 'int64')
+                                       if feature is night else feature for feature in plan.features])
+        with _trip_plans_lock:
+            plan = _trip_plans.setdefault(key, plan)
+    return plan
+
+def __getattr__(name: str):
+    # Telemetry columns read by the trip feature functions, from the manifest plan
+    if name == 'TRIP_INPUT_COLUMNS':
+        return list(_trip_plan().input_columns)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _reference_rules() -> Tuple[str, Callable[[np.ndarray], np.ndarray], int, int]:
+    """(harsh brake column, harsh brake test, night start hour, night end hour) from the manifest."""
+    plan = _trip_plan('event')
+    steps = {name: (op, args) for name, op, args in plan.steps}
+    features = {feature.name: feature for feature in plan.features}
+    harsh_op, harsh_args = steps.get(features[TRIP_FEATURE_SOURCES['harsh_brake_count']].where, (None, []))
+    night_op, night_args = steps.get(features[TRIP_FEATURE_SOURCES['night_driving_minutes']].where, (None, []))
+    if harsh_op not in ('le', 'lt', 'ge', 'gt') or night_op != 'hour_between':
+        raise ValueError("compute_trip_features needs a threshold harsh brake input and an "
+                         "hour_between night input; use compute_trip_features_vectorized")
+    column, threshold = harsh_args
+    compare = INPUT_OPS[harsh_op][0]
+    return column, lambda x: compare(None, x, threshold), night_args[1], night_args[2]
+
+@instrumented('streaming.compute_trip_features', rows_from='events')
 def compute_trip_features(events: pd.DataFrame) -> pd.DataFrame:
     """Compute trip-level features from a DataFrame of telemetry events.
 
@@ -18,28 +79,30 @@ def compute_trip_features(events: pd.DataFrame) -> pd.DataFrame:
             - harsh_brake_count: int
             - night_driving_minutes: int
     """
+    # Thresholds and the night window come from the feature manifest
+    harsh_column, is_harsh, night_start, night_end = _reference_rules()
+
     # Ensure ts is datetime
     if 'ts' in events.columns:
-        if events['ts'].dtype == 'object':
-            events['ts'] = pd.to_datetime(events['ts'].str.rstrip('Z'), utc=True)
-        else:
-            events['ts'] = pd.to_datetime(events['ts'], utc=True)
+        events['ts'] = parse_event_ts(events['ts'])
 
     # Group by trip_id
     trip_features = events.groupby('trip_id').agg(
         trip_max_speed=('speed_kmh', 'max'),
         trip_avg_speed=('speed_kmh', 'mean'),
-        harsh_brake_count=('accel_y_m_s2', lambda x: (x <= -2.5).sum())  # deceleration >= 2.5 m/s²
+        harsh_brake_count=(harsh_column, lambda x: is_harsh(x.to_numpy(dtype=np.float64)).sum())
     ).reset_index()
 
-    # Calculate night driving minutes (22:00-05:00)
+    # Calculate night driving minutes (the manifest's night window, wrapping past midnight)
     def calculate_night_minutes(group):
-        night_start = 22
-        night_end = 5
         night_minutes = 0
         for ts in group['ts']:
             hour = ts.hour
-            if hour >= night_start or hour < night_end:
+            if night_start <= night_end:
+                at_night = night_start <= hour < night_end
+            else:
+                at_night = hour >= night_start or hour < night_end
+            if at_night:
                 night_minutes += 1  # Assuming 1 minute per event for simplicity
         return night_minutes
 
@@ -48,6 +111,42 @@ def compute_trip_features(events: pd.DataFrame) -> pd.DataFrame:
 
     return trip_features
 
+@instrumented('streaming.compute_trip_features_vectorized', rows_from='events')
+def compute_trip_features_vectorized(events: pd.DataFrame, night_weighting: str = 'elapsed',
+                                     max_gap_s: float = 300.0) -> pd.DataFrame:
+    """Single-pass, vectorized equivalent of :func:`compute_trip_features`.
+
+    Runs the compiled feature manifest plan for TRIP_FEATURE_SOURCES: trips are
+    factorized into integer codes, events are sorted once by (trip, ts), and
+    every aggregate is computed with ``ufunc.reduceat`` over the contiguous trip
+    segments, so no Python code runs per group. Thresholds and the night window
+    are the manifest's. ``events`` is not modified.
+
+    Args:
+        events: DataFrame with at least ['trip_id','speed_kmh','accel_y_m_s2'];
+                'ts' and 'sample_rate_hz' are used for night driving when present.
+        night_weighting: 'elapsed' weights night events by real elapsed time
+                (``sample_rate_hz`` or ts deltas); 'event' counts one minute per
+                event, matching :func:`compute_trip_features` exactly.
+        max_gap_s: Upper bound on the seconds a single event can represent.
+
+    Returns:
+        DataFrame with the same columns as :func:`compute_trip_features`, one row
+        per trip sorted by trip_id. night_driving_minutes is int for 'event'
+        weighting and float for 'elapsed'.
+    """
+    if night_weighting not in ('elapsed', 'event'):
+        raise ValueError(f"Unknown night_weighting: {night_weighting}")
+
+    plan = _trip_plan(night_weighting)
+    optional = {col: np.nan for col in ('ts', 'sample_rate_hz')
+                if col in plan.input_columns and col not in events.columns}
+    if optional:
+        events = events.assign(**optional)
+    features = plan.compute(events, max_gap_s=max_gap_s)
+    features.columns = ['trip_id'] + list(TRIP_FEATURE_SOURCES)
+    return features[TRIP_FEATURE_COLUMNS]
+
 # Example usage
 if __name__ == "__main__":
     # Sample data
@@ -0,0 +1,374 @@
+"""Incremental trip aggregation for micro-batch streaming."""
+
+import json
+import os
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.features.feature_compiler import (PARTIAL_IDENTITY, PARTIAL_MERGE, TripFeaturePlan, compile_manifest,
+                                           parse_event_ts)
+from src.streaming.telemetry_transform import TRIP_FEATURE_COLUMNS, TRIP_FEATURE_SOURCES
+from src.utils.instrumentation import instrumented
+
+SNAPSHOT_VERSION = 2
+
+# Followed in the output by the plan's feature columns (f_trip_*)
+FINALIZED_COLUMNS = TRIP_FEATURE_COLUMNS + [
+    'device_id', 'policy_id', 'trip_start_ts', 'trip_end_ts', 'trip_distance_km', 'close_reason'
+]
+
+# Telemetry columns read besides the plan's inputs
+_META_COLUMNS = ['ts', 'event_type', 'device_id', 'policy_id', 'odometer_km']
+
+_NS_PER_S = 1_000_000_000
+_NAT = np.iinfo(np.int64).min
+
+
+class _TripState:
+    """Running aggregates for one in-flight trip."""
+
+    __slots__ = ('device_id', 'policy_id', 'partials', 'first_ts', 'last_ts', 'first_odo', 'last_odo', 'tail')
+
+    def __init__(self, device_id=None, policy_id=None, partials=None):
+        self.device_id = device_id
+        self.policy_id = policy_id
+        # Plan partial reductions, in TripFeaturePlan.reduction_keys order
+        self.partials = partials
+        self.first_ts = None
+        self.last_ts = None
+        self.first_odo = None
+        self.last_odo = None
+        # Last event seen, not folded yet: its duration is the gap to the next event
+        self.tail = None
+
+    def to_list(self) -> List[Any]:
+        return [getattr(self, name) for name in self.__slots__]
+
+    @classmethod
+    def from_list(cls, values: List[Any]) -> '_TripState':
+        state = cls()
+        for name, value in zip(cls.__slots__, values):
+            setattr(state, name, value)
+        return state
+
+
+class TripAggregator:
+    """Keeps compact per-trip running state and emits trip features as trips close.
+
+    Trip features come from the compiled feature manifest: each batch is run
+    through the plan's segment reductions and the per-trip partials (counts,
+    sums, max/min) are merged into at most one state object per trip it
+    touches, so each call to :meth:`update` is O(batch). When the plan has
+    order-dependent inputs (e.g. event durations from ts gaps), the last event
+    of each open trip is held back and folded with the next batch, so the
+    result matches running the plan over the whole trip at once.
+
+    A trip is finalized when an ``end_trip`` event arrives, when no event has
+    been seen for ``idle_timeout_s`` behind the event-time watermark, or when it
+    is evicted to keep at most ``max_open_trips`` in memory (least recently
+    updated first).
+
+    Args:
+        idle_timeout_s: Seconds without events, relative to the watermark, after
+            which a trip is closed.
+        max_open_trips: Upper bound on in-flight trips held in memory.
+        max_gap_s: Upper bound on the seconds a single event can represent when
+            durations fall back to ts deltas.
+        plan: Trip feature plan; the compiled manifest when omitted.
+    """
+
+    def __init__(self, idle_timeout_s: float = 1800.0, max_open_trips: int = 100_000,
+                 max_gap_s: float = 300.0, plan: Optional[TripFeaturePlan] = None):
+        if max_open_trips < 1:
+            raise ValueError("max_open_trips must be >= 1")
+        self.idle_timeout_s = idle_timeout_s
+        self.max_open_trips = max_open_trips
+        self.max_gap_s = max_gap_s
+        self.plan = plan if plan is not None else compile_manifest()
+        self.watermark_ns: Optional[int] = None
+        self.source_offsets: Dict[str, Any] = {}
+        self._trips: 'OrderedDict[str, _TripState]' = OrderedDict()
+        self._columns = list(dict.fromkeys(self.plan.input_columns + _META_COLUMNS))
+        self._identity = [PARTIAL_IDENTITY[kind] for kind, _, _ in self.plan.reduction_keys]
+
+    def __len__(self) -> int:
+        return len(self._trips)
+
+    @property
+    def output_columns(self) -> List[str]:
+        return FINALIZED_COLUMNS + self.plan.feature_columns
+
+    @instrumented('streaming.trip_aggregator_update', rows_from='events')
+    def update(self, events: pd.DataFrame) -> pd.DataFrame:
+        """Fold a micro-batch of telemetry events into the running state.
+
+        Args:
+            events: DataFrame of telemetry events; needs 'trip_id' and 'ts'.
+                    Telemetry columns the feature plan reads count as missing
+                    values when absent.
+
+        Returns:
+            DataFrame of trips finalized by this batch (``output_columns``).
+        """
+        closed: List[Dict[str, Any]] = []
+        if len(events):
+            self._fold(events, closed)
+        self._expire_idle(closed)
+        self._evict_overflow(closed)
+        return self._to_frame(closed)
+
+    def flush(self) -> pd.DataFrame:
+        """Finalize every in-flight trip, e.g. on shutdown."""
+        closed: List[Dict[str, Any]] = []
+        popped = list(self._trips.items())
+        self._trips.clear()
+        self._close(popped, 'flushed', closed)
+        return self._to_frame(closed)
+
+    def _tail_frame(self, tails: List[Tuple[Any, ...]]) -> pd.DataFrame:
+        frame = pd.DataFrame.from_records(tails, columns=self._columns)
+        frame['ts'] = pd.to_datetime(frame['ts'].to_numpy(dtype=np.int64), utc=True)
+        return frame
+
+    def _merge(self, states: List[_TripState], partials: Dict[Tuple, np.ndarray], rows: np.ndarray):
+        """Merge the partial reductions at ``rows`` into ``states``."""
+        keys = self.plan.reduction_keys
+        current = np.array([state.partials for state in states], dtype=np.float64).reshape(len(states), len(keys))
+        for j, key in enumerate(keys):
+            current[:, j] = PARTIAL_MERGE[key[0]](current[:, j], partials[key][rows])
+        for state, merged in zip(states, current.tolist()):
+            state.partials = merged
+
+    def _fold(self, events: pd.DataFrame, closed: List[Dict[str, Any]]):
+        missing = [col for col in ('trip_id', 'ts') if col not in events.columns]
+        if missing:
+            raise ValueError(f"Events are missing columns: {missing}")
+        frame = events.reindex(columns=self._columns)
+        frame['ts'] = parse_event_ts(frame['ts'])
+
+        # Events held back from earlier batches go through the plan again, first
+        held = []
+        for trip_id in pd.unique(frame['trip_id']):
+            state = self._trips.get(trip_id)
+            if state is not None and state.tail is not None:
+                held.append(state.tail)
+                state.tail = None
+        if held:
+            frame = pd.concat([self._tail_frame(held), frame], ignore_index=True)
+
+        prepared = self.plan.prepare(frame, self.max_gap_s, time_order=True)
+        starts = prepared.starts
+        if not len(starts):
+            return
+        rows = prepared.rows
+        n = len(rows)
+        ends = np.r_[starts[1:], n] - 1
+
+        ts_ns = prepared.values['ts']
+        valid_ts = ts_ns != _NAT
+        odo = frame['odometer_km'].to_numpy(dtype=np.float64, na_value=np.nan)[rows]
+        is_end = frame['event_type'].to_numpy(dtype=object)[rows] == 'end_trip'
+        has_end = np.logical_or.reduceat(is_end, starts)
+
+        # Until a trip closes, its last event waits for its successor's ts
+        hold = ~has_end if self.plan.ordered else np.zeros(len(starts), dtype=bool)
+        fold = np.ones(n, dtype=bool)
+        fold[ends[hold]] = False
+        partials = self.plan.reduce(prepared, fold)
+        tails = frame.take(rows[ends[hold]])
+        tails['ts'] = ts_ns[ends[hold]]
+        tails = iter(tails.itertuples(index=False, name=None))
+
+        has_ts = np.logical_or.reduceat(valid_ts, starts)
+        first_ts = np.minimum.reduceat(np.where(valid_ts, ts_ns, np.iinfo(np.int64).max), starts)
+        last_ts = np.maximum.reduceat(ts_ns, starts)
+
+        positions = np.arange(n)
+        odo_valid = ~np.isnan(odo)
+        first_odo_idx = np.minimum.reduceat(np.where(odo_valid, positions, n), starts)
+        last_odo_idx = np.maximum.reduceat(np.where(odo_valid, positions, -1), starts)
+
+        device_ids = self._first_values(frame, 'device_id', rows, starts)
+        policy_ids = self._first_values(frame, 'policy_id', rows, starts)
+
+        if has_ts.any():
+            batch_max = int(last_ts.max())
+            self.watermark_ns = batch_max if self.watermark_ns is None else max(self.watermark_ns, batch_max)
+
+        states = []
+        for seg, trip_id in enumerate(prepared.trip_ids):
+            state = self._trips.get(trip_id)
+            if state is None:
+                state = _TripState(device_ids[seg], policy_ids[seg], list(self._identity))
+                self._trips[trip_id] = state
+            else:
+                self._trips.move_to_end(trip_id)
+            states.append(state)
+        self._merge(states, partials, np.arange(len(states)))
+
+        for seg, (trip_id, state) in enumerate(zip(prepared.trip_ids, states)):
+            if has_ts[seg]:
+                seg_first, seg_last = int(first_ts[seg]), int(last_ts[seg])
+                state.first_ts = seg_first if state.first_ts is None else min(state.first_ts, seg_first)
+                state.last_ts = seg_last if state.last_ts is None else max(state.last_ts, seg_last)
+            if first_odo_idx[seg] < n and state.first_odo is None:
+                state.first_odo = float(odo[first_odo_idx[seg]])
+            if last_odo_idx[seg] >= 0:
+                state.last_odo = float(odo[last_odo_idx[seg]])
+            if state.device_id is None:
+                state.device_id = device_ids[seg]
+            if state.policy_id is None:
+                state.policy_id = policy_ids[seg]
+            if hold[seg]:
+                state.tail = next(tails)
+
+            if has_end[seg]:
+                del self._trips[trip_id]
+                closed.append(self._finalize(trip_id, state, 'end_trip'))
+
+    @staticmethod
+    def _first_values(frame: pd.DataFrame, name: str, rows: np.ndarray,
+                      starts: np.ndarray) -> List[Optional[str]]:
+        values = frame[name].to_numpy(dtype=object)[rows][starts]
+        return [None if pd.isna(v) else v for v in values]
+
+    def _close(self, popped: List[Tuple[str, _TripState]], reason: str, closed: List[Dict[str, Any]]):
+        """Fold the held-back last events of ``popped`` trips and finalize them."""
+        held = [state for _, state in popped if state.tail is not None]
+        if held:
+            prepared = self.plan.prepare(self._tail_frame([state.tail for state in held]), self.max_gap_s,
+                                         time_order=True)
+            segment = {trip_id: seg for seg, trip_id in enumerate(prepared.trip_ids)}
+            rows = np.array([segment[state.tail[0]] for state in held], dtype=np.int64)
+            self._merge(held, self.plan.reduce(prepared), rows)
+            for state in held:
+                state.tail = None
+        closed.extend(self._finalize(trip_id, state, reason) for trip_id, state in popped)
+
+    def _expire_idle(self, closed: List[Dict[str, Any]]):
+        if self.watermark_ns is None:
+            return
+        cutoff = self.watermark_ns - int(self.idle_timeout_s * _NS_PER_S)
+        # Least recently updated trips sit at the front; streams arrive roughly in
+        # event-time order, so the scan stops at the first trip that is still live.
+        popped = []
+        while self._trips:
+            trip_id, state = next(iter(self._trips.items()))
+            if state.last_ts is not None and state.last_ts >= cutoff:
+                break
+            popped.append(self._trips.popitem(last=False))
+        self._close(popped, 'idle', closed)
+
+    def _evict_overflow(self, closed: List[Dict[str, Any]]):
+        popped = []
+        while len(self._trips) > self.max_open_trips:
+            popped.append(self._trips.popitem(last=False))
+        self._close(popped, 'evicted', closed)
+
+    @staticmethod
+    def _finalize(trip_id: str, state: _TripState, reason: str) -> Dict[str, Any]:
+        distance = None
+        if state.first_odo is not None and state.last_odo is not None:
+            distance = max(state.last_odo - state.first_odo, 0.0)
+        return {
+            'trip_id': trip_id,
+            'device_id': state.device_id,
+            'policy_id': state.policy_id,
+            'trip_start_ts': pd.Timestamp(state.first_ts, tz='UTC') if state.first_ts is not None else pd.NaT,
+            'trip_end_ts': pd.Timestamp(state.last_ts, tz='UTC') if state.last_ts is not None else pd.NaT,
+            'trip_distance_km': distance,
+            'close_reason': reason,
+            'partials': state.partials,
+        }
+
+    def _to_frame(self, closed: List[Dict[str, Any]]) -> pd.DataFrame:
+        keys = self.plan.reduction_keys
+        partials = np.array([trip.pop('partials') for trip in closed], dtype=np.float64).reshape(len(closed), len(keys))
+        features = self.plan.finish({key: partials[:, j] for j, key in enumerate(keys)})
+        frame = pd.DataFrame(closed, columns=FINALIZED_COLUMNS)
+        for column, name in TRIP_FEATURE_SOURCES.items():
+            frame[column] = features[name] if name in features else np.nan
+        for name, values in features.items():
+            frame[name] = values
+        return frame
+
+    def snapshot(self, source_offsets: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Capture the in-flight state as a JSON-serializable dict.
+
+        Args:
+            source_offsets: Consumer offsets the state reflects (e.g. Kafka
+                            partition -> offset), stored so a restarted worker
+                            can seek instead of replaying the topic.
+
+        Returns:
+            Snapshot dict accepted by :meth:`restore`.
+        """
+        if source_offsets is not None:
+            self.source_offsets = dict(source_offsets)
+        return {
+            'version': SNAPSHOT_VERSION,
+            'config': {
+                'idle_timeout_s': self.idle_timeout_s,
+                'max_open_trips': self.max_open_trips,
+                'max_gap_s': self.max_gap_s,
+            },
+            'watermark_ns': self.watermark_ns,
+            'source_offsets': self.source_offsets,
+            'reductions': [list(key) for key in self.plan.reduction_keys],
+            'columns': self._columns,
+            'fields': list(_TripState.__slots__),
+            'trips': [[trip_id] + state.to_list() for trip_id, state in self._trips.items()],
+        }
+
+    @classmethod
+    def restore(cls, snapshot: Dict[str, Any], plan: Optional[TripFeaturePlan] = None) -> 'TripAggregator':
+        """Rebuild an aggregator from :meth:`snapshot` output.
+
+        ``plan`` (the compiled manifest when omitted) must need the same partial
+        reductions and columns as the plan the snapshot was taken with.
+        """
+        if snapshot.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version: {snapshot.get('version')}")
+        if snapshot['fields'] != list(_TripState.__slots__):
+            raise ValueError("Snapshot fields do not match this TripAggregator")
+        aggregator = cls(**snapshot['config'], plan=plan)
+        if (snapshot['reductions'] != [list(key) for key in aggregator.plan.reduction_keys]
+                or snapshot['columns'] != aggregator._columns):
+            raise ValueError("Snapshot was taken with a different feature plan")
+        aggregator.watermark_ns = snapshot['watermark_ns']
+        aggregator.source_offsets = dict(snapshot['source_offsets'])
+        for row in snapshot['trips']:
+            state = aggregator._trips[row[0]] = _TripState.from_list(row[1:])
+            if state.tail is not None:
+                state.tail = tuple(state.tail)
+        return aggregator
+
+    def save_snapshot(self, path: str, source_offsets: Optional[Dict[str, Any]] = None):
+        """Atomically write a snapshot to ``path`` as JSON."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.snapshot(source_offsets), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load_snapshot(cls, path: str, plan: Optional[TripFeaturePlan] = None) -> 'TripAggregator':
+        """Restore an aggregator from a file written by :meth:`save_snapshot`."""
+        with open(path, 'r') as f:
+            return cls.restore(json.load(f), plan=plan)
+
+# Example usage
+if __name__ == "__main__":
+    aggregator = TripAggregator(idle_timeout_s=600)
+    batch = pd.DataFrame({
+        'trip_id': ['trip1', 'trip1', 'trip2', 'trip1'],
+        'ts': ['2025-11-09T23:00:00Z', '2025-11-09T23:00:10Z', '2025-11-09T23:00:10Z', '2025-11-09T23:00:20Z'],
+        'event_type': ['start_trip', 'sample', 'start_trip', 'end_trip'],
+        'speed_kmh': [50.0, 60.0, 45.0, 55.0],
+        'accel_y_m_s2': [0.0, -3.0, -1.0, 1.0],
+        'sample_rate_hz': [0.1, 0.1, 0.1, 0.1],
+    })
+    print(aggregator.update(batch))
+    print(f"Open trips: {len(aggregator)}")
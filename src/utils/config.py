@@ -1,15 +1,32 @@
-"""Configuration management."""
+"""Configuration management.
+
+The config is read on the first :func:`get_config` call, not at import, and
+memoized. ``config/{CONFIG_ENV}.yml`` is resolved relative to the repository
+(set ``CONFIG_DIR`` to use another directory), so entry points work from any
+working directory.
+"""
 
 import os
-import yaml
-from typing import Dict, Any
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+CONFIG_DIR = Path(__file__).resolve().parents[2] / 'config'
+
+_config: Optional[Dict[str, Any]] = None
+_config_lock = threading.Lock()
+
+def config_path(env: Optional[str] = None) -> Path:
+    """Path of the config file for ``env`` (default: CONFIG_ENV, else 'local')."""
+    env = env or os.getenv('CONFIG_ENV', 'local')
+    return Path(os.getenv('CONFIG_DIR') or CONFIG_DIR) / f'{env}.yml'
 
 def load_config() -> Dict[str, Any]:
     """Load configuration based on CONFIG_ENV."""
-    env = os.getenv('CONFIG_ENV', 'local')
-    config_file = f'config/{env}.yml'
+    import yaml
 
-    if not os.path.exists(config_file):
+    config_file = config_path()
+    if not config_file.exists():
         raise FileNotFoundError(f"Config file not found: {config_file}")
 
     with open(config_file, 'r') as f:
@@ -24,8 +41,22 @@ def load_config() -> Dict[str, Any]:
     return config
 
 def get_config() -> Dict[str, Any]:
-    """Get the global configuration."""
-    return CONFIG
-
-# Global config
-CONFIG = load_config()
+    """Get the global configuration, loading it on first use."""
+    global _config
+    if _config is None:
+        with _config_lock:
+            if _config is None:
+                _config = load_config()
+    return _config
+
+def reset_config():
+    """Forget the loaded config; the next get_config() reads it again."""
+    global _config
+    with _config_lock:
+        _config = None
+
+def __getattr__(name: str):
+    # Global config, kept as a lazily loaded attribute for existing imports
+    if name == 'CONFIG':
+        return get_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
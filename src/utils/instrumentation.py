@@ -0,0 +1,309 @@
+"""Lightweight per-stage instrumentation with Prometheus text exposition.
+
+Wrap a stage with :func:`instrumented` (decorator) or :func:`stage` (context
+manager) to record a latency histogram, a row count and an error count per
+stage name. Instrumentation is off by default and a disabled stage costs one
+flag check; turn it on with :func:`enable` or ``TELEMATICS_INSTRUMENTATION=1``.
+
+Opt-in profiling (``enable(profile_slowest=N)`` or
+``TELEMATICS_PROFILE_SLOWEST=N``) runs a sampled fraction of the outermost
+instrumented calls (``profile_rate``, ``TELEMATICS_PROFILE_RATE``) under
+cProfile and keeps the slowest N of those; the other calls pay one random
+draw. :func:`dump_profiles` writes them as ``.prof`` files for snakeviz,
+flameprof or ``python -m pstats``.
+"""
+
+import bisect
+import cProfile
+import functools
+import heapq
+import inspect
+import itertools
+import os
+import pstats
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+METRIC_PREFIX = 'telematics'
+# Latency histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Fraction of outermost calls profiled when profiling is on
+DEFAULT_PROFILE_RATE = 0.01
+
+
+class StageMetrics:
+    """Latency histogram, call, row and error counters for one stage."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, rows: int = 0, error: bool = False):
+        with self._lock:
+            self.bucket_counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            self.count += 1
+            self.seconds += seconds
+            self.rows += rows
+            self.errors += int(error)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'count': self.count, 'seconds': self.seconds, 'rows': self.rows, 'errors': self.errors,
+                    'bucket_counts': list(self.bucket_counts)}
+
+
+class _Profiles:
+    """The slowest N profiled calls, kept as (seconds, sequence, stage, cProfile.Profile)."""
+
+    def __init__(self, keep: int):
+        self.keep = keep
+        self._heap: List[Tuple[float, int, str, cProfile.Profile]] = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def offer(self, seconds: float, stage_name: str, profile: cProfile.Profile):
+        entry = (seconds, next(self._sequence), stage_name, profile)
+        with self._lock:
+            if len(self._heap) < self.keep:
+                heapq.heappush(self._heap, entry)
+            elif seconds > self._heap[0][0]:
+                heapq.heapreplace(self._heap, entry)
+
+    def slowest(self) -> List[Tuple[float, str, cProfile.Profile]]:
+        with self._lock:
+            entries = sorted(self._heap, reverse=True)
+        return [(seconds, stage_name, profile) for seconds, _, stage_name, profile in entries]
+
+
+class _State:
+    enabled = False
+    profiles: Optional[_Profiles] = None
+    profile_stages: Optional[frozenset] = None
+    profile_rate = DEFAULT_PROFILE_RATE
+
+
+_state = _State()
+_registry: Dict[str, StageMetrics] = {}
+_registry_lock = threading.Lock()
+_collectors: List[Callable[[], Iterable[str]]] = []
+_local = threading.local()
+
+def enable(profile_slowest: int = 0, profile_stages: Optional[Iterable[str]] = None,
+           profile_rate: float = DEFAULT_PROFILE_RATE):
+    """Turn instrumentation on.
+
+    Args:
+        profile_slowest: Keep cProfile data for the slowest N profiled calls
+                         (0 disables profiling).
+        profile_stages: Only profile these stages; all stages when omitted.
+        profile_rate: Fraction of outermost instrumented calls to profile;
+                      1.0 profiles every call.
+    """
+    if not 0.0 <= profile_rate <= 1.0:
+        raise ValueError(f"profile_rate must be in [0, 1], got {profile_rate}")
+    _state.profiles = _Profiles(profile_slowest) if profile_slowest > 0 else None
+    _state.profile_stages = frozenset(profile_stages) if profile_stages is not None else None
+    _state.profile_rate = profile_rate
+    _state.enabled = True
+
+def disable():
+    _state.enabled = False
+    _state.profiles = None
+
+def is_enabled() -> bool:
+    return _state.enabled
+
+def get_stage(name: str) -> StageMetrics:
+    metrics = _registry.get(name)
+    if metrics is None:
+        with _registry_lock:
+            metrics = _registry.setdefault(name, StageMetrics(name))
+    return metrics
+
+def reset():
+    """Forget all recorded stage metrics and profiles."""
+    with _registry_lock:
+        _registry.clear()
+    if _state.profiles is not None:
+        _state.profiles = _Profiles(_state.profiles.keep)
+
+def register_collector(collector: Callable[[], Iterable[str]]):
+    """Add a callable returning extra Prometheus text lines (e.g. a component's counters)."""
+    _collectors.append(collector)
+
+def unregister_collector(collector: Callable[[], Iterable[str]]):
+    if collector in _collectors:
+        _collectors.remove(collector)
+
+
+class _NoopStage:
+    rows = 0
+
+    def __enter__(self) -> '_NoopStage':
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopStage()
+
+
+class _Stage:
+    """Timing context for one stage call; set ``rows`` inside the block."""
+
+    __slots__ = ('name', 'rows', '_start', '_profile')
+
+    def __init__(self, name: str, rows: int):
+        self.name = name
+        self.rows = rows
+        self._profile = None
+
+    def __enter__(self) -> '_Stage':
+        profiles = _state.profiles
+        if (profiles is not None and not getattr(_local, 'profiling', False)
+                and (_state.profile_stages is None or self.name in _state.profile_stages)
+                and random.random() < _state.profile_rate):
+            # Only the outermost stage of a thread is profiled; nested ones are inside it
+            _local.profiling = True
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._start
+        if self._profile is not None:
+            self._profile.disable()
+            _local.profiling = False
+            profiles = _state.profiles
+            if profiles is not None:
+                profiles.offer(seconds, self.name, self._profile)
+        get_stage(self.name).observe(seconds, self.rows, exc_type is not None)
+        return False
+
+def stage(name: str, rows: int = 0):
+    """Context manager recording one call of stage ``name``.
+
+    Example::
+
+        with stage('ingestion.read') as s:
+            frame = read()
+            s.rows = len(frame)
+    """
+    if not _state.enabled:
+        return _NOOP
+    return _Stage(name, rows)
+
+def instrumented(name: str, rows_from: Optional[str] = None):
+    """Decorator recording every call of the function as stage ``name``.
+
+    Args:
+        name: Stage name, e.g. 'serving.score_batch'.
+        rows_from: Parameter whose ``len()`` is the call's row count.
+    """
+    def decorator(fn: Callable) -> Callable:
+        position = None
+        if rows_from is not None:
+            position = list(inspect.signature(fn).parameters).index(rows_from)
+
+        def count_rows(args, kwargs) -> int:
+            if position is None:
+                return 0
+            value = args[position] if position < len(args) else kwargs.get(rows_from)
+            try:
+                return len(value)
+            except TypeError:
+                return 0
+
+        state = _state
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            # Disabled path: one attribute check and the call (about 0.2 µs)
+            if state.enabled:
+                with _Stage(name, count_rows(args, kwargs)):
+                    return fn(*args, **kwargs)
+            return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def render_prometheus() -> str:
+    """All stage metrics and registered collectors in Prometheus text format (0.0.4)."""
+    with _registry_lock:
+        stages = sorted(_registry.items())
+    snapshots = [(name, metrics.snapshot()) for name, metrics in stages]
+
+    duration = f"{METRIC_PREFIX}_stage_duration_seconds"
+    lines = [f"# HELP {duration} Stage latency in seconds.", f"# TYPE {duration} histogram"]
+    for name, snap in snapshots:
+        label = f'stage="{_escape(name)}"'
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + (float('inf'),), snap['bucket_counts']):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f'{duration}_bucket{{{label},le="{le}"}} {cumulative}')
+        lines.append(f"{duration}_sum{{{label}}} {snap['seconds']!r}")
+        lines.append(f"{duration}_count{{{label}}} {snap['count']}")
+
+    for metric, key, help_text in (('stage_rows_total', 'rows', 'Rows processed by the stage.'),
+                                   ('stage_errors_total', 'errors', 'Stage calls that raised.')):
+        full = f"{METRIC_PREFIX}_{metric}"
+        lines.append(f"# HELP {full} {help_text}")
+        lines.append(f"# TYPE {full} counter")
+        lines.extend(f'{full}{{stage="{_escape(name)}"}} {snap[key]}' for name, snap in snapshots)
+
+    for collector in list(_collectors):
+        lines.extend(collector())
+    return '\n'.join(lines) + '\n'
+
+def prometheus_lines(name: str, metric_type: str, help_text: str,
+                     samples: Iterable[Tuple[Dict[str, str], float]]) -> List[str]:
+    """Format one metric family for a collector: samples are (labels, value)."""
+    full = f"{METRIC_PREFIX}_{name}"
+    lines = [f"# HELP {full} {help_text}", f"# TYPE {full} {metric_type}"]
+    for labels, value in samples:
+        label_text = ','.join(f'{key}="{_escape(str(val))}"' for key, val in labels.items())
+        lines.append(f"{full}{{{label_text}}} {_format_value(value)}" if label_text
+                     else f"{full} {_format_value(value)}")
+    return lines
+
+def dump_profiles(directory: str) -> List[str]:
+    """Write the slowest profiled calls as ``.prof`` files plus a text summary each.
+
+    Returns:
+        Paths of the ``.prof`` files, slowest first.
+    """
+    profiles = _state.profiles
+    if profiles is None:
+        return []
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for rank, (seconds, stage_name, profile) in enumerate(profiles.slowest(), 1):
+        base = os.path.join(directory, f"{rank:03d}_{stage_name.replace('/', '_')}_{seconds * 1e3:.1f}ms")
+        profile.dump_stats(f"{base}.prof")
+        with open(f"{base}.txt", 'w') as f:
+            stats = pstats.Stats(profile, stream=f)
+            stats.sort_stats('cumulative').print_stats(40)
+        paths.append(f"{base}.prof")
+    return paths
+
+if os.getenv('TELEMATICS_INSTRUMENTATION', '').lower() in ('1', 'true', 'yes'):
+    enable(profile_slowest=int(os.getenv('TELEMATICS_PROFILE_SLOWEST', '0') or 0),
+           profile_rate=float(os.getenv('TELEMATICS_PROFILE_RATE', '') or DEFAULT_PROFILE_RATE))
@@ -1,8 +1,11 @@
 """Schema validation utilities for telemetry events."""
 
 import json
-import jsonschema
-from typing import Dict, Any
+import threading
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, List, Sequence, Tuple, Union
+from src.utils.instrumentation import instrumented
 
 # JSON Schema for telemetry_event
 TELEMETRY_SCHEMA = {
@@ -34,6 +37,50 @@ TELEMETRY_SCHEMA = {
     "required": ["device_id", "trip_id", "ts", "event_type", "provider", "location_precision"]
 }
 
+# Batch error codes, OR-ed together per row
+ERR_MISSING = 1      # required field absent
+ERR_NULL = 2         # null in a non-nullable field
+ERR_TYPE = 4         # value of the wrong JSON type
+ERR_ENUM = 8         # value outside the field's enum
+ERR_NOT_OBJECT = 16  # record is not a JSON object
+
+ERROR_NAMES = {
+    ERR_MISSING: 'missing',
+    ERR_NULL: 'null',
+    ERR_TYPE: 'type',
+    ERR_ENUM: 'enum',
+    ERR_NOT_OBJECT: 'not_object',
+}
+
+# infer_dtype results that satisfy each JSON type without a per-value check
+_INFERRED_OK = {
+    'string': {'string', 'empty'},
+    'number': {'floating', 'integer', 'mixed-integer-float', 'empty'},
+    'integer': {'integer', 'empty'},
+}
+
+_validator = None
+_best_match = None
+_validator_lock = threading.Lock()
+
+def get_validator():
+    """The jsonschema validator for TELEMETRY_SCHEMA, checked and built once.
+
+    jsonschema is imported here, on first use; the batch validator does not need it.
+    """
+    global _validator, _best_match
+    if _validator is None:
+        with _validator_lock:
+            if _validator is None:
+                import jsonschema
+
+                cls = jsonschema.validators.validator_for(TELEMETRY_SCHEMA)
+                cls.check_schema(TELEMETRY_SCHEMA)
+                _best_match = jsonschema.exceptions.best_match
+                _validator = cls(TELEMETRY_SCHEMA)
+    return _validator
+
+@instrumented('schema.validate_event')
 def validate_telemetry_event(event: Dict[str, Any]) -> bool:
     """Validate a telemetry event against the schema.
 
@@ -43,8 +90,165 @@ def validate_telemetry_event(event: Dict[str, Any]) -> bool:
     Returns:
         bool: True if valid, raises ValidationError if invalid.
     """
-    try:
-        jsonschema.validate(instance=event, schema=TELEMETRY_SCHEMA)
-        return True
-    except jsonschema.ValidationError as e:
-        raise ValueError(f"Invalid telemetry event: {e.message}") from e
+    validator = get_validator()
+    error = _best_match(validator.iter_errors(event))
+    if error is not None:
+        raise ValueError(f"Invalid telemetry event: {error.message}")
+    return True
+
+class _FieldRule:
+    """Checks for one schema property, precomputed from TELEMETRY_SCHEMA."""
+
+    def __init__(self, name: str, spec: Dict[str, Any], required: bool):
+        types = spec.get('type', [])
+        types = [types] if isinstance(types, str) else list(types)
+        self.name = name
+        self.required = required
+        self.nullable = 'null' in types
+        self.json_type = next((t for t in types if t != 'null'), None)
+        self.enum = spec.get('enum')
+
+def _compile_rules(schema: Dict[str, Any]) -> List[_FieldRule]:
+    required = set(schema.get('required', []))
+    return [_FieldRule(name, spec, name in required) for name, spec in schema['properties'].items()]
+
+_RULES = _compile_rules(TELEMETRY_SCHEMA)
+
+def _is_json_type(value: Any, json_type: str) -> bool:
+    if json_type == 'string':
+        return isinstance(value, str)
+    if isinstance(value, bool):
+        return False
+    if json_type == 'integer':
+        return isinstance(value, int) or (isinstance(value, float) and value.is_integer())
+    return isinstance(value, (int, float))
+
+def _type_errors(col: pd.Series, null: np.ndarray, json_type: str) -> np.ndarray:
+    """Mask of non-null values in ``col`` that are not of ``json_type``."""
+    dtype = col.dtype
+    if json_type == 'string' and pd.api.types.is_datetime64_any_dtype(dtype):
+        # Already parsed from an ISO-8601 string by the reader
+        return np.zeros(len(col), dtype=bool)
+    if json_type in ('number', 'integer') and pd.api.types.is_numeric_dtype(dtype) \
+            and not pd.api.types.is_bool_dtype(dtype):
+        if json_type == 'number' or pd.api.types.is_integer_dtype(dtype):
+            return np.zeros(len(col), dtype=bool)
+        values = col.to_numpy(dtype=np.float64, na_value=np.nan)
+        return ~null & (np.mod(values, 1) != 0)
+    if pd.api.types.infer_dtype(col, skipna=True) in _INFERRED_OK[json_type]:
+        return np.zeros(len(col), dtype=bool)
+
+    # Mixed column: check only the values that are present
+    bad = np.zeros(len(col), dtype=bool)
+    values = col.to_numpy(dtype=object)
+    for i in np.flatnonzero(~null):
+        bad[i] = not _is_json_type(values[i], json_type)
+    return bad
+
+class BatchValidationResult:
+    """Per-row outcome of :func:`validate_telemetry_batch`.
+
+    Attributes:
+        valid: Boolean mask of rows that satisfy the schema.
+        error_codes: uint8 OR of the ``ERR_*`` codes found on each row.
+        field_errors: uint32 bitmask per row; bit ``i`` is set when ``fields[i]`` failed.
+        fields: Schema properties in bit order.
+    """
+
+    def __init__(self, error_codes: np.ndarray, field_errors: np.ndarray, fields: List[str]):
+        self.error_codes = error_codes
+        self.field_errors = field_errors
+        self.fields = fields
+        self.valid = error_codes == 0
+
+    @property
+    def n_invalid(self) -> int:
+        return int((~self.valid).sum())
+
+    def errors_for(self, row: int) -> List[str]:
+        """Readable error kinds and failing fields for one row."""
+        code = int(self.error_codes[row])
+        kinds = [name for bit, name in ERROR_NAMES.items() if code & bit]
+        mask = int(self.field_errors[row])
+        fields = [field for i, field in enumerate(self.fields) if mask >> i & 1]
+        return kinds + fields
+
+    def partition(self, batch: Union[pd.DataFrame, Sequence[Any]]) -> Tuple[Any, Any]:
+        """Split ``batch`` into (valid rows, invalid rows), e.g. for a dead-letter output."""
+        if isinstance(batch, pd.DataFrame):
+            return batch[self.valid], batch[~self.valid]
+        good = [record for record, ok in zip(batch, self.valid) if ok]
+        bad = [record for record, ok in zip(batch, self.valid) if not ok]
+        return good, bad
+
+@instrumented('schema.validate_batch', rows_from='batch')
+def validate_telemetry_batch(batch: Union[pd.DataFrame, Sequence[Any]]) -> BatchValidationResult:
+    """Validate a chunk of telemetry events column by column without raising.
+
+    Checks required fields, nullability, JSON types and enums (the constraints
+    of TELEMETRY_SCHEMA) with one vectorized pass per field.
+
+    Args:
+        batch: A list of decoded event dicts, or a DataFrame with one column
+               per field (e.g. from ``telemetry_reader``).
+
+    Returns:
+        BatchValidationResult with a validity mask and per-row error codes.
+    """
+    n_rows = len(batch)
+    error_codes = np.zeros(n_rows, dtype=np.uint8)
+    field_errors = np.zeros(n_rows, dtype=np.uint32)
+
+    records = None
+    is_object = None
+    if not isinstance(batch, pd.DataFrame):
+        records = batch
+        is_object = np.fromiter((isinstance(r, dict) for r in records), dtype=bool, count=n_rows)
+        if not is_object.all():
+            records = [r if ok else {} for r, ok in zip(records, is_object)]
+
+    for bit, rule in enumerate(_RULES):
+        failed = np.zeros(n_rows, dtype=bool)
+        if records is not None:
+            col = pd.Series([r.get(rule.name) for r in records], dtype=object)
+        elif rule.name in batch.columns:
+            col = batch[rule.name]
+        else:
+            col = None
+
+        if col is None:
+            if rule.required:
+                error_codes |= ERR_MISSING
+                failed[:] = True
+        else:
+            null = col.isna().to_numpy()
+            if null.any() and not rule.nullable:
+                absent = np.zeros(n_rows, dtype=bool)
+                if records is not None:
+                    # .get() returned None; tell absent keys apart from explicit nulls
+                    for i in np.flatnonzero(null):
+                        absent[i] = rule.name not in records[i]
+                error_codes[absent] |= ERR_MISSING
+                if rule.required:
+                    error_codes[null & ~absent] |= ERR_NULL
+                else:
+                    error_codes[null & ~absent] |= ERR_TYPE
+                failed |= null if rule.required else null & ~absent
+
+            if rule.json_type is not None:
+                bad_type = _type_errors(col, null, rule.json_type)
+                error_codes[bad_type] |= ERR_TYPE
+                failed |= bad_type
+
+            if rule.enum is not None:
+                bad_enum = ~null & ~col.isin(rule.enum).to_numpy()
+                error_codes[bad_enum] |= ERR_ENUM
+                failed |= bad_enum
+
+        field_errors[failed] |= np.uint32(1 << bit)
+
+    if is_object is not None and not is_object.all():
+        error_codes[~is_object] = ERR_NOT_OBJECT
+        field_errors[~is_object] = 0
+
+    return BatchValidationResult(error_codes, field_errors, [rule.name for rule in _RULES])
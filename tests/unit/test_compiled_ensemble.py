@@ -0,0 +1,134 @@
+"""Parity of the compiled tree ensemble backend with the source models."""
+
+import os
+import warnings
+
+import numpy as np
+import pytest
+
+from src.serving.compiled_ensemble import WALK_MAX_ROWS, compile_ensemble
+from src.serving.risk_scorer import RiskScorer
+
+MODEL_PATH = 'models/riskscore/gbm/v20251109_1/model.pkl'
+
+
+def make_data(num_rows: int = 2000, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([
+        rng.uniform(0, 160, num_rows),
+        rng.uniform(0, 3, num_rows),
+        rng.integers(0, 6, num_rows),
+    ]).astype(np.float32)
+    y = 0.004 * X[:, 0] + 0.1 * X[:, 1] + 0.05 * X[:, 2] + rng.normal(0, 0.05, num_rows)
+    return X, y
+
+
+def assert_parity(model, X: np.ndarray, atol: float):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        expected = model.predict(X)
+    for max_table_cells in (1 << 20, 0):
+        compiled = compile_ensemble(model, max_table_cells=max_table_cells)
+        np.testing.assert_allclose(compiled.predict(X), expected, rtol=0, atol=atol)
+        # The walk alone, without falling back to the model for large batches
+        compiled.fallback = None
+        np.testing.assert_allclose(compiled.predict(X), expected, rtol=0, atol=atol)
+        single = np.array([compiled.predict_one(row) for row in X[:200]])
+        np.testing.assert_allclose(single, expected[:200], rtol=0, atol=atol)
+
+
+def test_sklearn_gradient_boosting_is_bit_identical():
+    from sklearn.ensemble import GradientBoostingRegressor
+
+    X, y = make_data()
+    model = GradientBoostingRegressor(n_estimators=30, max_depth=3, random_state=0).fit(X, y)
+    assert_parity(model, make_data(5000, seed=1)[0], atol=0)
+
+
+def test_sklearn_hist_gradient_boosting_is_bit_identical():
+    from sklearn.ensemble import HistGradientBoostingRegressor
+
+    X, y = make_data()
+    model = HistGradientBoostingRegressor(max_iter=30, max_leaf_nodes=15, random_state=0).fit(X, y)
+    X_test = make_data(5000, seed=1)[0]
+    X_test[::7, 1] = np.nan
+    assert_parity(model, X_test, atol=0)
+
+
+def test_lightgbm_matches():
+    lightgbm = pytest.importorskip('lightgbm')
+
+    X, y = make_data()
+    X[::11, 0] = np.nan
+    model = lightgbm.LGBMRegressor(n_estimators=30, num_leaves=15, min_child_samples=10, random_state=0,
+                                   verbose=-1).fit(X, y)
+    X_test = make_data(5000, seed=1)[0]
+    X_test[::7, 0] = np.nan
+    assert_parity(model, X_test, atol=1e-12)
+
+
+def test_served_artifact_backends_agree():
+    X = make_data(5000, seed=2)[0]
+    sklearn_scores = RiskScorer(MODEL_PATH, backend='sklearn').score_batch(X)
+    compiled_scores = RiskScorer(MODEL_PATH, backend='compiled').score_batch(X)
+    np.testing.assert_array_equal(compiled_scores, sklearn_scores)
+
+
+def test_large_batches_fall_back_without_a_table():
+    from sklearn.ensemble import GradientBoostingRegressor
+
+    X, y = make_data()
+    model = GradientBoostingRegressor(n_estimators=10, max_depth=2, random_state=0).fit(X, y)
+    calls = []
+    compiled = compile_ensemble(model, max_table_cells=0)
+    compiled.fallback = lambda rows: calls.append(len(rows)) or model.predict(rows)
+    compiled.predict(X[:WALK_MAX_ROWS])
+    assert calls == []
+    compiled.predict(X[:WALK_MAX_ROWS + 1])
+    assert calls == [WALK_MAX_ROWS + 1]
+
+    calls.clear()
+    with_table = compile_ensemble(model)
+    with_table.fallback = compiled.fallback
+    with_table.predict(X)
+    assert calls == []
+
+
+def test_unsupported_model_is_rejected():
+    from sklearn.linear_model import LinearRegression
+
+    X, y = make_data(100)
+    with pytest.raises(TypeError):
+        compile_ensemble(LinearRegression().fit(X, y))
+
+
+def test_saved_arrays_are_memory_mapped(tmp_path):
+    import joblib
+    from sklearn.ensemble import GradientBoostingRegressor
+
+    from src.serving.compiled_ensemble import compiled_dir, load_compiled_ensemble
+
+    X, y = make_data()
+    model = GradientBoostingRegressor(n_estimators=20, max_depth=3, random_state=0).fit(X, y)
+    model_path = str(tmp_path / 'v1' / 'model.pkl')
+    os.makedirs(os.path.dirname(model_path))
+    joblib.dump(model, model_path)
+
+    compiled = load_compiled_ensemble(model_path, model=model)
+    assert isinstance(compiled.value, np.memmap) and isinstance(compiled._table[0].base, np.memmap)
+    np.testing.assert_array_equal(compiled.predict(X), model.predict(X))
+    np.testing.assert_array_equal(compiled.predict(X[:5]), model.predict(X[:5]))
+    saved_at = os.stat(compiled_dir(model_path)).st_mtime_ns
+
+    # Reused while the artifact is unchanged, recompiled once it changes
+    load_compiled_ensemble(model_path)
+    assert os.stat(compiled_dir(model_path)).st_mtime_ns == saved_at
+    retrained = GradientBoostingRegressor(n_estimators=5, max_depth=2, random_state=0).fit(X, y)
+    joblib.dump(retrained, model_path)
+    reloaded = load_compiled_ensemble(model_path)
+    assert reloaded.n_trees == 5
+    np.testing.assert_array_equal(reloaded.predict(X), retrained.predict(X))
+
+    walk = load_compiled_ensemble(model_path, max_table_cells=0)
+    walk.fallback = None
+    np.testing.assert_array_equal(walk.predict(X), retrained.predict(X))
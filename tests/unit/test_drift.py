@@ -0,0 +1,39 @@
+"""Drift monitor baselines follow the served model."""
+
+import os
+
+import numpy as np
+
+from src.dq.drift import DriftMonitor, baseline_path, build_baseline
+
+FEATURES = ['f_trip_max_speed', 'f_trip_avg_accel', 'f_trip_harsh_brake_count']
+
+
+def test_model_without_baseline_is_not_monitored(tmp_path):
+    assert DriftMonitor.for_model(str(tmp_path / 'model.pkl')) is None
+
+
+def test_follow_switches_baseline_and_starts_a_new_window(tmp_path):
+    rng = np.random.default_rng(0)
+    old, new = tmp_path / 'v1' / 'model.pkl', tmp_path / 'v2' / 'model.pkl'
+    build_baseline(rng.uniform(0, 100, (2000, 3)), FEATURES).save(baseline_path(str(old)))
+    build_baseline(rng.uniform(100, 200, (2000, 3)), FEATURES).save(baseline_path(str(new)))
+
+    monitor = DriftMonitor.for_model(str(old), min_count=100)
+    monitor.observe(rng.uniform(100, 200, (500, 3)), FEATURES)
+    assert [alert['feature'] for alert in monitor.alerts()] == FEATURES
+
+    assert monitor.follow(str(new))
+    assert monitor.model_path == str(new)
+    assert monitor.window().rows == 0
+    monitor.observe(rng.uniform(100, 200, (500, 3)), FEATURES)
+    assert monitor.alerts() == []
+
+
+def test_follow_without_baseline_keeps_current_model(tmp_path):
+    model = tmp_path / 'v1' / 'model.pkl'
+    build_baseline(np.arange(30, dtype=float).reshape(10, 3), FEATURES).save(baseline_path(str(model)))
+    monitor = DriftMonitor.for_model(str(model))
+    os.makedirs(tmp_path / 'v2')
+    assert not monitor.follow(str(tmp_path / 'v2' / 'model.pkl'))
+    assert monitor.model_path == str(model)
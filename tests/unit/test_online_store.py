@@ -0,0 +1,56 @@
+"""Online feature client: caching around concurrent writes, backend interface."""
+
+import pytest
+
+from src.features.online_store import InMemoryBackend, OnlineFeatureClient, OnlineStoreBackend
+
+
+class RacingBackend(InMemoryBackend):
+    """Runs ``during_get`` after reading, as a write landing mid-fetch would."""
+
+    def __init__(self):
+        super().__init__()
+        self.during_get = None
+
+    def get_many(self, keys):
+        rows = super().get_many(keys)
+        if self.during_get is not None:
+            action, self.during_get = self.during_get, None
+            action()
+        return rows
+
+
+def test_rows_read_before_a_concurrent_write_are_not_cached():
+    backend = RacingBackend()
+    client = OnlineFeatureClient(backend)
+    client.write('trip', {'t1': {'f_speed': 1.0}})
+
+    backend.during_get = lambda: client.write('trip', {'t1': {'f_speed': 2.0}})
+    assert client.get_features('trip', ['t1']) == [{'f_speed': 1.0}]
+    assert client.get_features('trip', ['t1']) == [{'f_speed': 2.0}]
+    # With no write in between the row is cached
+    assert client.get_features('trip', ['t1']) == [{'f_speed': 2.0}]
+    assert client.stats.cache_hits == 1
+
+
+def test_invalidation_during_a_read_skips_caching():
+    backend = RacingBackend()
+    client = OnlineFeatureClient(backend)
+    client.write('policy', {'p1': {'f_miles': 5.0}})
+
+    def backfill():
+        backend.set_many({client._key('policy', 'p1'): {'f_miles': 6.0}})
+        client.invalidate_group('policy')
+
+    backend.during_get = backfill
+    client.get_features('policy', ['p1'])
+    assert client.get_features('policy', ['p1']) == [{'f_miles': 6.0}]
+
+
+def test_incomplete_backend_cannot_be_created():
+    class ReadOnlyBackend(OnlineStoreBackend):
+        def get_many(self, keys):
+            return [None] * len(keys)
+
+    with pytest.raises(TypeError):
+        ReadOnlyBackend()
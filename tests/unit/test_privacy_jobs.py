@@ -0,0 +1,92 @@
+"""Privacy export and deletion passes over a telemetry store."""
+
+import gzip
+import json
+import os
+
+import pyarrow.parquet as pq
+import pytest
+
+from src.control_plane.privacy_jobs import PrivacyJobEngine, PrivacyJobStore
+from src.ingestion.telemetry_store import TELEMETRY_ARROW_SCHEMA, convert_to_store, open_store, read_telemetry_store
+
+
+def event(driver: str, day: int, seq: int):
+    return {'device_id': 'dev-1', 'policy_id': 'pol-1', 'trip_id': f"trip-{driver}-{day}",
+            'hashed_driver_id': driver, 'ts': f"2025-11-{day:02d}T10:{seq:02d}:00Z", 'event_type': 'sample',
+            'speed_kmh': float(seq), 'provider': 'simulator-v1.0', 'location_precision': 'exact'}
+
+
+@pytest.fixture
+def engine(tmp_path):
+    # One file per day: the 9th holds drivers a and b, the 10th only driver a
+    raw = tmp_path / 'raw.jsonl'
+    events = ([event('driver-a', 9, seq) for seq in range(2)] + [event('driver-b', 9, seq) for seq in range(3)]
+              + [event('driver-a', 10, seq) for seq in range(4)])
+    raw.write_text(''.join(json.dumps(record) + '\n' for record in events))
+    root = str(tmp_path / 'store')
+    convert_to_store(str(raw), root, num_buckets=1)
+    jobs = PrivacyJobStore(str(tmp_path / 'jobs.sqlite'))
+    yield PrivacyJobEngine(root, jobs, str(tmp_path / 'exports'), workers=2)
+    jobs.close()
+
+
+def drivers(root: str):
+    return read_telemetry_store(root, columns=['hashed_driver_id'])['hashed_driver_id'].value_counts().to_dict()
+
+
+def test_export_and_delete_in_one_pass(engine):
+    day_10 = [path for path in open_store(engine.store_root).files if 'event_date=2025-11-10' in path]
+    export_id = engine.submit('export', 'driver-a')
+    delete_id = engine.submit('delete', 'driver-a')
+    assert engine.run_pending() == 2
+
+    export = engine.status(export_id)
+    assert export['status'] == 'completed'
+    with gzip.open(export['details']['output_path'], 'rt') as f:
+        exported = [json.loads(line) for line in f]
+    # The export saw the rows before the delete in the same pass removed them
+    assert len(exported) == 6
+    assert {row['hashed_driver_id'] for row in exported} == {'driver-a'}
+    assert all(row['ts'].endswith('Z') for row in exported)
+
+    assert engine.status(delete_id)['status'] == 'completed'
+    assert drivers(engine.store_root) == {'driver-b': 3}
+    for path in open_store(engine.store_root).files:
+        assert pq.read_schema(path).remove_metadata().equals(TELEMETRY_ARROW_SCHEMA.remove_metadata())
+        assert not os.path.basename(path).startswith('.')
+    # The file left without rows is removed and dropped from the driver index
+    assert not os.path.exists(day_10[0])
+    assert engine.jobs.files_for_drivers(['driver-a', 'driver-b']) == {
+        'driver-b': open_store(engine.store_root).files}
+
+
+def test_progress_counts_files_and_rows(engine):
+    request_id = engine.submit('delete', 'driver-a')
+    other_id = engine.submit('export', 'driver-c')
+    engine.run_pending()
+
+    details = engine.status(request_id)['details']
+    assert (details['files_total'], details['files_done'], details['rows_matched']) == (2, 2, 6)
+    assert details['progress'] == 1.0
+    # A driver with no rows completes with an empty export
+    other = engine.status(other_id)
+    assert other['status'] == 'completed'
+    assert (other['details']['files_total'], other['details']['rows_matched']) == (0, 0)
+
+
+def test_interrupted_pass_is_requeued(engine):
+    request_id = engine.submit('delete', 'driver-b')
+    # A pass that claimed the job and counted a file, then stopped
+    assert len(engine.jobs.claim(10)) == 1
+    engine.jobs.set_totals({request_id: 1})
+    engine.jobs.advance([(request_id, 3)])
+    assert engine.run_pending() == 0
+    assert engine.status(request_id)['status'] == 'processing'
+
+    assert engine.jobs.requeue_processing() == 1
+    assert engine.run_pending() == 1
+    details = engine.status(request_id)['details']
+    assert engine.status(request_id)['status'] == 'completed'
+    assert (details['files_total'], details['files_done'], details['rows_matched']) == (1, 1, 3)
+    assert drivers(engine.store_root) == {'driver-a': 6}
@@ -0,0 +1,70 @@
+"""Vectorized repricing matches map_score_to_premium and applies guardrails."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.models.pricing_engine import map_score_to_premium
+from src.models.repricing import (GUARDRAIL_CAPPED, GUARDRAIL_FLOORED, GUARDRAIL_NONE, Scenarios, reprice,
+                                  reprice_parquet, reprice_scenarios)
+
+
+def make_book(num_policies: int = 10_000, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(300, 3000, num_policies), rng.uniform(0, 100, num_policies)
+
+
+@pytest.mark.parametrize('alpha', [0.02, 0.1, 0.37])
+def test_matches_scalar_function_exactly(alpha):
+    base, score = make_book()
+    expected = np.array([map_score_to_premium(b, s, alpha) for b, s in zip(base, score)])
+    np.testing.assert_array_equal(reprice(base, score, alpha), expected)
+
+
+def test_guardrails():
+    base = np.array([1000.0, 1000.0, 1000.0, 1000.0])
+    score = np.array([100.0, 0.0, 55.0, 100.0])
+    premiums, guardrail = reprice(base, score, alpha=0.5, max_increase_pct=[0.1, 0.1, 0.1, np.nan],
+                                  max_decrease_pct=0.2, return_guardrail=True)
+    np.testing.assert_allclose(premiums, [1100.0, 800.0, 1050.0, 1500.0])
+    assert guardrail.tolist() == [GUARDRAIL_CAPPED, GUARDRAIL_FLOORED, GUARDRAIL_NONE, GUARDRAIL_NONE]
+
+
+def test_scenarios_match_one_pass_per_scenario():
+    base, score = make_book(2000)
+    policy_cap = np.where(np.arange(len(base)) % 3 == 0, 0.05, np.nan)
+    scenarios = Scenarios.grid([0.02, 0.1, 0.3], [None, 0.1], [None, 0.15])
+    premiums = reprice_scenarios(base, score, scenarios, max_increase_pct=policy_cap)
+    assert premiums.shape == (len(scenarios), len(base))
+    for i in range(len(scenarios)):
+        cap = np.fmin(scenarios.max_increase_pct[i], policy_cap)
+        expected = reprice(base, score, scenarios.alpha[i], cap, scenarios.max_decrease_pct[i])
+        np.testing.assert_array_equal(premiums[i], expected)
+
+
+def test_reprice_parquet_streams_every_scenario(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    import pyarrow as pa
+
+    base, score = make_book(1000)
+    book = pd.DataFrame({'policy_id': [f"p{i}" for i in range(len(base))], 'base_premium': base,
+                         'risk_score': score})
+    source = tmp_path / 'book.parquet'
+    pq.write_table(pa.Table.from_pandas(book, preserve_index=False), source)
+    scenarios = Scenarios.grid([0.02, 0.2], [None, 0.05])
+
+    output = tmp_path / 'repriced.parquet'
+    summary = reprice_parquet(str(source), str(output), scenarios, batch_size=300)
+    result = pq.read_table(output).to_pandas()
+
+    assert len(result) == len(scenarios) * len(book)
+    expected = reprice_scenarios(base, score, scenarios)
+    for i in range(len(scenarios)):
+        rows = result[result['scenario'] == i]
+        assert rows['policy_id'].tolist() == book['policy_id'].tolist()
+        np.testing.assert_array_equal(rows['premium'].to_numpy(), expected[i])
+        assert summary[i]['premium_total'] == pytest.approx(expected[i].sum())
+    # alpha=0.02 moves a premium by at most 2%, so only the last scenario hits the 5% cap
+    capped = int((reprice(base, score, 0.2) > base * 1.05).sum())
+    assert capped > 0
+    assert [row['capped'] for row in summary] == [0, 0, 0, capped]
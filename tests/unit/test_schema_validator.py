@@ -0,0 +1,85 @@
+"""Batch telemetry validation agrees with the jsonschema validator."""
+
+import json
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.utils.schema_validator import (ERR_ENUM, ERR_MISSING, ERR_NOT_OBJECT, ERR_NULL, ERR_TYPE,
+                                        TELEMETRY_SCHEMA, get_validator, validate_telemetry_batch,
+                                        validate_telemetry_event)
+
+SAMPLES = 'data/samples/poc_telemetry.jsonl'
+BAD_VALUES = [None, 'x', 1, 1.5, True, [1], {'a': 1}, 'sample']
+
+
+@pytest.fixture(scope='module')
+def sample_events():
+    with open(SAMPLES, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def corrupt(events, num_events: int = 5000, bad_fraction: float = 0.3, seed: int = 0):
+    rng = random.Random(seed)
+    fields = list(TELEMETRY_SCHEMA['properties'])
+    corrupted = []
+    for i in range(num_events):
+        event = dict(events[i % len(events)])
+        if rng.random() < bad_fraction:
+            field = rng.choice(fields)
+            if rng.random() < 0.3:
+                event.pop(field, None)
+            else:
+                event[field] = rng.choice(BAD_VALUES)
+        corrupted.append(event)
+    return corrupted
+
+
+def test_mask_matches_jsonschema(sample_events):
+    events = corrupt(sample_events)
+    result = validate_telemetry_batch(events)
+    expected = np.array([get_validator().is_valid(event) for event in events])
+    assert expected.sum() < len(events)
+    np.testing.assert_array_equal(result.valid, expected)
+
+
+def test_dataframe_batch(sample_events):
+    events = corrupt(sample_events, num_events=500, bad_fraction=0.0)
+    frame = pd.DataFrame(events)
+    frame['speed_kmh'] = frame['speed_kmh'].astype(object)
+    frame.loc[3, 'event_type'] = 'parked'
+    frame.loc[5, 'speed_kmh'] = 'fast'
+    result = validate_telemetry_batch(frame)
+    assert result.valid.sum() == len(frame) - 2
+    assert result.errors_for(3) == ['enum', 'event_type']
+    assert result.errors_for(5) == ['type', 'speed_kmh']
+
+
+def test_error_codes(sample_events):
+    good = dict(sample_events[0])
+    missing = {key: value for key, value in good.items() if key != 'trip_id'}
+    result = validate_telemetry_batch([
+        good,
+        missing,
+        dict(good, device_id=None),
+        dict(good, engine_rpm=1.5),
+        dict(good, location_precision='street'),
+        'not an event',
+    ])
+    assert result.error_codes.tolist() == [0, ERR_MISSING, ERR_NULL, ERR_TYPE, ERR_ENUM, ERR_NOT_OBJECT]
+    assert result.errors_for(1) == ['missing', 'trip_id']
+
+
+def test_partition_routes_bad_rows(sample_events):
+    events = [sample_events[0], dict(sample_events[0], event_type='parked'), sample_events[1]]
+    good, bad = validate_telemetry_batch(events).partition(events)
+    assert good == [events[0], events[2]]
+    assert bad == [events[1]]
+
+
+def test_single_event_validation_raises(sample_events):
+    assert validate_telemetry_event(sample_events[0])
+    with pytest.raises(ValueError):
+        validate_telemetry_event(dict(sample_events[0], event_type='parked'))
@@ -0,0 +1,121 @@
+"""TelemetryIndex: incremental updates, rewrites, compaction and lookups."""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.ingestion import telemetry_index
+from src.ingestion.telemetry_index import TelemetryIndex
+
+
+def event(trip: int, seq: int, driver: str = 'driver-a'):
+    return {'device_id': f"dev-{trip % 3}", 'policy_id': f"pol-{trip % 2}", 'trip_id': f"trip-{trip}",
+            'hashed_driver_id': driver, 'ts': f"2025-11-09T10:{seq:02d}:00Z", 'event_type': 'sample',
+            'speed_kmh': float(10 * trip + seq), 'provider': 'simulator-v1.0', 'location_precision': 'exact'}
+
+
+def write_jsonl(path, events, mode='w'):
+    with open(path, mode) as f:
+        for record in events:
+            f.write(json.dumps(record) + '\n')
+
+
+def speeds(frame: pd.DataFrame):
+    return sorted(frame['speed_kmh'].tolist())
+
+
+def test_lookup_reads_only_matching_rows(tmp_path):
+    raw = tmp_path / 'raw'
+    raw.mkdir()
+    write_jsonl(raw / 'a.jsonl', [event(trip, seq) for seq in range(3) for trip in range(4)])
+    index = TelemetryIndex(str(tmp_path / 'index'))
+    assert index.update(str(raw)) == os.path.getsize(raw / 'a.jsonl')
+
+    trip = index.lookup('trip_id', 'trip-2')
+    assert speeds(trip) == [20.0, 21.0, 22.0]
+    assert isinstance(trip['ts'].dtype, pd.DatetimeTZDtype)
+    assert len(index.lookup('device_id', 'dev-0', columns=['trip_id'])) == 6
+    assert index.lookup('trip_id', 'trip-9').empty
+    # Reopening reads the saved index
+    assert speeds(TelemetryIndex(str(tmp_path / 'index')).lookup('trip_id', 'trip-2')) == [20.0, 21.0, 22.0]
+
+
+def test_appended_tail_is_indexed_incrementally(tmp_path):
+    path = tmp_path / 'a.jsonl'
+    write_jsonl(path, [event(1, seq) for seq in range(3)])
+    index = TelemetryIndex(str(tmp_path / 'index'))
+    first = index.update(str(path))
+    # A partial last line waits for the next update
+    write_jsonl(path, [event(1, 3)], mode='a')
+    with open(path, 'a') as f:
+        f.write(json.dumps(event(1, 4))[:20])
+    tail = index.update(str(path))
+    assert tail == os.path.getsize(path) - first - 20
+    assert index.num_segments == 2
+    assert speeds(index.lookup('trip_id', 'trip-1')) == [10.0, 11.0, 12.0, 13.0]
+    file_id = index._manifest['files'][str(path)]['id']
+
+    with open(path, 'a') as f:
+        f.write(json.dumps(event(1, 4))[20:] + '\n')
+    index.update(str(path))
+    assert speeds(index.lookup('trip_id', 'trip-1')) == [10.0, 11.0, 12.0, 13.0, 14.0]
+    assert index._manifest['files'][str(path)]['id'] == file_id
+    assert index.update(str(path)) == 0
+
+
+def test_rewritten_file_gets_a_new_id(tmp_path):
+    path = tmp_path / 'a.jsonl'
+    write_jsonl(path, [event(1, seq) for seq in range(3)])
+    index = TelemetryIndex(str(tmp_path / 'index'))
+    index.update(str(path))
+    old_id = index._manifest['files'][str(path)]['id']
+
+    # Same length or longer, but the head changed: not an append
+    write_jsonl(path, [event(2, seq) for seq in range(4)])
+    index.update(str(path))
+    assert index._manifest['files'][str(path)]['id'] != old_id
+    assert index.lookup('trip_id', 'trip-1').empty
+    assert speeds(index.lookup('trip_id', 'trip-2')) == [20.0, 21.0, 22.0, 23.0]
+
+
+def test_removed_files_are_dropped_and_compacted(tmp_path):
+    raw = tmp_path / 'raw'
+    raw.mkdir()
+    write_jsonl(raw / 'a.jsonl', [event(1, seq) for seq in range(3)])
+    index = TelemetryIndex(str(tmp_path / 'index'))
+    index.update(str(raw))
+    write_jsonl(raw / 'b.jsonl', [event(1, seq) for seq in range(3, 5)] + [event(2, 0)])
+    index.update(str(raw))
+    assert index.num_segments == 2
+    assert speeds(index.lookup('trip_id', 'trip-1')) == [10.0, 11.0, 12.0, 13.0, 14.0]
+
+    os.remove(raw / 'a.jsonl')
+    index.update(str(raw))
+    assert index.files == [str(raw / 'b.jsonl')]
+    assert speeds(index.lookup('trip_id', 'trip-1')) == [13.0, 14.0]
+    assert index._has_dead_entries()
+
+    index.compact()
+    assert index.num_segments == 1
+    assert not index._has_dead_entries()
+    assert speeds(index.lookup('trip_id', 'trip-1')) == [13.0, 14.0]
+    assert speeds(index.lookup('trip_id', 'trip-2')) == [20.0]
+    assert len([name for name in os.listdir(tmp_path / 'index') if name.endswith('.npy')]) == \
+        len(telemetry_index.INDEXED_FIELDS) * len(telemetry_index.SEGMENT_PARTS)
+
+
+def test_hash_collisions_are_rechecked(tmp_path, monkeypatch):
+    # Every id hashes to the same key, so each lookup locates every row
+    monkeypatch.setattr(telemetry_index, 'key_hashes',
+                        lambda values: np.zeros(len(list(values)), dtype=np.uint64))
+    path = tmp_path / 'a.jsonl'
+    write_jsonl(path, [event(trip, seq) for seq in range(2) for trip in range(3)])
+    pd.DataFrame([event(3, seq) for seq in range(2)]).to_parquet(tmp_path / 'b.parquet')
+    index = TelemetryIndex(str(tmp_path / 'index'))
+    index.update([str(path), str(tmp_path / 'b.parquet')])
+
+    assert set(index.locate('trip_id', 'trip-1')) == {str(path), str(tmp_path / 'b.parquet')}
+    assert speeds(index.lookup('trip_id', 'trip-1')) == [10.0, 11.0]
+    assert speeds(index.lookup('trip_id', 'trip-3')) == [30.0, 31.0]
@@ -0,0 +1,34 @@
+"""Hyperparameter search data split for memory-mapped training."""
+
+import os
+
+import numpy as np
+
+from src.models.train_gbm import (holdout_mask, load_search_split, load_training_data, train_scalable,
+                                  write_search_split, write_synthetic_training_data)
+
+
+def test_search_split_separates_holdout_rows(tmp_path):
+    data = str(tmp_path / 'data')
+    write_synthetic_training_data(data, 1000, seed=1, chunk_rows=300)
+    X, y, names = load_training_data(data)
+    mask = holdout_mask(len(y), 0.2, seed=5)
+    split_dir = str(tmp_path / 'split')
+    os.makedirs(split_dir)
+
+    rows = write_search_split(X, y, mask, split_dir, np.float64, chunk_rows=128)
+    assert rows == {'train': int((~mask).sum()), 'valid': int(mask.sum())}
+    split = load_search_split(split_dir, rows, len(names), np.float64)
+    for part, keep in (('train', ~mask), ('valid', mask)):
+        part_X, part_y = split[part]
+        assert isinstance(part_X, np.memmap) and part_X.dtype == np.float64
+        np.testing.assert_array_equal(part_X, X[keep])
+        np.testing.assert_array_equal(part_y, y[keep])
+
+
+def test_search_cleans_up_its_scratch_files(tmp_path):
+    data = str(tmp_path / 'data')
+    write_synthetic_training_data(data, 2000, seed=1)
+    _, report = train_scalable(data, kind='hist', n_candidates=2, seed=3)
+    assert len(report['search']) == 2
+    assert sorted(os.listdir(data)) == ['X.f32', 'meta.json', 'y.f32']
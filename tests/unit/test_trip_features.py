@@ -0,0 +1,101 @@
+"""Parity of the vectorized trip feature engine with compute_trip_features."""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.features.feature_definitions import load_manifest
+from src.streaming import telemetry_transform
+from src.streaming.telemetry_transform import (TRIP_FEATURE_COLUMNS, compute_trip_features,
+                                               compute_trip_features_vectorized)
+
+
+def make_events(num_events: int = 5000, num_trips: int = 40, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    base = pd.Timestamp('2025-11-09T18:00:00Z')
+    offsets = rng.integers(0, 12 * 3600, size=num_events)
+    return pd.DataFrame({
+        'trip_id': np.char.add('trip-', rng.integers(0, num_trips, size=num_events).astype(str)),
+        'ts': (base + pd.to_timedelta(offsets, unit='s')).strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+        'speed_kmh': rng.uniform(0, 120, size=num_events),
+        'accel_y_m_s2': rng.uniform(-5, 5, size=num_events),
+        'sample_rate_hz': np.full(num_events, 1.0),
+    })
+
+
+@pytest.mark.parametrize('parsed', [False, True])
+def test_event_weighting_matches_reference(parsed):
+    events = make_events()
+    if parsed:
+        events['ts'] = pd.to_datetime(events['ts'], utc=True)
+    expected = compute_trip_features(events.copy())
+    actual = compute_trip_features_vectorized(events, night_weighting='event')
+    assert list(actual.columns) == TRIP_FEATURE_COLUMNS
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False, rtol=1e-9)
+
+
+def test_input_is_not_modified():
+    events = make_events(500)
+    before = events.copy()
+    compute_trip_features_vectorized(events)
+    pd.testing.assert_frame_equal(events, before)
+
+
+def test_elapsed_weighting_uses_sample_rate_and_gaps():
+    events = pd.DataFrame({
+        'trip_id': ['a'] * 3 + ['b'] * 3,
+        'ts': ['2025-11-09T23:00:00Z', '2025-11-09T23:01:00Z', '2025-11-09T23:03:00Z'] * 2,
+        'speed_kmh': [50.0, 60.0, 55.0, 40.0, 45.0, 50.0],
+        'accel_y_m_s2': [0.0, -3.0, 1.0, -1.0, -1.0, -4.0],
+        'sample_rate_hz': [1 / 30] * 3 + [np.nan] * 3,
+    })
+    features = compute_trip_features_vectorized(events, night_weighting='elapsed').set_index('trip_id')
+    # 'a' reports one event per 30 s; 'b' falls back to the gaps to the next event (the last counts 0)
+    assert features.at['a', 'night_driving_minutes'] == pytest.approx(1.5)
+    assert features.at['b', 'night_driving_minutes'] == pytest.approx(3.0)
+    assert features.at['b', 'harsh_brake_count'] == 1
+
+
+def test_elapsed_weighting_caps_gaps():
+    events = pd.DataFrame({
+        'trip_id': ['a', 'a'],
+        'ts': ['2025-11-09T23:00:00Z', '2025-11-10T01:00:00Z'],
+        'speed_kmh': [50.0, 60.0],
+        'accel_y_m_s2': [0.0, 0.0],
+    })
+    features = compute_trip_features_vectorized(events, max_gap_s=300.0)
+    assert features['night_driving_minutes'].iloc[0] == pytest.approx(5.0)
+
+
+def test_without_timestamps():
+    events = make_events(200).drop(columns=['ts', 'sample_rate_hz'])
+    features = compute_trip_features_vectorized(events, night_weighting='event')
+    assert (features['night_driving_minutes'] == 0).all()
+    assert features['trip_max_speed'].tolist() == events.groupby('trip_id')['speed_kmh'].max().tolist()
+
+
+def test_unknown_weighting_is_rejected():
+    with pytest.raises(ValueError):
+        compute_trip_features_vectorized(make_events(10), night_weighting='hourly')
+
+
+def test_event_weighting_does_not_depend_on_source_order(monkeypatch):
+    events = make_events(500)
+    expected = compute_trip_features_vectorized(events, night_weighting='event')
+    reordered = dict(reversed(list(telemetry_transform.TRIP_FEATURE_SOURCES.items())))
+    monkeypatch.setattr(telemetry_transform, 'TRIP_FEATURE_SOURCES', reordered)
+    monkeypatch.setattr(telemetry_transform, '_trip_plans', {})
+    actual = compute_trip_features_vectorized(events, night_weighting='event')
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_manifest_edits_are_picked_up(tmp_path):
+    path = tmp_path / 'manifest.yml'
+    path.write_text("model_features: [a, b]\n")
+    digest, manifest = load_manifest(str(path))
+    assert load_manifest(str(path))[0] == digest
+    path.write_text("model_features: [a, b, c]\n")
+    os.utime(path, ns=(0, 1_000_000_000))
+    assert load_manifest(str(path))[1]['model_features'] == ['a', 'b', 'c']
@@ -0,0 +1,50 @@
+"""Trip history endpoints: deleted drivers and units."""
+
+import pandas as pd
+import pytest
+
+from src.control_plane.api import trips
+from src.control_plane.privacy_jobs import PrivacyJobStore
+
+
+@pytest.fixture
+def jobs(tmp_path, monkeypatch):
+    store = PrivacyJobStore(str(tmp_path / 'jobs.sqlite'))
+    monkeypatch.setattr(trips, 'get_jobs', lambda: store)
+    yield store
+    store.close()
+
+
+def events_at(*stamps):
+    return pd.DataFrame({'trip_id': ['t1'] * len(stamps),
+                         'ts': pd.to_datetime(list(stamps), utc=True, errors='coerce')})
+
+
+def test_events_up_to_the_delete_request_are_hidden(jobs):
+    events = events_at('2020-01-01T00:00:00Z', None, '2999-01-01T00:00:00Z')
+    assert len(trips.visible_events(events, 'driver-a')) == 3
+
+    request_id = jobs.create('delete', 'driver-a')
+    visible = trips.visible_events(events, 'driver-a')
+    # Only events after the request (later ingestion) remain; unparsed timestamps are hidden too
+    assert visible['ts'].tolist() == [pd.Timestamp('2999-01-01T00:00:00Z')]
+    assert len(trips.visible_events(events, 'driver-b')) == 3
+
+    jobs.finish(request_id, 'failed', error='boom')
+    assert len(trips.visible_events(events, 'driver-a')) == 3
+    jobs.create('export', 'driver-a')
+    assert len(trips.visible_events(events, 'driver-a')) == 3
+
+
+def test_summary_speeds_and_distances_are_in_miles():
+    events = pd.DataFrame({
+        'trip_id': ['t1', 't1'],
+        'ts': pd.to_datetime(['2025-11-09T10:00:00Z', '2025-11-09T10:05:00Z'], utc=True),
+        'speed_kmh': [80.4672, 160.9344],
+        'accel_y_m_s2': [0.0, -5.0],
+        'odometer_km': [100.0, 116.09344],
+    })
+    (summary,) = trips.summarize_trips(events)
+    assert summary['max_speed'] == 100.0
+    assert summary['distance_mi'] == 10.0
+    assert summary['event_count'] == 2